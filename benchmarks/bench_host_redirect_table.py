@@ -0,0 +1,51 @@
+"""
+Measures `HostRedirectTable` lookups as the table grows, to show that their cost does not depend on its size.
+
+Run with `python benchmarks/bench_host_redirect_table.py` from the repository root.
+"""
+import random
+import sys
+import timeit
+from typing import List
+
+sys.path.insert(0, ".")
+
+from brochure_wsgi.host_redirect_table import HostRedirectTable, HostRedirect  # noqa: E402
+
+TABLE_SIZES = (10, 1000, 10000, 100000)
+LOOKUP_COUNT = 100000
+
+
+def _random_label(random_generator: random.Random) -> str:
+    return "".join(random_generator.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+
+
+def build_redirects(size: int, random_generator: random.Random) -> List[HostRedirect]:
+    redirects = []
+    for index in range(size):
+        domain = "{}.{}".format(_random_label(random_generator), random_generator.choice(("com", "net", "org", "io")))
+        source = "*.{}".format(domain) if index % 2 else domain
+        redirects.append(HostRedirect(source=source, target_host="www.example.com"))
+
+    return redirects
+
+
+def main() -> None:
+    random_generator = random.Random(0)
+    print("{:>8}  {:>16}  {:>16}  {:>16}".format("entries", "exact hit ns", "wildcard hit ns", "miss ns"))
+    for size in TABLE_SIZES:
+        redirects = build_redirects(size=size, random_generator=random_generator)
+        table = HostRedirectTable(redirects=redirects)
+        exact_hosts = [redirect.source for redirect in redirects if not redirect.source.startswith("*.")]
+        wildcard_hosts = ["www.{}".format(redirect.source[2:]) for redirect in redirects if redirect.source.startswith("*.")]
+        missing_hosts = ["www.{}.example".format(_random_label(random_generator)) for _ in range(1000)]
+        timings = []
+        for hosts in (exact_hosts, wildcard_hosts, missing_hosts):
+            lookups = [random_generator.choice(hosts) for _ in range(LOOKUP_COUNT)]
+            seconds = min(timeit.repeat(lambda: [table.get_response(host) for host in lookups], number=1, repeat=5))
+            timings.append(seconds / LOOKUP_COUNT * 1e9)
+        print("{:>8}  {:>16.0f}  {:>16.0f}  {:>16.0f}".format(size, *timings))
+
+
+if __name__ == "__main__":
+    main()
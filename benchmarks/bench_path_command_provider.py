@@ -0,0 +1,44 @@
+"""
+Compares compiled routing in `GetPathCommandProvider` with matching every request through werkzeug.
+
+Run with `python benchmarks/bench_path_command_provider.py` from the repository root.
+"""
+import sys
+import timeit
+
+sys.path.insert(0, ".")
+
+from brochure.commands.command_types import CommandType  # noqa: E402
+from werkzeug.routing import Map, Rule  # noqa: E402
+
+from brochure_wsgi.path_command_provider import GetPathCommandProvider  # noqa: E402
+
+REQUEST_COUNT = 20000
+PATHS = (("static", "/"), ("dynamic", "/sections/42"), ("miss", "/missing"))
+
+
+def build_url_map() -> Map:
+    return Map([Rule("/", endpoint=lambda: CommandType.SHOW_COVER),
+                Rule("/sections/<int:section_id>", endpoint=lambda: CommandType.SHOW_COVER)])
+
+
+def time_requests(provider: GetPathCommandProvider, path: str) -> float:
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "SERVER_NAME": "www.example.com", "SERVER_PORT": "80",
+               "wsgi.url_scheme": "http"}
+    seconds = min(timeit.repeat(lambda: provider(environ=environ)(), number=REQUEST_COUNT, repeat=5))
+
+    return seconds / REQUEST_COUNT * 1e9
+
+
+def main() -> None:
+    werkzeug_provider = GetPathCommandProvider(url_map=build_url_map(), compiled_routing=False)
+    compiled_provider = GetPathCommandProvider(url_map=build_url_map())
+    print("{:>8}  {:>12}  {:>12}  {:>8}".format("path", "werkzeug ns", "compiled ns", "speedup"))
+    for name, path in PATHS:
+        werkzeug_ns = time_requests(werkzeug_provider, path)
+        compiled_ns = time_requests(compiled_provider, path)
+        print("{:>8}  {:>12.0f}  {:>12.0f}  {:>7.1f}x".format(name, werkzeug_ns, compiled_ns, werkzeug_ns / compiled_ns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Starts fresh Python processes and reports how long a new worker takes to import the application, build it with
+`get_brochure_wsgi_application()` and serve its first response, with and without the on-disk template bytecode cache.
+
+Run with `python benchmarks/startup_benchmark.py` from the repository root. `--output results.json` saves the results.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+CONTENT = {"BROCHURE_COVER_SECTION": '{"title": "Cover Title", "body": "Body text"}',
+           "BROCHURE_ENTERPRISE": '{"name": "Example Enterprise"}',
+           "BROCHURE_CONTACT_METHOD": '{"contact_method_type": "email", "value": "ejemplo@example.com"}'}
+MODES = ("default", "template-cache")
+PHASES = ("import_ms", "factory_ms", "first_response_ms", "time_to_first_response_ms", "process_ms")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+imported = time.perf_counter()
+application = get_brochure_wsgi_application()
+built = time.perf_counter()
+environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "QUERY_STRING": "", "SERVER_NAME": "www.example.com",
+           "SERVER_PORT": "443", "HTTP_HOST": "www.example.com", "wsgi.url_scheme": "https"}
+statuses = []
+b"".join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+responded = time.perf_counter()
+assert statuses[0].startswith("200"), statuses
+print(json.dumps({"import_ms": (imported - started) * 1e3,
+                  "factory_ms": (built - imported) * 1e3,
+                  "first_response_ms": (responded - built) * 1e3,
+                  "time_to_first_response_ms": (responded - started) * 1e3}))
+"""
+
+
+def run_probe(environment: Dict[str, str]) -> Dict[str, float]:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", PROBE], env=environment, check=True, stdout=subprocess.PIPE).stdout
+    process_ms = (time.perf_counter() - started) * 1e3
+    timings = json.loads(output.decode("utf-8"))
+    timings["process_ms"] = process_ms
+
+    return timings
+
+
+def run_mode(mode: str, run_count: int, template_cache_directory: str) -> Dict[str, float]:
+    environment = dict(os.environ, **CONTENT)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, (os.getcwd(), environment.get("PYTHONPATH"))))
+    environment.pop("BROCHURE_TEMPLATE_CACHE_DIRECTORY", None)
+    if mode == "template-cache":
+        environment["BROCHURE_TEMPLATE_CACHE_DIRECTORY"] = template_cache_directory
+
+    # Unmeasured run: fills the template cache and the operating system's file cache.
+    run_probe(environment)
+    runs = [run_probe(environment) for _ in range(run_count)]
+
+    return {phase: sorted(run[phase] for run in runs)[len(runs) // 2] for phase in PHASES}
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="measured processes per mode")
+    parser.add_argument("--mode", action="append", choices=MODES, help="run only this mode (repeatable)")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    options = parser.parse_args(arguments)
+
+    results = {"python": platform.python_version(),
+               "platform": platform.platform(),
+               "modes": {}}
+    print("{:<16} {:>10} {:>11} {:>15} {:>21} {:>11}".format("mode (median)", "import ms", "factory ms",
+                                                             "first resp. ms", "to first response ms", "process ms"))
+    with tempfile.TemporaryDirectory() as template_cache_directory:
+        for mode in MODES:
+            if options.mode and mode not in options.mode:
+                continue
+            mode_results = run_mode(mode=mode, run_count=options.runs, template_cache_directory=template_cache_directory)
+            results["modes"][mode] = mode_results
+            print("{:<16} {:>10.1f} {:>11.1f} {:>15.1f} {:>21.1f} {:>11.1f}".format(
+                mode, *(mode_results[phase] for phase in PHASES)))
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Drives `get_brochure_wsgi_application()` in-process with synthetic `environ` dictionaries and reports, per scenario,
+throughput, p50/p95/p99 latency and memory allocated per request.
+
+Run with `python benchmarks/wsgi_benchmark.py` from the repository root. `--output results.json` saves the results;
+`--compare baseline.json` exits with status 1 when a scenario's latency regressed by more than `--threshold` against a
+saved run.
+
+Each scenario is measured in `--trials` separate runs and reports the best throughput and latency percentiles among
+them, so that runs slowed down by something else on the machine do not decide the comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import uuid
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, ".")
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application  # noqa: E402
+from brochure_wsgi.command_preprocessors.domain_redirect_preprocessor import DomainRedirectPreprocessor  # noqa: E402
+from brochure_wsgi.command_preprocessors.preprocessor_chain import PreprocessorChain  # noqa: E402
+from brochure_wsgi.command_preprocessors.upgrade_to_ssl_preprocessor import UpgradeToSSLPreprocessor  # noqa: E402
+from brochure_wsgi.request_view import get_request_view, url_from_request_view  # noqa: E402
+from brochure_wsgi.stage_timer import StageTimer  # noqa: E402
+
+CONTENT = {"BROCHURE_COVER_SECTION": '{"title": "Cover Title", "body": "Body text"}',
+           "BROCHURE_ENTERPRISE": '{"name": "Example Enterprise"}',
+           "BROCHURE_CONTACT_METHOD": '{"contact_method_type": "email", "value": "ejemplo@example.com"}'}
+BROKEN_CONTENT = dict(CONTENT, BROCHURE_COVER_SECTION='{"title": "Broken"')
+COMPARED_METRICS = ("p50_us", "p95_us")
+
+
+class Scenario(NamedTuple):
+    name: str
+    expected_status: str
+    environ_provider: Callable[[int], Dict]
+    content: Dict[str, str] = CONTENT
+    settings: Tuple[Tuple[str, str], ...] = ()
+
+
+def make_environ(path: str = "/", scheme: str = "https", host: str = "www.example.com", **headers: str) -> Dict:
+    environ = {"REQUEST_METHOD": "GET",
+               "SCRIPT_NAME": "",
+               "PATH_INFO": path,
+               "QUERY_STRING": "",
+               "SERVER_NAME": host,
+               "SERVER_PORT": "443" if scheme == "https" else "80",
+               "SERVER_PROTOCOL": "HTTP/1.1",
+               "HTTP_HOST": host,
+               "wsgi.version": (1, 0),
+               "wsgi.url_scheme": scheme,
+               "wsgi.input": BytesIO(),
+               "wsgi.errors": sys.stderr,
+               "wsgi.multithread": True,
+               "wsgi.multiprocess": False,
+               "wsgi.run_once": False}
+    environ.update(("HTTP_{}".format(name.upper()), value) for name, value in headers.items())
+
+    return environ
+
+
+SCENARIOS = (
+    Scenario("html_cover", "200", lambda index: make_environ(accept="text/html")),
+    Scenario("json_cover", "200", lambda index: make_environ(accept="application/json")),
+    Scenario("not_found", "404", lambda index: make_environ(path="/{}".format(uuid.uuid4().hex))),
+    Scenario("favicon", "200", lambda index: make_environ(path="/favicon.ico")),
+    Scenario("ssl_redirect", "301", lambda index: make_environ(scheme="http")),
+    Scenario("domain_redirect", "301", lambda index: make_environ(host="example.com")),
+    # Without the circuit breaker, which would replay its last failure response instead of rendering the error page.
+    Scenario("exception", "500", lambda index: make_environ(), content=BROKEN_CONTENT,
+             settings=(("BROCHURE_CIRCUIT_BREAKER_PROBE_INTERVAL", "0"),)),
+)
+
+
+def get_stage_timer(stage_timing: str) -> Optional[StageTimer]:
+    if stage_timing == "hook":
+        return StageTimer(hooks=(lambda environ, timings: None,))
+    if stage_timing == "server-timing":
+        return StageTimer(server_timing=True)
+
+    return None
+
+
+def get_benchmark_application(stage_timer: Optional[StageTimer] = None,
+                              settings: Tuple[Tuple[str, str], ...] = ()) -> Callable[[Dict, Callable], Iterable[bytes]]:
+    """
+    The default application, built with the environment variables in `settings`, behind the SSL upgrade and domain
+    redirect preprocessors a deployment would add.
+    """
+    previous_settings = {name: os.environ.get(name) for name, _ in settings}
+    os.environ.update(settings)
+    try:
+        application = get_brochure_wsgi_application(stage_timer=stage_timer)
+    finally:
+        for name, previous_value in previous_settings.items():
+            if previous_value is None:
+                os.environ.pop(name)
+            else:
+                os.environ[name] = previous_value
+    redirect_chain = PreprocessorChain((
+        UpgradeToSSLPreprocessor(is_insecure=lambda environ: get_request_view(environ).scheme == "http",
+                                 url_from_environment=url_from_request_view,
+                                 insecure_schemes=("http",)),
+        DomainRedirectPreprocessor(url_from_environment=url_from_request_view,
+                                   source_domain_provider=lambda: ("example.com",),
+                                   target_domain_provider=lambda: "www.example.com"),
+    ))
+
+    def benchmark_application(environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        response_provider = redirect_chain.preprocess(environ=environ, start_response=start_response)
+        if response_provider is None:
+            return application(environ, start_response)
+
+        return response_provider(environ=environ, start_response=start_response)
+
+    return benchmark_application
+
+
+def call_application(application: Callable, environ: Dict) -> str:
+    statuses = []
+    body_chunks = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in body_chunks:
+            pass
+    finally:
+        if hasattr(body_chunks, "close"):
+            body_chunks.close()
+
+    return statuses[0]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def run_trial(application: Callable, environs: List[Dict]) -> Dict[str, float]:
+    # Starts every trial without garbage left by the previous one.
+    gc.collect()
+    latencies = []
+    started = time.perf_counter_ns()
+    for environ in environs:
+        request_started = time.perf_counter_ns()
+        call_application(application, environ)
+        latencies.append(time.perf_counter_ns() - request_started)
+    elapsed = time.perf_counter_ns() - started
+    latencies.sort()
+
+    return {"throughput_rps": len(environs) / (elapsed / 1e9),
+            "mean_us": sum(latencies) / len(latencies) / 1e3,
+            "p50_us": percentile(latencies, 0.50) / 1e3,
+            "p95_us": percentile(latencies, 0.95) / 1e3,
+            "p99_us": percentile(latencies, 0.99) / 1e3}
+
+
+def run_scenario(application: Callable, scenario: Scenario, request_count: int, warmup_count: int,
+                 allocation_request_count: int, trial_count: int = 1) -> Dict[str, float]:
+    os.environ.update(scenario.content)
+    environs = [scenario.environ_provider(index) for index in range(warmup_count + request_count * trial_count)]
+    status = call_application(application, environs[0])
+    if not status.startswith(scenario.expected_status):
+        raise RuntimeError("Scenario '{}' returned '{}', expected {}.".format(scenario.name, status, scenario.expected_status))
+
+    for environ in environs[:warmup_count]:
+        call_application(application, environ)
+
+    measured_environs = environs[warmup_count:]
+    trials = [run_trial(application, measured_environs[trial * request_count:(trial + 1) * request_count])
+              for trial in range(trial_count)]
+
+    allocation_environs = [scenario.environ_provider(index) for index in range(allocation_request_count)]
+    peak_allocations = []
+    retained_allocations = []
+    tracemalloc.start()
+    for environ in allocation_environs:
+        # Forgets earlier allocations and resets the peak (`reset_peak` needs Python 3.9), so that only this request counts.
+        tracemalloc.clear_traces()
+        call_application(application, environ)
+        retained, peak = tracemalloc.get_traced_memory()
+        peak_allocations.append(peak)
+        retained_allocations.append(retained)
+    tracemalloc.stop()
+
+    scenario_results = {"requests": request_count, "trials": trial_count}
+    for metric in trials[0]:
+        scenario_results[metric] = (max if metric == "throughput_rps" else min)(trial[metric] for trial in trials)
+    scenario_results["peak_allocated_bytes"] = sum(peak_allocations) / len(peak_allocations)
+    scenario_results["retained_bytes"] = sum(retained_allocations) / len(retained_allocations)
+
+    return scenario_results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, scenario_results in results["scenarios"].items():
+        baseline_results = baseline["scenarios"].get(name)
+        if baseline_results is None:
+            continue
+        for metric in COMPARED_METRICS:
+            change = scenario_results[metric] / baseline_results[metric] - 1
+            if change > threshold:
+                regressions.append("{} {}: {:.1f} -> {:.1f} ({:+.0%})".format(name, metric, baseline_results[metric],
+                                                                             scenario_results[metric], change))
+
+    return regressions
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario and trial")
+    parser.add_argument("--trials", type=int, default=5, help="measured runs per scenario, of which the best is reported")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests per scenario")
+    parser.add_argument("--allocation-requests", type=int, default=200, help="requests traced for allocations")
+    parser.add_argument("--scenario", action="append", choices=[scenario.name for scenario in SCENARIOS],
+                        help="run only this scenario (repeatable)")
+    parser.add_argument("--stage-timing", choices=("off", "hook", "server-timing"), default="off",
+                        help="time request stages and pass them to a no-op hook or a Server-Timing header")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare against the results saved in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed latency regression (0.25 is 25%%)")
+    options = parser.parse_args(arguments)
+
+    stage_timer = get_stage_timer(options.stage_timing)
+    applications = {}
+    results = {"python": platform.python_version(),
+               "platform": platform.platform(),
+               "stage_timing": options.stage_timing,
+               "scenarios": {}}
+    print("{:<16} {:>10} {:>9} {:>9} {:>9} {:>12} {:>10}".format("scenario", "req/s", "p50 us", "p95 us", "p99 us",
+                                                              "peak bytes", "retained"))
+    for scenario in SCENARIOS:
+        if options.scenario and scenario.name not in options.scenario:
+            continue
+        if scenario.settings not in applications:
+            applications[scenario.settings] = get_benchmark_application(stage_timer=stage_timer, settings=scenario.settings)
+        scenario_results = run_scenario(application=applications[scenario.settings],
+                                        scenario=scenario,
+                                        request_count=options.requests,
+                                        warmup_count=options.warmup,
+                                        allocation_request_count=options.allocation_requests,
+                                        trial_count=options.trials)
+        results["scenarios"][scenario.name] = scenario_results
+        print("{:<16} {:>10.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>12.0f} {:>10.0f}".format(
+            scenario.name, scenario_results["throughput_rps"], scenario_results["p50_us"], scenario_results["p95_us"],
+            scenario_results["p99_us"], scenario_results["peak_allocated_bytes"], scenario_results["retained_bytes"]))
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            regressions = compare(results=results, baseline=json.load(baseline_file), threshold=options.threshold)
+        for regression in regressions:
+            print("REGRESSION {}".format(regression))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+@lru_cache(maxsize=128)
+def negotiate_content_encoding(accept_encoding: Optional[str], available_encodings: Tuple[str, ...]) -> str:
+    """
+    Returns the first of `available_encodings` with the highest quality in an HTTP `Accept-Encoding` header, or
+    `"identity"` when none of them is acceptable or the client prefers an uncompressed response.
+    """
+    if not accept_encoding:
+        return "identity"
+
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *parameters = coding.split(";")
+        quality = 1.0
+        for parameter in parameters:
+            parameter_name, _, value = parameter.partition("=")
+            if parameter_name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    wildcard_quality = qualities.get("*")
+    identity_quality = qualities.get("identity", 1.0 if wildcard_quality is None else wildcard_quality)
+    best_encoding = "identity"
+    best_quality = 0.0
+    for encoding in available_encodings:
+        quality = qualities.get(encoding, 0.0 if wildcard_quality is None else wildcard_quality)
+        if quality > best_quality:
+            best_encoding = encoding
+            best_quality = quality
+
+    return best_encoding if best_quality >= identity_quality else "identity"
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from typing import Optional, Sequence, List, Tuple
+
+
+def parse_accept_header(accept: str) -> List[Tuple[str, str, float]]:
+    media_ranges = []
+    for media_range in accept.split(","):
+        media_type, *parameters = media_range.split(";")
+        media_type = media_type.strip().lower()
+        if media_type.count("/") != 1:
+            continue
+
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+
+        main_type, sub_type = media_type.split("/")
+        media_ranges.append((main_type, sub_type, quality))
+
+    return media_ranges
+
+
+class AcceptHeaderNegotiator(object):
+    """
+    Chooses which of the server's `representations` (media types) best matches an HTTP `Accept` header.
+
+    Representations are ranked by the quality of the most specific media range that matches them, then by that range's
+    specificity (`type/subtype` over `type/*` over `*/*`), then by their order in `representations`. The first
+    representation is returned when no header was sent or nothing in it is acceptable. Results are memoized in a bounded
+    LRU keyed by the raw header string, since clients only ever send a handful of distinct values.
+    """
+
+    def __init__(self, representations: Sequence[str], maximum_cache_size: int = 128) -> None:
+        super().__init__()
+        self._representations = tuple(representations)
+        self._media_types = tuple(representation.lower().split("/") for representation in representations)
+        self._default_representation = representations[0]
+        self._negotiate = lru_cache(maxsize=maximum_cache_size)(self._negotiate_uncached)
+
+    def __call__(self, accept: Optional[str]) -> str:
+        if accept is None:
+            return self._default_representation
+
+        return self._negotiate(accept)
+
+    def _negotiate_uncached(self, accept: str) -> str:
+        media_ranges = parse_accept_header(accept)
+        best_rank = None
+        best_representation = self._default_representation
+        for index, (main_type, sub_type) in enumerate(self._media_types):
+            best_match = None
+            for range_main_type, range_sub_type, quality in media_ranges:
+                if range_main_type == "*":
+                    specificity = 0
+                elif range_main_type != main_type or range_sub_type not in ("*", sub_type):
+                    continue
+                elif range_sub_type == "*":
+                    specificity = 1
+                else:
+                    specificity = 2
+
+                if best_match is None or specificity > best_match[1]:
+                    best_match = (quality, specificity)
+
+            if best_match is None or best_match[0] <= 0:
+                continue
+
+            rank = (best_match[0], best_match[1], -index)
+            if best_rank is None or rank > best_rank:
+                best_rank = rank
+                best_representation = self._representations[index]
+
+        return best_representation
@@ -0,0 +1,197 @@
+import atexit
+import json
+import os
+import threading
+import time
+from queue import Empty, Full, Queue
+from select import PIPE_BUF
+from threading import Lock
+from time import perf_counter_ns
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from brochure_wsgi.closing_body import close_with
+from brochure_wsgi.request_view import get_request_view
+from brochure_wsgi.response_providers.caching_response_provider import collect_cache_outcomes, reset_cache_outcomes
+
+_STOP = object()
+
+
+class AccessLog(object):
+    """
+    Writes one JSON object per request to `stream`, without ever making a request wait for it.
+
+    Each entry holds the time the request finished (seconds since the epoch), its method, path and host, the status
+    code, media type and body size of the response (`null` for streamed bodies), the time taken to produce and send it
+    in seconds (a streamed body is sent once the server closes it) and whether it came from a response cache (`"hit"`,
+    `"miss"`, or `null` when no response cache was involved).
+
+    Requests only put a tuple on a queue of up to `maximum_queue_size` entries; a background thread formats and writes
+    them in batches of up to `batch_size`. Entries that find the queue full are dropped and counted in `dropped`, as are
+    entries that could not be written. The thread is started by the first entry of each process, so it works in
+    pre-fork workers, and `close` writes out everything queued before it returns (it also runs at interpreter exit).
+
+    Each batch is written in chunks of whole lines of up to `maximum_write_size` bytes (`PIPE_BUF` by default), so that
+    pre-fork workers sharing one pipe (e.g. standard output) never interleave their lines: writes of up to `PIPE_BUF`
+    bytes to a pipe are atomic. Only a single line longer than that can still be interleaved.
+    """
+
+    def __init__(self,
+                 stream: BinaryIO,
+                 maximum_queue_size: int = 8192,
+                 batch_size: int = 256,
+                 maximum_write_size: int = PIPE_BUF,
+                 clock: Callable[[], float] = time.time,
+                 thread_factory: Callable[..., threading.Thread] = threading.Thread) -> None:
+        super().__init__()
+        self._stream = stream
+        self._maximum_queue_size = maximum_queue_size
+        self._batch_size = batch_size
+        self._maximum_write_size = maximum_write_size
+        self._clock = clock
+        self._thread_factory = thread_factory
+        self._queue = None
+        self._writer = None
+        self._writer_pid = None
+        self._closes_at_exit = False
+        self._lock = Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def observe_request(self, environ: Dict, start_response: Callable, application: Callable) -> Iterable[bytes]:
+        response_start = [None, None]
+
+        def recording_start_response(status: str, headers, *args):
+            response_start[0] = status
+            response_start[1] = headers
+
+            return start_response(status, headers, *args)
+
+        cache_outcomes = []
+        body = None
+
+        def record_request() -> None:
+            duration = (perf_counter_ns() - started) / 1e9
+            request_view = get_request_view(environ)
+            self.record((self._clock(),
+                         environ.get("REQUEST_METHOD"),
+                         request_view.path,
+                         request_view.host,
+                         response_start[0],
+                         response_start[1],
+                         sum(map(len, body)) if isinstance(body, list) else None,
+                         duration,
+                         cache_outcomes[-1] if cache_outcomes else None))
+
+        token = collect_cache_outcomes(cache_outcomes)
+        started = perf_counter_ns()
+        try:
+            body = application(environ, recording_start_response)
+        except BaseException:
+            record_request()
+            raise
+        finally:
+            reset_cache_outcomes(token)
+
+        return close_with(body, record_request)
+
+    def record(self, entry: Tuple) -> None:
+        queue = self._queue if self._writer_pid == os.getpid() else self._start_writer()
+        try:
+            queue.put_nowait(entry)
+        except Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                return
+            queue, writer = self._queue, self._writer
+            self._writer_pid = None
+        try:
+            queue.put(_STOP, timeout=timeout)
+        except Full:
+            return
+        writer.join(timeout)
+
+    def _start_writer(self) -> Queue:
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                # A forked worker inherits neither the writer thread nor a usable queue, so it gets its own.
+                self._queue = Queue(maxsize=self._maximum_queue_size)
+                self._writer = self._thread_factory(target=self._write_batches,
+                                                    args=(self._queue,),
+                                                    name="brochure-access-log",
+                                                    daemon=True)
+                self._writer.start()
+                self._writer_pid = os.getpid()
+                if not self._closes_at_exit:
+                    atexit.register(self.close)
+                    self._closes_at_exit = True
+
+            return self._queue
+
+    def _write_batches(self, queue: Queue) -> None:
+        while True:
+            batch = [queue.get()]
+            while batch[-1] is not _STOP and len(batch) < self._batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except Empty:
+                    break
+            is_stopping = batch[-1] is _STOP
+            if is_stopping:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if is_stopping:
+                return
+
+    def _write(self, batch: List[Tuple]) -> None:
+        lines = [json.dumps(format_entry(entry), separators=(",", ":")).encode("utf-8") + b"\n" for entry in batch]
+        try:
+            for chunk in join_lines(lines, maximum_size=self._maximum_write_size):
+                self._stream.write(chunk)
+                self._stream.flush()
+        except (OSError, ValueError):
+            self.dropped += len(batch)
+        else:
+            self.written += len(batch)
+
+
+def join_lines(lines: List[bytes], maximum_size: int) -> Iterator[bytes]:
+    """
+    Joins the non-empty list `lines` into chunks of at most `maximum_size` bytes without splitting any line; a line
+    longer than that is a chunk of its own.
+    """
+    chunk = []
+    chunk_size = 0
+    for line in lines:
+        if chunk and chunk_size + len(line) > maximum_size:
+            yield b"".join(chunk)
+            chunk = []
+            chunk_size = 0
+        chunk.append(line)
+        chunk_size += len(line)
+    yield b"".join(chunk)
+
+
+def format_entry(entry: Tuple) -> Dict:
+    finished_at, method, path, host, status, headers, size, duration, cache_outcome = entry
+
+    return {"time": round(finished_at, 3),
+            "method": method,
+            "path": path,
+            "host": host,
+            "status": int(status.split(" ", 1)[0]) if status else None,
+            "representation": _media_type(headers),
+            "bytes": size,
+            "duration": round(duration, 6),
+            "cache": cache_outcome}
+
+
+def _media_type(headers: Optional[List[Tuple[str, str]]]) -> Optional[str]:
+    for name, value in headers or ():
+        if name.lower() == "content-type":
+            return value.split(";", 1)[0].strip()
+
+    return None
@@ -0,0 +1,161 @@
+import asyncio
+import sys
+from concurrent.futures import Executor
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, List, Tuple
+
+from brochure_wsgi.brochure_wsgi_application import BrochureWSGIApplication, get_brochure_wsgi_application
+from brochure_wsgi.single_flight import AsyncSingleFlight
+from brochure_wsgi.value_fetchers.content_fetchers import can_fetch_without_blocking, get_content_fetchers
+
+
+class WSGIResponseCollector(object):
+    """
+    `start_response` callable that records the status line and headers of a WSGI response.
+    """
+
+    def __init__(self) -> None:
+        self.status_code = 500
+        self.headers = []
+        super().__init__()
+
+    def __call__(self, status: str, headers: List[Tuple[str, str]], exc_info=None) -> Callable[[bytes], None]:
+        self.status_code = int(status.split(" ", 1)[0])
+        self.headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+        return lambda data: None  # pragma nocover
+
+
+def environ_from_scope(scope: Dict) -> Dict:
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    client_address = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": "HTTP/{}".format(scope.get("http_version", "1.1")),
+        "REMOTE_ADDR": client_address[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else "HTTP_{}".format(name)
+        environ[key] = "{},{}".format(environ[key], value) if key in environ else value
+
+    return environ
+
+
+class BrochureASGIApplication(object):
+    """
+    ASGI application that serves the responses of a `BrochureWSGIApplication` from an asyncio event loop.
+
+    Each incoming HTTP request is translated into a WSGI `environ` and:
+        - The WSGI application is called, with its access log, metrics and stage timings, on the event loop when
+          `processes_without_blocking` says its fetchers can answer from memory, and on `executor` (the loop's default
+          executor when `None`) otherwise
+        - The resulting WSGI response is sent as an ASGI `http.response.start` message and one `http.response.body`
+          message per chunk; streamed bodies (large sections, static files) are iterated on `executor`
+
+    With a `content_loader`, requests that arrive while the fetchers cannot answer from memory (e.g. at a cold start)
+    first await one shared run of `content_loader` on `executor` (see `AsyncSingleFlight`) instead of each blocking an
+    executor thread, and are then served on the event loop if the content was loaded.
+    """
+
+    def __init__(self,
+                 wsgi_application: BrochureWSGIApplication,
+                 processes_without_blocking: Callable[[], bool] = lambda: False,
+                 executor: Optional[Executor] = None,
+                 content_loader: Optional[Callable[[], None]] = None) -> None:
+        self._wsgi_application = wsgi_application
+        self._processes_without_blocking = processes_without_blocking
+        self._executor = executor
+        self._content_loader = content_loader
+        self._single_flight = AsyncSingleFlight()
+        super().__init__()
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive=receive, send=send)
+        elif scope["type"] == "http":
+            await self._http(scope=scope, send=send)
+
+    async def _http(self, scope: Dict, send: Callable) -> None:
+        environ = environ_from_scope(scope)
+        start_response = WSGIResponseCollector()
+        if self._content_loader is not None and not self._processes_without_blocking():
+            await self._single_flight.do(key="content", coroutine_function=self._load_content)
+        if self._processes_without_blocking():
+            body_chunks = self._wsgi_application(environ, start_response)
+        else:
+            loop = asyncio.get_running_loop()
+            body_chunks = await loop.run_in_executor(self._executor, self._wsgi_application, environ, start_response)
+
+        try:
+            await send({"type": "http.response.start", "status": start_response.status_code, "headers": start_response.headers})
+            await self._send_body(body_chunks=body_chunks, send=send)
+        finally:
+            if hasattr(body_chunks, "close"):
+                body_chunks.close()
+
+    async def _send_body(self, body_chunks: Iterable[bytes], send: Callable) -> None:
+        if isinstance(body_chunks, list):
+            for chunk in body_chunks[:-1]:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": body_chunks[-1] if body_chunks else b"", "more_body": False})
+
+            return
+
+        # Streamed bodies may read files or render templates, so each chunk is produced on the executor.
+        loop = asyncio.get_running_loop()
+        chunks = iter(body_chunks)
+        chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+        while chunk is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _load_content(self) -> None:
+        loop = asyncio.get_running_loop()
+        # noinspection PyBroadException
+        try:
+            await loop.run_in_executor(self._executor, self._content_loader)
+        except Exception:
+            # Processing on the executor renders the failure like any other fetcher exception.
+            pass
+
+    @staticmethod
+    async def _lifespan(receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+
+                return
+
+
+def get_brochure_asgi_application(executor: Optional[Executor] = None) -> BrochureASGIApplication:
+    fetchers = get_content_fetchers()
+
+    def processes_without_blocking() -> bool:
+        return can_fetch_without_blocking(fetchers)
+
+    def content_loader() -> None:
+        for fetcher in fetchers:
+            fetcher.get_snapshot()
+
+    return BrochureASGIApplication(wsgi_application=get_brochure_wsgi_application(),
+                                   processes_without_blocking=processes_without_blocking,
+                                   executor=executor,
+                                   content_loader=content_loader)
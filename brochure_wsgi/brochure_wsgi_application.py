@@ -1,17 +1,27 @@
 import os
-from typing import Callable, Optional, Iterable
+import sys
+from functools import partial
+from typing import Callable, Optional, Iterable, Dict, Tuple
 
 from brochure.brochure_application import BrochureApplication
 from brochure.commands.command_types import CommandType
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.routing import Map, Rule
 
-from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
-from brochure_wsgi.command_preprocessors.favicon_preprocessor import FaviconPreprocessor
+from brochure_wsgi.circuit_breaker import CircuitBreaker
+from brochure_wsgi.closing_body import close_with
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, finish_request
+from brochure_wsgi.command_preprocessors.not_modified_preprocessor import NotModifiedPreprocessor
+from brochure_wsgi.command_preprocessors.preprocessor_chain import PreprocessorChain
+from brochure_wsgi.command_preprocessors.static_directory_preprocessor import StaticDirectoryPreprocessor
 from brochure_wsgi.http_user_interface import HTTPUserInterface, HTTPUserInterfaceProvider
 from brochure_wsgi.path_command_provider import GetPathCommandProvider
-from brochure_wsgi.value_fetchers.environment_contact_method_fetcher import environment_contact_method_fetcher
-from brochure_wsgi.value_fetchers.environment_cover_section_fetcher import environment_cover_section_fetcher
-from brochure_wsgi.value_fetchers.environment_enterprise_fetcher import environment_enterprise_fetcher
+from brochure_wsgi.stage_timer import StageTimer, current_request_timings
+from brochure_wsgi.static_file_index import StaticFileIndex
+from brochure_wsgi.thread_local_domain_application_provider import ThreadLocalDomainApplicationProvider
+from brochure_wsgi.validator_cache import ValidatorCache
+from brochure_wsgi.value_fetchers.content_fetchers import ContentFetchers, get_content_fetchers, get_last_modified_provider, \
+    get_refreshing_fetchers
 
 
 class BrochureWSGIApplication(object):
@@ -21,63 +31,301 @@ class BrochureWSGIApplication(object):
     Each incoming HTTP request will invoke `__call__` with request data inside `environ`.
 
     The `BrochureWSGIApplication` will then:
-        - Handle any "web-only" application features (i.e favicons)
-        - Register a new `UserInterface` object with the brochure application
+        - Handle any "web-only" application features (i.e static files, conditional requests) in `preprocess`
+        - Register a new `UserInterface` object with the brochure application owned by the current thread
         - Turn the incoming request into a brochure application command (using the `GetPathCommandProvider`) and
           feed it into the application's `process_command` method.
         - Internally, the domain application injects its response into the `HTTPUserInterface`
-        - Use the `HTTPUserInterface` to generate a werkzeug `Response` callable
+        - Use the `HTTPUserInterface` to generate a werkzeug `Response` callable (the result of `process`)
         - Call the `Response` callable and return its result
+
+    With a `circuit_breaker`, requests keep getting their last good response while processing fails (see
+    `CircuitBreaker`). With an `access_log`, every request is logged to it. `close` writes out the last access log entries
+    and request metrics, e.g. before a pre-fork worker exits.
     """
 
     def __init__(self,
                  domain_application: BrochureApplication,
                  user_interface_provider: Callable[[str, Optional[str]], HTTPUserInterface],
                  get_path_command_provider: GetPathCommandProvider,
-                 command_preprocessors: Optional[Iterable[CommandPreprocessor]] = None):
+                 command_preprocessors: Optional[Iterable[CommandPreprocessor]] = None,
+                 domain_application_provider: Optional[Callable[[], BrochureApplication]] = None,
+                 validator_cache: Optional[ValidatorCache] = None,
+                 stage_timer: Optional[StageTimer] = None,
+                 request_metrics: Optional["RequestMetrics"] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 access_log: Optional["AccessLog"] = None):
         super().__init__()
         self._domain_application = domain_application
+        self._domain_application_provider = domain_application_provider or (lambda: domain_application)
         self._user_interface_provider = user_interface_provider
         self._get_path_command_provider = get_path_command_provider
         self._command_preprocessors = command_preprocessors
+        self._preprocessor_chain = PreprocessorChain(command_preprocessors=command_preprocessors or tuple())
+        self._validator_cache = validator_cache
+        self._stage_timer = stage_timer
+        self._request_metrics = request_metrics
+        self._circuit_breaker = circuit_breaker
+        self._access_log = access_log
 
     def __call__(self, environ, start_response: Callable):
-        for command_preprocessor in self._command_preprocessors or tuple():
-            response_provider = command_preprocessor.preprocess(environ=environ, start_response=start_response)
-            if response_provider is not None:
-                return response_provider(environ=environ, start_response=start_response)
+        if self._access_log is not None:
+            return self._access_log.observe_request(environ=environ,
+                                                    start_response=start_response,
+                                                    application=self._call_with_optional_metrics)
+
+        return self._call_with_optional_metrics(environ, start_response)
+
+    def close(self) -> None:
+        if self._request_metrics is not None:
+            self._request_metrics.close()
+        if self._access_log is not None:
+            self._access_log.close()
+
+    def _call_with_optional_metrics(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        if self._request_metrics is not None:
+            return self._request_metrics.observe_request(environ=environ,
+                                                         start_response=start_response,
+                                                         application=self._call_with_optional_timing)
+
+        return self._call_with_optional_timing(environ, start_response)
+
+    def _call_with_optional_timing(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        if self._stage_timer is not None:
+            return self._stage_timer.time_request(environ=environ, start_response=start_response, application=self._timed_call)
+
+        return self._serve(environ=environ, start_response=start_response)
+
+    def _serve(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        try:
+            response_provider = self.preprocess(environ=environ, start_response=start_response)
+            if response_provider is None:
+                response_provider = self.process(environ=environ)
+
+            body = response_provider(environ=environ, start_response=start_response)
+        except BaseException:
+            finish_request(environ)
+            raise
+
+        # A streamed body is still being produced while the server sends it, so the request finishes when it is closed.
+        return close_with(body, partial(finish_request, environ))
+
+    def _timed_call(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        timings = current_request_timings()
+        try:
+            with timings.stage("preprocess"):
+                response_provider = self.preprocess(environ=environ, start_response=start_response)
+            if response_provider is None:
+                response_provider = self.process(environ=environ)
+
+            with timings.stage("response"):
+                body = response_provider(environ=environ, start_response=start_response)
+        except BaseException:
+            finish_request(environ)
+            raise
+
+        return close_with(body, partial(finish_request, environ))
 
+    def warm_up(self, environs: Iterable[Dict]) -> None:
+        """
+        Serves `environs` and discards the responses, without recording metrics or stage timings, so that caches are
+        filled before the application takes real requests (e.g. before a pre-fork server forks its workers).
+        """
+        for environ in environs:
+            body_chunks = self._serve(environ=environ, start_response=lambda status, headers, exc_info=None: None)
+            for _ in body_chunks:
+                pass
+            if hasattr(body_chunks, "close"):
+                body_chunks.close()
+
+    def preprocess(self, environ: Dict, start_response: Callable) -> Optional[Callable[[Dict, Callable], Iterable[bytes]]]:
+        return self._preprocessor_chain.preprocess(environ=environ, start_response=start_response)
+
+    def process(self, environ: Dict) -> Callable[[Dict, Callable], Iterable[bytes]]:
+        if self._circuit_breaker is not None:
+            return self._circuit_breaker.call(environ=environ, function=lambda: self._process(environ=environ))
+
+        return self._process(environ=environ)
+
+    def _process(self, environ: Dict) -> Callable[[Dict, Callable], Iterable[bytes]]:
+        content_version = self._validator_cache.get_content_version() if self._validator_cache is not None else None
         path = environ.get("PATH_INFO")
         maybe_accept_header = environ.get("HTTP_ACCEPT")
         user_interface = self._user_interface_provider(path, maybe_accept_header)
-        self._domain_application.register_user_interface(user_interface=user_interface)
+        domain_application = self._domain_application_provider()
+        domain_application.register_user_interface(user_interface=user_interface)
 
         path_command_provider = self._get_path_command_provider(environ=environ)
-        self._domain_application.process_command(command_provider=path_command_provider)
+        timings = current_request_timings()
+        if timings is None:
+            domain_application.process_command(command_provider=path_command_provider)
+        else:
+            with timings.stage("process_command"):
+                domain_application.process_command(command_provider=path_command_provider)
         response_provider = user_interface.get_response_provider()
+        if self._validator_cache is not None:
+            self._validator_cache.remember(environ=environ, content_version=content_version, response=response_provider)
 
-        return response_provider(environ=environ, start_response=start_response)
+        return response_provider
 
 
-def get_brochure_wsgi_application() -> BrochureWSGIApplication:
+def get_path_command_provider() -> GetPathCommandProvider:
     brochure_application_command_map = Map()
     brochure_application_command_map.add(Rule("/", endpoint=lambda: CommandType.SHOW_COVER))
-    get_path_command_provider = GetPathCommandProvider(url_map=brochure_application_command_map)
 
-    domain_application = BrochureApplication(contact_method_fetcher=environment_contact_method_fetcher,
-                                             cover_section_fetcher=environment_cover_section_fetcher,
-                                             enterprise_fetcher=environment_enterprise_fetcher)
-    user_interface_provider = HTTPUserInterfaceProvider()
+    return GetPathCommandProvider(url_map=brochure_application_command_map)
+
+
+def get_static_file_index() -> StaticFileIndex:
+    packaged_static_file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "static")
+    static_file_path = os.environ.get("BROCHURE_STATIC_DIRECTORY") or packaged_static_file_path
+    favicon_aliases = {}
+    if os.path.isfile(os.path.join(static_file_path, "favicon.ico")):
+        favicon_aliases["/favicon.ico"] = "favicon.ico"
+
+    return StaticFileIndex(directory=static_file_path,
+                           aliases=favicon_aliases,
+                           maximum_memory_size=int(os.environ.get("BROCHURE_STATIC_MEMORY_LIMIT", 16 * 1024 * 1024)))
+
+
+def get_template_bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    template_cache_directory = os.environ.get("BROCHURE_TEMPLATE_CACHE_DIRECTORY")
+    if not template_cache_directory:
+        return None
+
+    os.makedirs(template_cache_directory, exist_ok=True)
+
+    return FileSystemBytecodeCache(directory=template_cache_directory)
+
+
+def get_admission_control_preprocessors() -> Tuple[CommandPreprocessor, ...]:
+    requests_per_second = os.environ.get("BROCHURE_RATE_LIMIT")
+    maximum_in_flight = os.environ.get("BROCHURE_MAXIMUM_IN_FLIGHT")
+    if not requests_per_second and not maximum_in_flight:
+        return ()
 
-    favicon_url_path = "/favicon.ico"
-    static_file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "static")
-    favicon_file_path = os.path.join(static_file_path, "favicon.ico")
-    favicon_preprocessor = FaviconPreprocessor(favicon_url_path=favicon_url_path,
-                                               favicon_file_path=favicon_file_path,
-                                               request_path_provider=lambda e: e.get("PATH_INFO"))
-    command_preprocessors = (favicon_preprocessor,)
+    from brochure_wsgi.command_preprocessors.admission_control_preprocessor import AdmissionControlPreprocessor
+
+    burst = os.environ.get("BROCHURE_RATE_LIMIT_BURST")
+
+    return AdmissionControlPreprocessor(requests_per_second=float(requests_per_second) if requests_per_second else None,
+                                        burst=float(burst) if burst else None,
+                                        trusted_proxy_depth=int(os.environ.get("BROCHURE_TRUSTED_PROXY_DEPTH", "0")),
+                                        maximum_in_flight=int(maximum_in_flight) if maximum_in_flight else None),
+
+
+def get_access_log() -> Optional["AccessLog"]:
+    access_log_path = os.environ.get("BROCHURE_ACCESS_LOG")
+    if not access_log_path:
+        return None
+
+    from brochure_wsgi.access_log import AccessLog
+
+    stream = sys.stdout.buffer if access_log_path == "-" else open(access_log_path, "ab", buffering=0)
+
+    return AccessLog(stream=stream, maximum_queue_size=int(os.environ.get("BROCHURE_ACCESS_LOG_QUEUE_SIZE", "8192")))
+
+
+def get_host_redirect_preprocessors() -> Tuple[CommandPreprocessor, ...]:
+    host_redirect_file_path = os.environ.get("BROCHURE_HOST_REDIRECT_FILE")
+    if not host_redirect_file_path:
+        return ()
+
+    # Optional features are imported only when they are configured, so workers that don't use them start faster.
+    from brochure_wsgi.command_preprocessors.host_redirect_preprocessor import HostRedirectPreprocessor
+    from brochure_wsgi.host_redirect_table import HostRedirectTable
+
+    host_redirect_table = HostRedirectTable.from_file(file_path=host_redirect_file_path)
+
+    return HostRedirectPreprocessor(host_redirect_table=host_redirect_table),
+
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    probe_interval = float(os.environ.get("BROCHURE_CIRCUIT_BREAKER_PROBE_INTERVAL", "1"))
+    if probe_interval <= 0:
+        return None
+
+    return CircuitBreaker(probe_interval=probe_interval)
+
+
+def get_site_application(content_fetchers: ContentFetchers,
+                         user_interface_provider: HTTPUserInterfaceProvider,
+                         get_path_command_provider: GetPathCommandProvider,
+                         command_preprocessors: Iterable[CommandPreprocessor] = (),
+                         stage_timer: Optional[StageTimer] = None,
+                         request_metrics: Optional["RequestMetrics"] = None,
+                         circuit_breaker: Optional[CircuitBreaker] = None,
+                         access_log: Optional["AccessLog"] = None) -> BrochureWSGIApplication:
+    """
+    Builds the application that serves the content of `content_fetchers`, answering conditional requests after
+    `command_preprocessors`.
+    """
+    def domain_application_factory() -> BrochureApplication:
+        return BrochureApplication(contact_method_fetcher=content_fetchers.contact_method,
+                                   cover_section_fetcher=content_fetchers.cover_section,
+                                   enterprise_fetcher=content_fetchers.enterprise)
+
+    domain_application = domain_application_factory()
+    domain_application_provider = ThreadLocalDomainApplicationProvider(
+        domain_application_factory=domain_application_factory,
+        initial_domain_application=domain_application)
+    validator_cache = ValidatorCache(
+        content_version_provider=lambda: tuple(fetcher.get_snapshot() for fetcher in content_fetchers))
+    not_modified_preprocessor = NotModifiedPreprocessor(validator_cache=validator_cache)
 
     return BrochureWSGIApplication(domain_application=domain_application,
                                    user_interface_provider=user_interface_provider,
                                    get_path_command_provider=get_path_command_provider,
-                                   command_preprocessors=command_preprocessors)
+                                   command_preprocessors=tuple(command_preprocessors) + (not_modified_preprocessor,),
+                                   domain_application_provider=domain_application_provider,
+                                   validator_cache=validator_cache,
+                                   stage_timer=stage_timer,
+                                   request_metrics=request_metrics,
+                                   circuit_breaker=circuit_breaker,
+                                   access_log=access_log)
+
+
+def get_brochure_wsgi_application(stage_timer: Optional[StageTimer] = None) -> BrochureWSGIApplication:
+    static_file_index = get_static_file_index()
+    content_fetchers = get_content_fetchers()
+    user_interface_provider = HTTPUserInterfaceProvider(static_url_provider=static_file_index.url_for,
+                                                        template_bytecode_cache=get_template_bytecode_cache(),
+                                                        last_modified_provider=get_last_modified_provider(content_fetchers))
+    command_preprocessors = get_admission_control_preprocessors() + get_host_redirect_preprocessors() + (
+        StaticDirectoryPreprocessor(static_file_index=static_file_index),)
+
+    request_metrics = None
+    metrics_path = os.environ.get("BROCHURE_METRICS_PATH")
+    if metrics_path:
+        from brochure_wsgi.command_preprocessors.metrics_preprocessor import MetricsPreprocessor
+        from brochure_wsgi.metrics.metrics_registry import MetricsRegistry
+        from brochure_wsgi.metrics.request_metrics import RequestMetrics, register_content_refresh_metrics, \
+            register_response_cache_metrics
+
+        metrics_registry = MetricsRegistry()
+        register_response_cache_metrics(registry=metrics_registry, response_caches=user_interface_provider.response_caches)
+        register_content_refresh_metrics(registry=metrics_registry,
+                                         refreshing_fetchers=get_refreshing_fetchers(content_fetchers))
+        metrics_collector = metrics_registry.collect
+        on_request_finished = None
+        on_close = None
+        metrics_directory_path = os.environ.get("BROCHURE_METRICS_DIRECTORY")
+        if metrics_directory_path:
+            from brochure_wsgi.metrics.metrics_directory import MetricsDirectory
+
+            metrics_directory = MetricsDirectory(directory=metrics_directory_path, registry=metrics_registry)
+            metrics_collector = metrics_directory.collect
+            on_request_finished = metrics_directory.maybe_flush
+            on_close = metrics_directory.close
+        request_metrics = RequestMetrics(registry=metrics_registry, on_request_finished=on_request_finished, on_close=on_close)
+        metrics_preprocessor = MetricsPreprocessor(metrics_path=metrics_path, metrics_collector=metrics_collector)
+        command_preprocessors = (metrics_preprocessor,) + command_preprocessors
+
+    return get_site_application(content_fetchers=content_fetchers,
+                                user_interface_provider=user_interface_provider,
+                                get_path_command_provider=get_path_command_provider(),
+                                command_preprocessors=command_preprocessors,
+                                stage_timer=stage_timer,
+                                request_metrics=request_metrics,
+                                circuit_breaker=get_circuit_breaker(),
+                                access_log=get_access_log())
@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.validator_cache import validator_key_from_environment
+
+ResponseProvider = Callable[[Dict, Callable], Iterable[bytes]]
+
+
+def is_server_error(response_provider: ResponseProvider) -> bool:
+    return str(getattr(response_provider, "status", "")).startswith("5")
+
+
+def is_successful(response_provider: ResponseProvider) -> bool:
+    return str(getattr(response_provider, "status", "")).startswith("2")
+
+
+class _Circuit(object):
+    __slots__ = ("consecutive_failures", "next_probe_at", "last_good_response", "last_failure_response")
+
+    def __init__(self) -> None:
+        self.consecutive_failures = 0
+        self.next_probe_at = None
+        self.last_good_response = None
+        self.last_failure_response = None
+
+
+class CircuitBreaker(object):
+    """
+    Keeps serving the last good response for each request key (path and `Accept` header) while processing it fails.
+
+    A request fails when processing raises or returns a server error (e.g. the 500 page shown when a fetcher raises).
+    After `failure_threshold` failures in a row for a key, its breaker opens: requests for that key are answered
+    without processing them at all, with the last good response for the key or else its last failure, and only one of
+    them every `probe_interval` seconds is processed to find out whether the failure is over. A probe that succeeds
+    closes the breaker again. Requests for other keys are processed as usual.
+
+    Failed requests that have a last good response get it instead of the failure even while the breaker is closed. Only
+    replayable (`CachedResponse`) `2xx` responses are remembered, for the `maximum_size` most recently used keys, so
+    requests for missing pages (e.g. from scanners) neither get remembered nor push out the pages that exist.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 3,
+                 probe_interval: float = 1.0,
+                 maximum_size: int = 256,
+                 key_provider: Callable[[Dict], Hashable] = validator_key_from_environment,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__()
+        self._failure_threshold = failure_threshold
+        self._probe_interval = probe_interval
+        self._maximum_size = maximum_size
+        self._key_provider = key_provider
+        self._clock = clock
+        self._circuits = OrderedDict()
+        self._lock = Lock()
+        self.fallbacks = 0
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return any(circuit.next_probe_at is not None for circuit in self._circuits.values())
+
+    def call(self, environ: Dict, function: Callable[[], ResponseProvider]) -> ResponseProvider:
+        key = self._key_provider(environ)
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is not None and circuit.next_probe_at is not None:
+                now = self._clock()
+                if now < circuit.next_probe_at:
+                    fallback = circuit.last_good_response or circuit.last_failure_response
+                    if fallback is not None:
+                        self.fallbacks += 1
+
+                        return fallback
+                else:
+                    # This request is the probe; until it is done, the others keep getting fallbacks.
+                    circuit.next_probe_at = now + self._probe_interval
+
+        try:
+            response_provider = function()
+        except Exception:
+            last_good_response = self._record_failure(key=key, response_provider=None)
+            if last_good_response is None:
+                raise
+
+            return last_good_response
+
+        if is_server_error(response_provider):
+            last_good_response = self._record_failure(key=key, response_provider=response_provider)
+
+            return last_good_response if last_good_response is not None else response_provider
+
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is not None:
+                circuit.consecutive_failures = 0
+                circuit.next_probe_at = None
+            if isinstance(response_provider, CachedResponse) and is_successful(response_provider):
+                self._get_circuit(key).last_good_response = response_provider
+
+        return response_provider
+
+    def _record_failure(self, key: Hashable, response_provider: Optional[ResponseProvider]) -> Optional[ResponseProvider]:
+        with self._lock:
+            circuit = self._get_circuit(key)
+            circuit.consecutive_failures += 1
+            if circuit.consecutive_failures >= self._failure_threshold and circuit.next_probe_at is None:
+                circuit.next_probe_at = self._clock() + self._probe_interval
+            if isinstance(response_provider, CachedResponse):
+                circuit.last_failure_response = response_provider
+            if circuit.last_good_response is not None:
+                self.fallbacks += 1
+
+            return circuit.last_good_response
+
+    def _get_circuit(self, key: Hashable) -> _Circuit:
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit()
+            if len(self._circuits) > self._maximum_size:
+                self._circuits.popitem(last=False)
+        else:
+            self._circuits.move_to_end(key)
+
+        return circuit
@@ -0,0 +1,37 @@
+from typing import Callable, Iterable, Iterator
+
+
+class ClosingBody(object):
+    """
+    WSGI response body that yields the chunks of `body` and, when the server closes it, closes `body` and then calls
+    `on_close`.
+    """
+
+    __slots__ = ("_body", "_on_close")
+
+    def __init__(self, body: Iterable[bytes], on_close: Callable[[], None]) -> None:
+        self._body = body
+        self._on_close = on_close
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._body)
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._on_close()
+
+
+def close_with(body: Iterable[bytes], on_close: Callable[[], None]) -> Iterable[bytes]:
+    """
+    Has `on_close` called once the server is done with `body`: right away for a list, which is already complete, and
+    when the server closes the body for streamed bodies, which are produced while the server sends them.
+    """
+    if isinstance(body, list):
+        on_close()
+
+        return body
+
+    return ClosingBody(body=body, on_close=on_close)
@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, call_when_request_finished
+from brochure_wsgi.response_providers.bytes_response import BytesResponse
+
+
+def get_client_address(environ: Dict, trusted_proxy_depth: int = 0) -> str:
+    """
+    Returns the address of the client that sent a request through `trusted_proxy_depth` proxies, each of which appends
+    the address it received the request from to `X-Forwarded-For`. Entries beyond the trusted ones can be forged by the
+    client and are ignored; when there are fewer entries than trusted proxies, the peer address is used.
+    """
+    remote_address = environ.get("REMOTE_ADDR", "")
+    if trusted_proxy_depth <= 0:
+        return remote_address
+
+    forwarded_addresses = [address.strip() for address in environ.get("HTTP_X_FORWARDED_FOR", "").split(",")]
+    if len(forwarded_addresses) < trusted_proxy_depth or not forwarded_addresses[-trusted_proxy_depth]:
+        return remote_address
+
+    return forwarded_addresses[-trusted_proxy_depth]
+
+
+class AdmissionControlPreprocessor(CommandPreprocessor):
+    """
+    Sheds load before any routing or rendering happens.
+
+    Each client address (see `get_client_address`) gets a token bucket that holds up to `burst` requests and refills at
+    `requests_per_second`; a client whose bucket is empty gets `429 Too Many Requests`. Buckets are kept for the
+    `maximum_clients` most recently seen clients only, so a forgotten client starts again with a full bucket. While
+    `maximum_in_flight` admitted requests are being processed or their bodies sent (until the server closes them),
+    further requests get `503 Service Unavailable`. Both responses are built once and carry `Retry-After: retry_after`.
+
+    The limits apply to each process on its own; a pre-fork server with N workers admits up to N times as much.
+    """
+
+    def __init__(self,
+                 requests_per_second: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 maximum_clients: int = 10000,
+                 trusted_proxy_depth: int = 0,
+                 maximum_in_flight: Optional[int] = None,
+                 retry_after: int = 1,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__()
+        self._requests_per_second = requests_per_second
+        self._burst = burst if burst is not None else max(requests_per_second or 0.0, 1.0)
+        self._maximum_clients = maximum_clients
+        self._trusted_proxy_depth = trusted_proxy_depth
+        self._maximum_in_flight = maximum_in_flight
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._in_flight = 0
+        self._lock = Lock()
+        retry_after_headers = (("Retry-After", str(retry_after)),)
+        self._rate_limited_response = BytesResponse(b"Too many requests.\n", status=429,
+                                                    content_type="text/plain; charset=utf-8", headers=retry_after_headers)
+        self._overloaded_response = BytesResponse(b"Service unavailable.\n", status=503,
+                                                  content_type="text/plain; charset=utf-8", headers=retry_after_headers)
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def preprocess(self,
+                   environ: Dict,
+                   start_response: Callable) -> Optional[BytesResponse]:
+        if self._requests_per_second is not None and not self._take_token(environ):
+            return self._rate_limited_response
+
+        if self._maximum_in_flight is not None:
+            with self._lock:
+                if self._in_flight >= self._maximum_in_flight:
+                    self.overloaded += 1
+
+                    return self._overloaded_response
+                self._in_flight += 1
+            call_when_request_finished(environ, self._release)
+
+        return None
+
+    def _take_token(self, environ: Dict) -> bool:
+        client_address = get_client_address(environ, trusted_proxy_depth=self._trusted_proxy_depth)
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(client_address)
+            if bucket is None:
+                bucket = self._buckets[client_address] = [self._burst, now]
+                if len(self._buckets) > self._maximum_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_address)
+                bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._requests_per_second)
+                bucket[1] = now
+            if bucket[0] < 1.0:
+                self.rate_limited += 1
+
+                return False
+
+            bucket[0] -= 1.0
+
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
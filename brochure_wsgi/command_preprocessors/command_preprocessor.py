@@ -1,5 +1,19 @@
 from abc import ABCMeta, abstractmethod
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, NamedTuple, FrozenSet
+
+REQUEST_FINISHED_CALLBACKS_ENVIRON_KEY = "brochure_wsgi.request_finished_callbacks"
+
+
+class MatchCriteria(NamedTuple):
+    """
+    Request properties a command preprocessor can possibly respond to.
+
+    A `None` field places no restriction on that property. A preprocessor is only called for requests that match every
+    field that is set, so the criteria must include every request the preprocessor could return a response for.
+    """
+    paths: Optional[FrozenSet[str]] = None
+    hosts: Optional[FrozenSet[str]] = None
+    schemes: Optional[FrozenSet[str]] = None
 
 
 class CommandPreprocessor(metaclass=ABCMeta):  # pragma: no cover
@@ -8,3 +22,19 @@ class CommandPreprocessor(metaclass=ABCMeta):  # pragma: no cover
                    environ: Dict,
                    start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
         pass
+
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return None
+
+
+def call_when_request_finished(environ: Dict, callback: Callable[[], None]) -> None:
+    """
+    Has `callback` called once the server is done with the response for the request of `environ` (see
+    `finish_request`), e.g. to release something a preprocessor acquired for the request.
+    """
+    environ.setdefault(REQUEST_FINISHED_CALLBACKS_ENVIRON_KEY, []).append(callback)
+
+
+def finish_request(environ: Dict) -> None:
+    for callback in environ.pop(REQUEST_FINISHED_CALLBACKS_ENVIRON_KEY, ()):
+        callback()
@@ -2,9 +2,16 @@ from typing import Dict, Callable, Optional, Collection
 from urllib.parse import urlsplit, urlunsplit
 
 from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
+from brochure_wsgi.response_providers.bytes_response import BytesResponse, redirect_response
 
 
 class DomainRedirectPreprocessor(CommandPreprocessor):
+    """
+    Redirects requests for any of the source domains to the same URL on the target domain, over https.
+
+    Both domains are read from their providers on every request, so they can change while the application runs; for
+    that reason this preprocessor declares no `MatchCriteria` and is called for every request.
+    """
 
     def __init__(self,
                  url_from_environment: Callable[[Dict], str],
@@ -17,7 +24,7 @@ class DomainRedirectPreprocessor(CommandPreprocessor):
 
     def preprocess(self,
                    environ: Dict,
-                   start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+                   start_response: Callable) -> Optional[BytesResponse]:
         source_url = self._url_from_environment(environ)
         source_scheme, source_domain, source_path, source_query, source_fragment = urlsplit(url=source_url)
         source_domains = self._source_domain_provider()
@@ -26,9 +33,4 @@ class DomainRedirectPreprocessor(CommandPreprocessor):
             destination_domain = self._target_domain_provider()
             secure_destination_url = urlunsplit(("https", destination_domain, source_path, source_query, source_fragment))
 
-            def redirect_to(environ: Dict, start_response: Callable):
-                start_response("301 Moved Permanently", [("Location", secure_destination_url)])
-
-                return ""
-
-            return redirect_to
+            return redirect_response(location=secure_destination_url)
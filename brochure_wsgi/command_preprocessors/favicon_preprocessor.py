@@ -3,7 +3,7 @@ from typing import Dict, Callable, Optional
 
 from whitenoise import WhiteNoise
 
-from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
 
 
 class FaviconPreprocessor(CommandPreprocessor):
@@ -28,3 +28,6 @@ class FaviconPreprocessor(CommandPreprocessor):
         path = self._request_path_provider(environ)
         if path == self._favicon_url_path:
             return self._favicon_handler
+
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return MatchCriteria(paths=frozenset((self._favicon_url_path,)))
@@ -0,0 +1,23 @@
+from typing import Dict, Callable, Optional
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
+from brochure_wsgi.host_redirect_table import HostRedirectTable, normalize_host
+from brochure_wsgi.request_view import get_request_view
+
+
+class HostRedirectPreprocessor(CommandPreprocessor):
+    """
+    Redirects requests for any host in a `HostRedirectTable` to the HTTPS URL of its target host.
+
+    The table's lookup cost does not depend on its size, so the preprocessor stays unindexed rather than handing a
+    `PreprocessorChain` every source host (wildcard sources could not be indexed anyway).
+    """
+
+    def __init__(self, host_redirect_table: HostRedirectTable) -> None:
+        super().__init__()
+        self._host_redirect_table = host_redirect_table
+
+    def preprocess(self,
+                   environ: Dict,
+                   start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+        return self._host_redirect_table.get_response(normalize_host(get_request_view(environ).host))
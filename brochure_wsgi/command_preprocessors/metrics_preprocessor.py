@@ -0,0 +1,34 @@
+from typing import Dict, Callable, Optional, Iterable, List
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
+from brochure_wsgi.metrics.metrics_registry import MetricFamily
+from brochure_wsgi.metrics.prometheus_text import render_prometheus_text, PROMETHEUS_TEXT_CONTENT_TYPE
+from brochure_wsgi.request_view import get_request_view
+
+
+class MetricsPreprocessor(CommandPreprocessor):
+    """
+    Serves the collected metrics at `metrics_path` in the Prometheus text format.
+    """
+
+    def __init__(self, metrics_path: str, metrics_collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        super().__init__()
+        self._metrics_path = metrics_path
+        self._metrics_collector = metrics_collector
+
+    def preprocess(self,
+                   environ: Dict,
+                   start_response: Callable) -> Optional[Callable[[Dict, Callable], List[bytes]]]:
+        if get_request_view(environ).path == self._metrics_path:
+            return self._serve_metrics
+
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return MatchCriteria(paths=frozenset((self._metrics_path,)))
+
+    def _serve_metrics(self, environ: Dict, start_response: Callable) -> List[bytes]:
+        body = render_prometheus_text(self._metrics_collector()).encode("utf-8")
+        start_response("200 OK", [("Content-Type", PROMETHEUS_TEXT_CONTENT_TYPE),
+                                  ("Content-Length", str(len(body))),
+                                  ("Cache-Control", "no-store")])
+
+        return [body]
@@ -0,0 +1,21 @@
+from typing import Dict, Callable, Optional
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
+from brochure_wsgi.validator_cache import ValidatorCache
+
+
+class NotModifiedPreprocessor(CommandPreprocessor):
+
+    def __init__(self, validator_cache: ValidatorCache) -> None:
+        super().__init__()
+        self._validator_cache = validator_cache
+
+    def preprocess(self,
+                   environ: Dict,
+                   start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+        if "HTTP_IF_NONE_MATCH" not in environ and "HTTP_IF_MODIFIED_SINCE" not in environ:
+            return None
+
+        response = self._validator_cache.get_response(environ)
+        if response is not None and response.is_not_modified(environ):
+            return response
@@ -0,0 +1,69 @@
+from typing import Dict, Callable, Optional, Iterable, Tuple
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
+from brochure_wsgi.request_view import get_request_view, RequestView
+
+
+class PreprocessorChain(object):
+    """
+    Calls the command preprocessors that could respond to a request, in order, until one returns a response provider.
+
+    Preprocessors that declare `MatchCriteria` are indexed by path, host or scheme when the chain is built. For each
+    request the chain parses a `RequestView` once and only calls the preprocessors that are either unindexed or found in
+    one of the indexes, so requests that no preprocessor is interested in cost a few dictionary lookups.
+    """
+
+    def __init__(self, command_preprocessors: Iterable[CommandPreprocessor]) -> None:
+        super().__init__()
+        self._unindexed = []
+        self._path_index = {}
+        self._host_index = {}
+        self._scheme_index = {}
+        for order, command_preprocessor in enumerate(command_preprocessors):
+            entry = (order, command_preprocessor, command_preprocessor.get_match_criteria())
+            criteria = entry[2]
+            if criteria is None:
+                self._unindexed.append(entry)
+            elif criteria.paths is not None:
+                _add_to_index(self._path_index, criteria.paths, entry)
+            elif criteria.hosts is not None:
+                _add_to_index(self._host_index, criteria.hosts, entry)
+            elif criteria.schemes is not None:
+                _add_to_index(self._scheme_index, criteria.schemes, entry)
+            else:
+                self._unindexed.append(entry)
+        self._unindexed = tuple(self._unindexed)
+        self._is_indexed = bool(self._path_index or self._host_index or self._scheme_index)
+
+    def preprocess(self, environ: Dict, start_response: Callable) -> Optional[Callable[[Dict, Callable], Iterable[bytes]]]:
+        candidates = self._unindexed
+        if self._is_indexed:
+            request_view = get_request_view(environ)
+            indexed_candidates = sum((self._path_index.get(request_view.path, ()),
+                                      self._host_index.get(request_view.host, ()),
+                                      self._scheme_index.get(request_view.scheme, ())), ())
+            if indexed_candidates:
+                candidates = sorted(candidates + indexed_candidates, key=lambda entry: entry[0])
+                candidates = [entry for entry in candidates if _matches(entry, request_view)]
+
+        for _, command_preprocessor, _ in candidates:
+            response_provider = command_preprocessor.preprocess(environ=environ, start_response=start_response)
+            if response_provider is not None:
+                return response_provider
+
+        return None
+
+
+def _add_to_index(index: Dict[str, Tuple], keys: Iterable[str], entry: Tuple) -> None:
+    for key in keys:
+        index[key] = index.get(key, ()) + (entry,)
+
+
+def _matches(entry: Tuple[int, CommandPreprocessor, Optional[MatchCriteria]], request_view: RequestView) -> bool:
+    criteria = entry[2]
+    if criteria is None:
+        return True
+
+    return all((criteria.paths is None or request_view.path in criteria.paths,
+                criteria.hosts is None or request_view.host in criteria.hosts,
+                criteria.schemes is None or request_view.scheme in criteria.schemes))
@@ -0,0 +1,21 @@
+from typing import Dict, Callable, Optional
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
+from brochure_wsgi.request_view import get_request_view
+from brochure_wsgi.static_file_index import StaticFileIndex
+
+
+class StaticDirectoryPreprocessor(CommandPreprocessor):
+
+    def __init__(self, static_file_index: StaticFileIndex) -> None:
+        super().__init__()
+        self._static_file_index = static_file_index
+
+    def preprocess(self,
+                   environ: Dict,
+                   start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+        return self._static_file_index.get_response(url_path=get_request_view(environ).path,
+                                                    method=environ.get("REQUEST_METHOD", "GET"))
+
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return MatchCriteria(paths=self._static_file_index.url_paths)
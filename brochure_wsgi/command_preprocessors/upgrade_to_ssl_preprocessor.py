@@ -1,35 +1,36 @@
-from typing import Dict, Callable, Optional, Any
+from typing import Dict, Callable, Optional, Collection
 from urllib.parse import urlunsplit, urlsplit
 
-from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
+from brochure_wsgi.response_providers.bytes_response import BytesResponse, redirect_response
 
 
 class UpgradeToSSLPreprocessor(CommandPreprocessor):
 
     def __init__(self,
                  is_insecure: Callable[[Dict], bool],
-                 url_from_environment: Callable[[Dict], str]) -> None:
+                 url_from_environment: Callable[[Dict], str],
+                 insecure_schemes: Optional[Collection[str]] = None) -> None:
         super().__init__()
         self._is_insecure = is_insecure
         self._url_from_environment = url_from_environment
+        self._insecure_schemes = frozenset(insecure_schemes) if insecure_schemes is not None else None
 
     def preprocess(self,
                    environ: Dict,
-                   start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+                   start_response: Callable) -> Optional[BytesResponse]:
         if self._is_insecure(environ):
             insecure_source_url = self._url_from_environment(environ)
             redirect_to_secure_url = self._get_redirect_to(source_url=insecure_source_url)
 
             return redirect_to_secure_url
 
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return MatchCriteria(schemes=self._insecure_schemes) if self._insecure_schemes is not None else None
+
     @staticmethod
-    def _get_redirect_to(source_url: str) -> Callable[[Any], str]:
+    def _get_redirect_to(source_url: str) -> BytesResponse:
         scheme, netloc, path, query, fragment = urlsplit(url=source_url)
         secure_destination_url = urlunsplit(("https", netloc, path, query, fragment))
 
-        def redirect_to(environ: Dict, start_response: Callable):
-            start_response("301 Moved Permanently", [("Location", secure_destination_url)])
-
-            return ""
-
-        return redirect_to
+        return redirect_response(location=secure_destination_url)
@@ -0,0 +1,116 @@
+from typing import Dict, Callable, Iterable, List, NamedTuple, Optional
+
+from brochure_wsgi.request_view import path_and_query_from_request_view
+
+REDIRECT_STATUSES = {301: "301 Moved Permanently",
+                     302: "302 Found",
+                     303: "303 See Other",
+                     307: "307 Temporary Redirect",
+                     308: "308 Permanent Redirect"}
+
+
+class HostRedirect(NamedTuple):
+    source: str
+    target_host: str
+    status: int = 301
+
+
+def normalize_host(host: str) -> str:
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host.split("]", 1)[0] + "]"
+
+    return host.split(":", 1)[0].rstrip(".")
+
+
+class HostRedirectResponse(object):
+    """
+    Prebuilt redirect to `https://<target_host>` that keeps the requested path and query string.
+    """
+
+    __slots__ = ("redirect", "_status", "_location_prefix")
+
+    def __init__(self, redirect: HostRedirect) -> None:
+        self.redirect = redirect
+        self._status = REDIRECT_STATUSES[redirect.status]
+        self._location_prefix = "https://{}".format(redirect.target_host)
+
+    def __call__(self, environ: Dict, start_response: Callable) -> List[bytes]:
+        location = self._location_prefix + path_and_query_from_request_view(environ)
+        start_response(self._status, [("Location", location), ("Content-Length", "0")])
+
+        return [b""]
+
+
+class HostRedirectTable(object):
+    """
+    Maps request hosts to prebuilt redirect responses.
+
+    Sources are either exact hosts (`example.com`) or wildcard subdomain suffixes (`*.example.com`, which matches any
+    subdomain of `example.com` but not `example.com` itself). Exact hosts are looked up in a dictionary and wildcard
+    suffixes in a trie of reversed host labels, so a lookup costs one dictionary access per label of the requested host
+    however many entries the table holds. When several wildcards match, the longest suffix wins; exact hosts always
+    win over wildcards.
+    """
+
+    def __init__(self, redirects: Iterable[HostRedirect]) -> None:
+        super().__init__()
+        self._exact_responses = {}
+        self._wildcard_trie = {}
+        self._has_wildcards = False
+        for redirect in redirects:
+            if redirect.status not in REDIRECT_STATUSES:
+                raise ValueError("Unsupported redirect status {} for '{}'.".format(redirect.status, redirect.source))
+
+            response = HostRedirectResponse(redirect)
+            source = redirect.source.strip().lower()
+            if source.startswith("*."):
+                node = self._wildcard_trie
+                for label in reversed(normalize_host(source[2:]).split(".")):
+                    node = node.setdefault(label, {})
+                node[None] = response
+                self._has_wildcards = True
+            else:
+                self._exact_responses[normalize_host(source)] = response
+        self.exact_hosts = frozenset(self._exact_responses)
+
+    def __len__(self) -> int:
+        return len(self.exact_hosts) + self._count_wildcards(self._wildcard_trie)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "HostRedirectTable":
+        """
+        Loads a table from a text file with one `<source> <target host> [<status>]` entry per line. Blank lines and
+        everything after a `#` are ignored.
+        """
+        redirects = []
+        with open(file_path, encoding="utf-8") as redirect_file:
+            for line_number, line in enumerate(redirect_file, start=1):
+                fields = line.split("#", 1)[0].split()
+                if not fields:
+                    continue
+                if len(fields) not in (2, 3) or (len(fields) == 3 and not fields[2].isdigit()):
+                    message = "Invalid host redirect on line {} of '{}': '{}'."
+                    raise ValueError(message.format(line_number, file_path, line.strip()))
+                status = int(fields[2]) if len(fields) == 3 else 301
+                redirects.append(HostRedirect(source=fields[0], target_host=fields[1], status=status))
+
+        return cls(redirects=redirects)
+
+    def get_response(self, host: str) -> Optional[HostRedirectResponse]:
+        response = self._exact_responses.get(host)
+        if response is not None or not self._has_wildcards:
+            return response
+
+        labels = host.split(".")
+        node = self._wildcard_trie
+        for index in range(len(labels) - 1, 0, -1):
+            node = node.get(labels[index])
+            if node is None:
+                break
+            response = node.get(None, response)
+
+        return response
+
+    def _count_wildcards(self, node: Dict) -> int:
+        return sum(1 if label is None else self._count_wildcards(child) for label, child in node.items())
@@ -1,18 +1,25 @@
 import json
-from collections import defaultdict
 from functools import partial
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, Iterable, Tuple
 
 from brochure.brochure_user_interface import BrochureUserInterface
+from brochure.commands.command_types import CommandType
 from brochure.values.basics import Basics
 from brochure.values.contact_method import ContactMethodType
 from brochure.values.section import Section
-from jinja2 import Environment, PackageLoader, select_autoescape
+from jinja2 import BytecodeCache, Environment, PackageLoader, select_autoescape
 from werkzeug.wrappers import Response
 
+from brochure_wsgi.accept_header_negotiator import AcceptHeaderNegotiator
+from brochure_wsgi.response_providers.buffered_stream import buffered_stream
+from brochure_wsgi.response_providers.bytes_response import BytesResponse
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.response_providers.caching_response_provider import CachingResponseProvider
 from brochure_wsgi.response_providers.exception_response_provider import ExceptionReponseProvider
 from brochure_wsgi.response_providers.not_found_response_provider import NotFoundResponseProvider
+from brochure_wsgi.response_providers.response_cache import ResponseCache
 from brochure_wsgi.response_providers.section_response_provider import SectionResponseProvider
+from brochure_wsgi.stage_timer import timed_stage
 
 
 class HTTPUserInterface(BrochureUserInterface):
@@ -40,26 +47,74 @@ class HTTPUserInterface(BrochureUserInterface):
         self._response = self._exception_response_provider(exception, basics)
 
 
+def get_html_template_provider(static_url_provider: Optional[Callable[[str], str]] = None,
+                               template_bytecode_cache: Optional[BytecodeCache] = None) -> Environment:
+    """
+    Every template is compiled up front, including parents such as `base.html`, so the first request does not pay for
+    it. Pass a `template_bytecode_cache` (e.g. a `FileSystemBytecodeCache`) to let new workers load the compiled
+    templates instead of compiling them again.
+    """
+    html_template_provider = Environment(
+        loader=PackageLoader('brochure_wsgi', 'templates'),
+        autoescape=select_autoescape(('html',)),
+        bytecode_cache=template_bytecode_cache
+    )
+    if static_url_provider is not None:
+        html_template_provider.globals["static_url"] = static_url_provider
+    for template_name in html_template_provider.list_templates():
+        html_template_provider.get_template(template_name)
+
+    return html_template_provider
+
+
 class HTTPUserInterfaceProvider(object):
+    """
+    Templates come from `html_template_provider`, which several providers can share (e.g. one per site of a
+    `MultiSiteApplication`), or else from a new environment made by `get_html_template_provider`.
+
+    HTML pages for sections with a body of at least `streaming_minimum_size` characters are streamed in chunks of about
+    8 KiB instead of being rendered, compressed and cached as a whole; `None` always renders them whole.
+
+    Error pages are rendered once per representation, exception class and basics, and replayed from then on: a failure
+    that repeats on every request does not render a page for each of them, and shows the message of its first exception.
 
-    def __init__(self):
+    Cached pages get a `Last-Modified` header from `last_modified_provider` (see `get_last_modified_provider`), and none
+    without one.
+    """
+
+    def __init__(self,
+                 page_cache_size: int = 8,
+                 not_found_cache_size: int = 256,
+                 compression_minimum_size: Optional[int] = 512,
+                 static_url_provider: Optional[Callable[[str], str]] = None,
+                 template_bytecode_cache: Optional[BytecodeCache] = None,
+                 streaming_minimum_size: Optional[int] = 256 * 1024,
+                 html_template_provider: Optional[Environment] = None,
+                 exception_cache_size: int = 16,
+                 last_modified_provider: Optional[Callable[[], Optional[float]]] = None):
         super().__init__()
 
-        html_template_provider = Environment(
-            loader=PackageLoader('brochure_wsgi', 'templates'),
-            autoescape=select_autoescape(('html',))
-        )
+        if html_template_provider is None:
+            html_template_provider = get_html_template_provider(static_url_provider=static_url_provider,
+                                                                template_bytecode_cache=template_bytecode_cache)
+        self._html_template_provider = html_template_provider
+
+        vary_headers = (("Vary", "Accept"),)
+
+        def html_serializer(body: str, status: int) -> BytesResponse:
+            return BytesResponse(body.encode("utf-8"), status=status, content_type="text/html; charset=utf-8",
+                                 headers=vary_headers)
 
-        def html_serializer(body: str, status: int) -> Response:
-            return Response(body, mimetype="text/html", status=status)
+        def streaming_html_serializer(pieces: Iterable[str]) -> Response:
+            return Response(buffered_stream(pieces), mimetype="text/html", headers=vary_headers, direct_passthrough=True)
 
-        def status_code_html_serializer_provider(status: int) -> Callable[[str], Response]:
+        def status_code_html_serializer_provider(status: int) -> Callable[[str], BytesResponse]:
             return lambda body: html_serializer(body=body, status=status)
 
-        def json_serializer(body: str, status: int) -> Response:
-            return Response(body, mimetype="application/json", status=status)
+        def json_serializer(body: str, status: int) -> BytesResponse:
+            return BytesResponse(body.encode("utf-8"), status=status, content_type="application/json", headers=vary_headers)
 
-        def status_code_json_serializer_provider(status: int) -> Callable[[str], Response]:
+        def status_code_json_serializer_provider(status: int) -> Callable[[str], BytesResponse]:
             return lambda body: json_serializer(body=body, status=status)
 
         def basics_context_serializer(basics: Basics) -> Dict[str, Dict[str, str]]:
@@ -91,34 +146,103 @@ class HTTPUserInterfaceProvider(object):
         index_template = html_template_provider.get_template("section.html")
         not_found_template = html_template_provider.get_template("not_found.html")
         exception_template = html_template_provider.get_template("exception.html")
-        section_response_html_provider = SectionResponseProvider(template=index_template,
-                                                                 section_context_serializer=section_context_serializer,
-                                                                 response_serializer=ok_html_serializer)
-        not_found_response_html_provider = NotFoundResponseProvider(
-            template=not_found_template,
-            basics_context_serializer=basics_context_serializer,
-            response_serializer=not_found_html_serializer)
-        exception_response_html_provider = ExceptionReponseProvider(
-            template=exception_template,
-            basics_context_serializer=basics_context_serializer,
-            response_serializer=html_serializer)
-
-        def section_response_json_provider(section: Section, basics: Basics) -> Response:
-            section_dictionary = section_context_serializer(section, basics)
-
-            return ok_json_serializer(json.dumps(section_dictionary))
-
-        def not_found_response_json_provider(basics: Basics, path: str) -> Response:
-            dictionary = basics_context_serializer(basics)
-            dictionary["error"] = "Resource '{}' not found.".format(path)
-
-            return not_found_json_serializer(json.dumps(dictionary))
-
-        def exception_response_json_provider(exception: Exception, basics: Optional[Basics]) -> Response:
-            dictionary = basics_context_serializer(basics)
-            dictionary["error"] = str(exception)
-
-            return exception_json_serializer(json.dumps(dictionary))
+        page_response_cache = ResponseCache(maximum_size=page_cache_size)
+        not_found_response_cache = ResponseCache(maximum_size=not_found_cache_size)
+        exception_response_cache = ResponseCache(maximum_size=exception_cache_size)
+        self._response_caches = {"page": page_response_cache,
+                                 "not_found": not_found_response_cache,
+                                 "exception": exception_response_cache}
+        cached_response_factory = partial(CachedResponse.from_response,
+                                          last_modified_provider=last_modified_provider,
+                                          compression_minimum_size=compression_minimum_size)
+
+        def section_fingerprint_provider(cover_section: Section, basics: Basics) -> Tuple[Section, Basics]:
+            return cover_section, basics
+
+        def not_found_fingerprint_provider(basics: Basics, path: str) -> Basics:
+            return basics
+
+        def exception_fingerprint_provider(exception: Exception, basics: Optional[Basics]) -> Optional[Basics]:
+            return basics
+
+        def section_cache_key_provider(representation: str) -> Callable[[Section, Basics], Tuple[CommandType, str]]:
+            return lambda cover_section, basics: (CommandType.SHOW_COVER, representation)
+
+        def not_found_cache_key_provider(representation: str) -> Callable[[Basics, str], Tuple[CommandType, str, str]]:
+            return lambda basics, path: (CommandType.UNKNOWN, representation, path)
+
+        def exception_cache_key_provider(representation: str) -> Callable[[Exception, Optional[Basics]], Tuple[str, type]]:
+            return lambda exception, basics: (representation, type(exception))
+
+        section_response_html_provider = CachingResponseProvider(
+            response_provider=SectionResponseProvider(
+                template=index_template,
+                section_context_serializer=section_context_serializer,
+                response_serializer=ok_html_serializer,
+                streaming_response_serializer=streaming_html_serializer,
+                streaming_minimum_size=streaming_minimum_size),
+            response_cache=page_response_cache,
+            cache_key_provider=section_cache_key_provider("text/html"),
+            fingerprint_provider=section_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
+        not_found_response_html_provider = CachingResponseProvider(
+            response_provider=NotFoundResponseProvider(template=not_found_template,
+                                                       basics_context_serializer=basics_context_serializer,
+                                                       response_serializer=not_found_html_serializer),
+            response_cache=not_found_response_cache,
+            cache_key_provider=not_found_cache_key_provider("text/html"),
+            fingerprint_provider=not_found_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
+        exception_response_html_provider = CachingResponseProvider(
+            response_provider=ExceptionReponseProvider(template=exception_template,
+                                                       basics_context_serializer=basics_context_serializer,
+                                                       response_serializer=html_serializer),
+            response_cache=exception_response_cache,
+            cache_key_provider=exception_cache_key_provider("text/html"),
+            fingerprint_provider=exception_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
+
+        def render_section_response_json(section: Section, basics: Basics) -> BytesResponse:
+            with timed_stage("render"):
+                body = json.dumps(section_context_serializer(section, basics))
+            with timed_stage("serialize"):
+                return ok_json_serializer(body)
+
+        def render_not_found_response_json(basics: Basics, path: str) -> BytesResponse:
+            with timed_stage("render"):
+                dictionary = basics_context_serializer(basics)
+                dictionary["error"] = "Resource '{}' not found.".format(path)
+                body = json.dumps(dictionary)
+            with timed_stage("serialize"):
+                return not_found_json_serializer(body)
+
+        section_response_json_provider = CachingResponseProvider(
+            response_provider=render_section_response_json,
+            response_cache=page_response_cache,
+            cache_key_provider=section_cache_key_provider("application/json"),
+            fingerprint_provider=section_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
+        not_found_response_json_provider = CachingResponseProvider(
+            response_provider=render_not_found_response_json,
+            response_cache=not_found_response_cache,
+            cache_key_provider=not_found_cache_key_provider("application/json"),
+            fingerprint_provider=not_found_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
+
+        def render_exception_response_json(exception: Exception, basics: Optional[Basics]) -> BytesResponse:
+            with timed_stage("render"):
+                dictionary = basics_context_serializer(basics)
+                dictionary["error"] = str(exception)
+                body = json.dumps(dictionary)
+            with timed_stage("serialize"):
+                return exception_json_serializer(body)
+
+        exception_response_json_provider = CachingResponseProvider(
+            response_provider=render_exception_response_json,
+            response_cache=exception_response_cache,
+            cache_key_provider=exception_cache_key_provider("application/json"),
+            fingerprint_provider=exception_fingerprint_provider,
+            cached_response_factory=cached_response_factory)
 
         def html_response_provider(path: str) -> HTTPUserInterface:
             not_found_response_provider = partial(not_found_response_html_provider, **{"path": path})
@@ -132,8 +256,19 @@ class HTTPUserInterfaceProvider(object):
                 not_found_response_provider=partial(not_found_response_json_provider, **{"path": path}),
                 exception_response_provider=exception_response_json_provider)
 
-        self._accept_map = defaultdict(lambda: html_response_provider)
-        self._accept_map["application/json"] = json_interface_provider
+        self._interface_providers = {"text/html": html_response_provider,
+                                     "application/json": json_interface_provider}
+        self._accept_header_negotiator = AcceptHeaderNegotiator(representations=("text/html", "application/json"))
 
     def __call__(self, path: str, accept: Optional[str]) -> HTTPUserInterface:
-        return self._accept_map[accept](path)
+        representation = self._accept_header_negotiator(accept)
+
+        return self._interface_providers[representation](path)
+
+    @property
+    def response_caches(self) -> Dict[str, ResponseCache]:
+        return dict(self._response_caches)
+
+    def clear_response_caches(self) -> None:
+        for response_cache in self._response_caches.values():
+            response_cache.clear()
@@ -0,0 +1,202 @@
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from brochure_wsgi.metrics.metrics_registry import MetricFamily, MetricsRegistry, Sample
+
+METRICS_FILE_PREFIX = "metrics-"
+METRICS_FILE_SUFFIX = ".json"
+EXITED_METRICS_FILE_NAME = "metrics-exited.json"
+LOCK_FILE_NAME = "metrics.lock"
+
+_process_tokens = {}
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover
+        return True
+
+    return True
+
+
+def get_process_token(pid: int) -> str:
+    """
+    Returns a random token that tells this process apart from earlier processes that had the same `pid`.
+    """
+    return _process_tokens.setdefault(pid, uuid.uuid4().hex)
+
+
+class MetricsDirectory(object):
+    """
+    Shares the metrics of pre-forked worker processes through one file per process in `directory`.
+
+    Each process writes its registry to `metrics-<pid>.json` at most once every `flush_interval` seconds (call
+    `maybe_flush` after each request), whenever it collects and when it is closed. `collect` merges the files of every
+    live process. The counters and histograms of exited processes are folded into `metrics-exited.json` and their files
+    are removed, so totals never go backwards and the directory does not grow with every restarted worker; their gauges
+    are dropped. A process that finds a file left under its PID by an exited process folds that file in before it first
+    writes its own.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 registry: MetricsRegistry,
+                 flush_interval: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 pid_provider: Callable[[], int] = os.getpid,
+                 process_is_alive: Callable[[int], bool] = is_process_alive) -> None:
+        super().__init__()
+        self._directory = directory
+        self._registry = registry
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._pid_provider = pid_provider
+        self._process_is_alive = process_is_alive
+        self._flushed_at = None
+        self._flushed_pid = None
+        self._flush_lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def maybe_flush(self) -> None:
+        flushed_at = self._flushed_at
+        if flushed_at is None or self._clock() - flushed_at >= self._flush_interval:
+            self.flush(wait=False)
+
+    def flush(self, wait: bool = True) -> None:
+        if not self._flush_lock.acquire(blocking=wait):
+            return
+
+        try:
+            self._flushed_at = self._clock()
+            pid = self._pid_provider()
+            process_token = get_process_token(pid)
+            file_path = self._process_file_path(pid)
+            if self._flushed_pid != pid:
+                with self._locked_directory():
+                    previous_file = _read_json_file(file_path)
+                    if previous_file is not None and previous_file["process"] != process_token:
+                        self._fold_exited_processes([(file_path, previous_file["metric_families"])])
+                self._flushed_pid = pid
+            _write_json_file(file_path, {"process": process_token,
+                                         "metric_families": [metric_family._asdict()
+                                                             for metric_family in self._registry.collect()]})
+        finally:
+            self._flush_lock.release()
+
+    def close(self) -> None:
+        """
+        Writes out the metrics recorded since the last flush, e.g. before a worker process exits.
+        """
+        self.flush()
+
+    def collect(self) -> List[MetricFamily]:
+        self.flush()
+        pid = self._pid_provider()
+        with self._locked_directory():
+            live_processes = []
+            exited_processes = []
+            for process_pid, file_path, metric_families in self._read_process_files():
+                if process_pid == pid or self._process_is_alive(process_pid):
+                    live_processes.append((process_pid, metric_families))
+                else:
+                    exited_processes.append((file_path, metric_families))
+            exited_metric_families = self._fold_exited_processes(exited_processes)
+
+        merged_families = {}
+        merged_samples = {}
+        _merge_metric_families(merged_families, merged_samples, exited_metric_families, pid=None)
+        for process_pid, metric_families in live_processes:
+            _merge_metric_families(merged_families, merged_samples, metric_families, pid=process_pid)
+
+        return _metric_families_from(merged_families, merged_samples)
+
+    def _fold_exited_processes(self, exited_processes: List[Tuple[str, List[Dict]]]) -> List[Dict]:
+        exited_file_path = os.path.join(self._directory, EXITED_METRICS_FILE_NAME)
+        exited_metric_families = _read_json_file(exited_file_path) or []
+        if not exited_processes:
+            return exited_metric_families
+
+        merged_families = {}
+        merged_samples = {}
+        _merge_metric_families(merged_families, merged_samples, exited_metric_families, pid=None)
+        for file_path, metric_families in exited_processes:
+            metric_families = [metric_family for metric_family in metric_families if metric_family["metric_type"] != "gauge"]
+            _merge_metric_families(merged_families, merged_samples, metric_families, pid=None)
+        exited_metric_families = [metric_family._asdict()
+                                  for metric_family in _metric_families_from(merged_families, merged_samples)]
+        _write_json_file(exited_file_path, exited_metric_families)
+        for file_path, _ in exited_processes:
+            os.remove(file_path)
+
+        return exited_metric_families
+
+    def _read_process_files(self) -> List[Tuple[int, str, List[Dict]]]:
+        process_files = []
+        for file_name in sorted(os.listdir(self._directory)):
+            pid = file_name[len(METRICS_FILE_PREFIX):-len(METRICS_FILE_SUFFIX)]
+            if file_name.startswith(METRICS_FILE_PREFIX) and file_name.endswith(METRICS_FILE_SUFFIX) and pid.isdigit():
+                file_path = os.path.join(self._directory, file_name)
+                process_files.append((int(pid), file_path, _read_json_file(file_path)["metric_families"]))
+
+        return process_files
+
+    def _process_file_path(self, pid: int) -> str:
+        return os.path.join(self._directory, "{}{}{}".format(METRICS_FILE_PREFIX, pid, METRICS_FILE_SUFFIX))
+
+    @contextmanager
+    def _locked_directory(self) -> Iterator[None]:
+        # Folding reads and removes the files of other processes, so only one process may do it at a time.
+        with open(os.path.join(self._directory, LOCK_FILE_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _merge_metric_families(merged_families: Dict, merged_samples: Dict, metric_families: List[Dict], pid: Optional[int]) -> None:
+    for metric_family in metric_families:
+        name = metric_family["name"]
+        merged_families.setdefault(name, metric_family)
+        samples = merged_samples.setdefault(name, {})
+        per_process = pid is not None and metric_family["aggregation"] == "per_process"
+        for sample_name, labels, value in metric_family["samples"]:
+            labels = tuple(tuple(label) for label in labels)
+            if per_process:
+                labels += (("pid", str(pid)),)
+            key = (sample_name, labels)
+            samples[key] = samples.get(key, 0) + value
+
+
+def _metric_families_from(merged_families: Dict, merged_samples: Dict) -> List[MetricFamily]:
+    return [MetricFamily(name=name,
+                         metric_type=metric_family["metric_type"],
+                         documentation=metric_family["documentation"],
+                         aggregation=metric_family["aggregation"],
+                         samples=tuple(Sample(name=sample_name, labels=labels, value=value)
+                                       for (sample_name, labels), value in merged_samples[name].items()))
+            for name, metric_family in merged_families.items()]
+
+
+def _read_json_file(file_path: str) -> Optional[object]:
+    try:
+        with open(file_path) as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json_file(file_path: str, value: object) -> None:
+    temporary_file_path = "{}.tmp".format(file_path)
+    with open(temporary_file_path, "w") as json_file:
+        json.dump(value, json_file)
+    os.replace(temporary_file_path, file_path)
@@ -0,0 +1,207 @@
+import threading
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: Tuple[Tuple[str, str], ...]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    """
+    Collected samples of one metric. `aggregation` says how samples of the same gauge from different processes are
+    combined: `sum` adds them up, `per_process` keeps one sample per process, labelled with its `pid`.
+    """
+    name: str
+    metric_type: str
+    documentation: str
+    aggregation: str
+    samples: Tuple[Sample, ...]
+
+
+class _ThreadShards(object):
+    """
+    One dictionary of label values to metric values per thread, so that updates never take a lock.
+
+    `collect` sums the shards of every thread. Shards of finished threads are folded into a single retired shard, so
+    servers that start a thread per request do not accumulate shards.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._local = threading.local()
+        self._lock = Lock()
+        self._shards = []
+        self._retired_shard = {}
+
+    def get(self) -> Dict[LabelValues, Union[float, List[float]]]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+
+        return shard
+
+    def collect(self) -> Dict[LabelValues, Union[float, List[float]]]:
+        with self._lock:
+            live_shards = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live_shards.append((thread, shard))
+                else:
+                    _merge_into(self._retired_shard, shard.items())
+            self._shards = live_shards
+            totals = {}
+            _merge_into(totals, self._retired_shard.items())
+            for _, shard in live_shards:
+                # Copied in one step: the owning thread may add label values while we read.
+                _merge_into(totals, list(shard.items()))
+
+        return totals
+
+
+def _merge_into(totals: Dict, items: Iterable) -> None:
+    for label_values, value in items:
+        if isinstance(value, list):
+            existing = totals.get(label_values)
+            totals[label_values] = list(value) if existing is None else [a + b for a, b in zip(existing, value)]
+        else:
+            totals[label_values] = totals.get(label_values, 0) + value
+
+
+class Counter(object):
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._shards = _ThreadShards()
+
+    def inc(self, label_values: LabelValues = (), amount: float = 1) -> None:
+        shard = self._shards.get()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def collect(self) -> MetricFamily:
+        samples = tuple(Sample(name=self.name, labels=tuple(zip(self.label_names, label_values)), value=value)
+                        for label_values, value in sorted(self._shards.collect().items()))
+
+        return MetricFamily(name=self.name, metric_type="counter", documentation=self.documentation,
+                            aggregation="sum", samples=samples)
+
+
+class Gauge(object):
+    """
+    A value that can go up and down (`inc`/`dec`), or that is read from a function whenever metrics are collected.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), aggregation: str = "sum") -> None:
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.aggregation = aggregation
+        self._shards = _ThreadShards()
+        self._functions = {}
+
+    def inc(self, label_values: LabelValues = (), amount: float = 1) -> None:
+        shard = self._shards.get()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def dec(self, label_values: LabelValues = (), amount: float = 1) -> None:
+        self.inc(label_values=label_values, amount=-amount)
+
+    def set_function(self, function: Callable[[], float], label_values: LabelValues = ()) -> None:
+        self._functions[label_values] = function
+
+    def collect(self) -> MetricFamily:
+        values = self._shards.collect()
+        values.update((label_values, function()) for label_values, function in self._functions.items())
+        samples = tuple(Sample(name=self.name, labels=tuple(zip(self.label_names, label_values)), value=value)
+                        for label_values, value in sorted(values.items()))
+
+        return MetricFamily(name=self.name, metric_type="gauge", documentation=self.documentation,
+                            aggregation=self.aggregation, samples=samples)
+
+
+class Histogram(object):
+    """
+    Counts observations in fixed buckets, given by their inclusive upper bounds, and keeps their sum.
+    """
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._upper_bounds = tuple(sorted(buckets))
+        self._shards = _ThreadShards()
+
+    def observe(self, value: float, label_values: LabelValues = ()) -> None:
+        shard = self._shards.get()
+        counts = shard.get(label_values)
+        if counts is None:
+            # One count per bucket, one for +Inf, then the sum of all observations.
+            counts = shard[label_values] = [0] * (len(self._upper_bounds) + 2)
+        counts[bisect_left(self._upper_bounds, value)] += 1
+        counts[-1] += value
+
+    def collect(self) -> MetricFamily:
+        samples = []
+        for label_values, counts in sorted(self._shards.collect().items()):
+            labels = tuple(zip(self.label_names, label_values))
+            cumulative_count = 0
+            for upper_bound, count in zip(self._upper_bounds + (float("inf"),), counts):
+                cumulative_count += count
+                bucket_labels = labels + (("le", _format_bound(upper_bound)),)
+                samples.append(Sample(name="{}_bucket".format(self.name), labels=bucket_labels, value=cumulative_count))
+            samples.append(Sample(name="{}_sum".format(self.name), labels=labels, value=counts[-1]))
+            samples.append(Sample(name="{}_count".format(self.name), labels=labels, value=cumulative_count))
+
+        return MetricFamily(name=self.name, metric_type="histogram", documentation=self.documentation,
+                            aggregation="sum", samples=tuple(samples))
+
+
+def _format_bound(upper_bound: float) -> str:
+    return "+Inf" if upper_bound == float("inf") else repr(float(upper_bound))
+
+
+class MetricsRegistry(object):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name=name, documentation=documentation, label_names=label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = (), aggregation: str = "sum") -> Gauge:
+        return self._register(Gauge(name=name, documentation=documentation, label_names=label_names, aggregation=aggregation))
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name=name, documentation=documentation, label_names=label_names, buckets=buckets))
+
+    def collect(self) -> List[MetricFamily]:
+        return [metric.collect() for metric in self._metrics]
+
+    def _register(self, metric):
+        if any(registered_metric.name == metric.name for registered_metric in self._metrics):
+            raise ValueError("A metric named '{}' is already registered.".format(metric.name))
+        self._metrics.append(metric)
+
+        return metric
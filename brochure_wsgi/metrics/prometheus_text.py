@@ -0,0 +1,32 @@
+from typing import Iterable
+
+from brochure_wsgi.metrics.metrics_registry import MetricFamily
+
+PROMETHEUS_TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_prometheus_text(metric_families: Iterable[MetricFamily]) -> str:
+    lines = []
+    for metric_family in metric_families:
+        lines.append("# HELP {} {}".format(metric_family.name, _escape_help(metric_family.documentation)))
+        lines.append("# TYPE {} {}".format(metric_family.name, metric_family.metric_type))
+        for sample in metric_family.samples:
+            labels = ",".join('{}="{}"'.format(name, _escape_label_value(value)) for name, value in sample.labels)
+            lines.append("{}{} {}".format(sample.name, "{{{}}}".format(labels) if labels else "", _format_value(sample.value)))
+
+    return "\n".join(lines) + "\n"
+
+
+def _escape_help(documentation: str) -> str:
+    return documentation.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+
+    return repr(float(value))
@@ -0,0 +1,115 @@
+from time import perf_counter_ns
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+from brochure_wsgi.closing_body import close_with
+from brochure_wsgi.metrics.metrics_registry import MetricsRegistry, DEFAULT_LATENCY_BUCKETS
+from brochure_wsgi.path_command_provider import COMMAND_TYPE_ENVIRON_KEY
+from brochure_wsgi.response_providers.response_cache import ResponseCache
+from brochure_wsgi.value_fetchers.refreshing_value_fetcher import RefreshingValueFetcher
+
+REQUEST_LABEL_NAMES = ("command_type", "representation", "status")
+
+
+class RequestMetrics(object):
+    """
+    Counts requests, measures their latency and tracks how many are in flight, labelled by the brochure command they
+    ran (`none` when a preprocessor answered), the media type of the response and its status code. A request with a
+    streamed body is in flight until the server closes the body.
+
+    `on_request_finished` is called after every request, e.g. to let a `MetricsDirectory` flush, and `on_close` by
+    `close`, e.g. to let it write out the last requests of a worker process that is exiting.
+    """
+
+    def __init__(self,
+                 registry: MetricsRegistry,
+                 latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 on_request_finished: Optional[Callable[[], None]] = None,
+                 on_close: Optional[Callable[[], None]] = None) -> None:
+        super().__init__()
+        self._requests = registry.counter(name="brochure_requests_total",
+                                          documentation="Requests handled.",
+                                          label_names=REQUEST_LABEL_NAMES)
+        self._latency = registry.histogram(name="brochure_request_duration_seconds",
+                                           documentation="Time from receiving a request to returning its response body.",
+                                           label_names=REQUEST_LABEL_NAMES,
+                                           buckets=latency_buckets)
+        self._in_flight = registry.gauge(name="brochure_requests_in_flight",
+                                         documentation="Requests being handled.")
+        self._on_request_finished = on_request_finished
+        self._on_close = on_close
+
+    def observe_request(self, environ: Dict, start_response: Callable, application: Callable) -> Iterable[bytes]:
+        response_start = ["500", None]
+
+        def recording_start_response(status: str, headers, *args):
+            response_start[0] = status.split(" ", 1)[0]
+            response_start[1] = headers
+
+            return start_response(status, headers, *args)
+
+        started = perf_counter_ns()
+
+        def finish_request() -> None:
+            self._in_flight.dec()
+            command_type = environ.get(COMMAND_TYPE_ENVIRON_KEY)
+            label_values = (command_type.name.lower() if command_type is not None else "none",
+                            _representation(response_start[1]),
+                            response_start[0])
+            self._requests.inc(label_values=label_values)
+            self._latency.observe((perf_counter_ns() - started) / 1e9, label_values=label_values)
+            if self._on_request_finished is not None:
+                self._on_request_finished()
+
+        self._in_flight.inc()
+        try:
+            body = application(environ, recording_start_response)
+        except BaseException:
+            finish_request()
+            raise
+
+        return close_with(body, finish_request)
+
+    def close(self) -> None:
+        if self._on_close is not None:
+            self._on_close()
+
+
+def _representation(headers) -> str:
+    for name, value in headers or ():
+        if name.lower() == "content-type":
+            return value.split(";", 1)[0].strip()
+
+    return "none"
+
+
+def register_response_cache_metrics(registry: MetricsRegistry, response_caches: Mapping[str, ResponseCache]) -> None:
+    hit_ratio = registry.gauge(name="brochure_response_cache_hit_ratio",
+                               documentation="Share of response cache lookups that found a rendered response.",
+                               label_names=("cache",),
+                               aggregation="per_process")
+    for cache_name, response_cache in response_caches.items():
+        hit_ratio.set_function(_hit_ratio_function(response_cache), label_values=(cache_name,))
+
+
+def _hit_ratio_function(response_cache: ResponseCache) -> Callable[[], float]:
+    def get_hit_ratio() -> float:
+        lookups = response_cache.hits + response_cache.misses
+
+        return response_cache.hits / lookups if lookups else 0.0
+
+    return get_hit_ratio
+
+
+def register_content_refresh_metrics(registry: MetricsRegistry,
+                                     refreshing_fetchers: Iterable[RefreshingValueFetcher],
+                                     latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+    refresh_duration = registry.histogram(name="brochure_content_refresh_duration_seconds",
+                                          documentation="Time taken by background content refreshes.",
+                                          label_names=("outcome",),
+                                          buckets=latency_buckets)
+
+    def observe_refresh(duration: float, succeeded: bool) -> None:
+        refresh_duration.observe(duration, label_values=("success" if succeeded else "failure",))
+
+    for refreshing_fetcher in refreshing_fetchers:
+        refreshing_fetcher.set_refresh_observer(observe_refresh)
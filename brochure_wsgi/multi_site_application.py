@@ -0,0 +1,273 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from jinja2 import Environment
+
+from brochure_wsgi.brochure_wsgi_application import BrochureWSGIApplication, get_access_log, \
+    get_admission_control_preprocessors, get_circuit_breaker, get_host_redirect_preprocessors, get_path_command_provider, get_site_application, get_static_file_index, get_template_bytecode_cache
+from brochure_wsgi.closing_body import close_with
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, finish_request
+from brochure_wsgi.command_preprocessors.preprocessor_chain import PreprocessorChain
+from brochure_wsgi.command_preprocessors.static_directory_preprocessor import StaticDirectoryPreprocessor
+from brochure_wsgi.host_redirect_table import normalize_host
+from brochure_wsgi.http_user_interface import HTTPUserInterfaceProvider, get_html_template_provider
+from brochure_wsgi.request_view import get_request_view
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.single_flight import SingleFlight
+from brochure_wsgi.value_fetchers.content_fetchers import create_file_content_fetchers, get_last_modified_provider, \
+    is_background_refresh_enabled
+
+SITE_HOST_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?)*$")
+UNKNOWN_SITE_BODY = b"Unknown site.\n"
+UNKNOWN_SITE_RESPONSE = CachedResponse(status="404 Not Found",
+                                       headers=(("Content-Type", "text/plain; charset=utf-8"),
+                                                ("Content-Length", str(len(UNKNOWN_SITE_BODY)))),
+                                       body=UNKNOWN_SITE_BODY)
+
+
+class Site(NamedTuple):
+    application: BrochureWSGIApplication
+    memory_size: Callable[[], int]
+
+
+def get_site_host(environ: Dict) -> Optional[str]:
+    """
+    Returns the normalized host of a request (lower case, without port or trailing dot), or `None` when it is not a
+    valid DNS name and so cannot name a site.
+    """
+    host = normalize_host(get_request_view(environ).host)
+    if len(host) > 253 or SITE_HOST_PATTERN.match(host) is None:
+        return None
+
+    return host
+
+
+class SiteDirectoryLoader(object):
+    """
+    Loads the site for `<host>` from the content bundle file `<directory>/<host>.json` (see `FileContentBundleFetcher`),
+    or returns `None` when there is no such file.
+
+    Every site gets its own content snapshot and response caches, but all of them render with the one, already compiled,
+    `html_template_provider`. A site's memory size is estimated as the size of its content file plus the body bytes
+    held by its response caches.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 html_template_provider: Environment,
+                 check_interval: float = 1.0,
+                 refresh_in_background: bool = False) -> None:
+        super().__init__()
+        self._directory = directory
+        self._html_template_provider = html_template_provider
+        self._check_interval = check_interval
+        self._refresh_in_background = refresh_in_background
+        self._get_path_command_provider = get_path_command_provider()
+
+    def __call__(self, host: str) -> Optional[Site]:
+        content_file_path = os.path.join(self._directory, "{}.json".format(host))
+        if not os.path.isfile(content_file_path):
+            return None
+
+        content_file_size = os.path.getsize(content_file_path)
+        content_fetchers = create_file_content_fetchers(file_path=content_file_path,
+                                                        check_interval=self._check_interval,
+                                                        refresh_in_background=self._refresh_in_background)
+        user_interface_provider = HTTPUserInterfaceProvider(html_template_provider=self._html_template_provider,
+                                                            last_modified_provider=get_last_modified_provider(content_fetchers))
+        response_caches = tuple(user_interface_provider.response_caches.values())
+        application = get_site_application(
+            content_fetchers=content_fetchers,
+            user_interface_provider=user_interface_provider,
+            get_path_command_provider=self._get_path_command_provider,
+            circuit_breaker=get_circuit_breaker())
+
+        return Site(application=application,
+                    memory_size=lambda: content_file_size + sum(response_cache.size for response_cache in response_caches))
+
+
+class MultiSiteApplication(object):
+    """
+    WSGI application that serves many brochures from one process, choosing the site by the request's `Host` header.
+
+    `command_preprocessors` (e.g. host redirects and static files) are shared by every site and run first. Sites are
+    loaded by `site_loader` the first time their host is requested and kept in an LRU keyed by normalized host.
+    Whenever the estimated memory size of the loaded sites exceeds `maximum_memory_size` bytes, the least recently used
+    sites are evicted until it fits again; the site that is serving the current request is never evicted. Requests for
+    hosts that have no site get a `404 Not Found`. Requests for every site are logged to `access_log`, if any.
+
+    Concurrent requests for a site that is not loaded share one call of `site_loader` (see `SingleFlight`). A host that
+    has no site is remembered for `missing_host_ttl` seconds, for up to `maximum_missing_hosts` hosts, so that requests
+    with made-up `Host` headers (e.g. from scanners) do not each make `site_loader` look for it again.
+    """
+
+    def __init__(self,
+                 site_loader: Callable[[str], Optional[Site]],
+                 maximum_memory_size: int,
+                 command_preprocessors: Optional[Iterable[CommandPreprocessor]] = None,
+                 access_log: Optional["AccessLog"] = None,
+                 missing_host_ttl: float = 10.0,
+                 maximum_missing_hosts: int = 10000,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__()
+        self._site_loader = site_loader
+        self._access_log = access_log
+        self._maximum_memory_size = maximum_memory_size
+        self._preprocessor_chain = PreprocessorChain(command_preprocessors=command_preprocessors or tuple())
+        self._missing_host_ttl = missing_host_ttl
+        self._maximum_missing_hosts = maximum_missing_hosts
+        self._clock = clock
+        self._sites = OrderedDict()
+        self._missing_hosts = OrderedDict()
+        self._memory_size = 0
+        self._lock = Lock()
+        self._single_flight = SingleFlight()
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def hosts(self) -> List[str]:
+        with self._lock:
+            return list(self._sites)
+
+    @property
+    def memory_size(self) -> int:
+        return self._memory_size
+
+    def __call__(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        if self._access_log is not None:
+            return self._access_log.observe_request(environ=environ, start_response=start_response, application=self._call)
+
+        return self._call(environ, start_response)
+
+    def close(self) -> None:
+        if self._access_log is not None:
+            self._access_log.close()
+
+    def _call(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        try:
+            body = self._serve(environ=environ, start_response=start_response)
+        except BaseException:
+            finish_request(environ)
+            raise
+
+        return close_with(body, partial(finish_request, environ))
+
+    def _serve(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        response_provider = self._preprocessor_chain.preprocess(environ=environ, start_response=start_response)
+        if response_provider is not None:
+            return response_provider(environ=environ, start_response=start_response)
+
+        host = get_site_host(environ)
+        site = self._get_site(host) if host is not None else None
+        if site is None:
+            return UNKNOWN_SITE_RESPONSE(environ=environ, start_response=start_response)
+
+        try:
+            return site.application(environ, start_response)
+        finally:
+            self._update_memory_size(host=host, site=site)
+
+    def warm_up(self, environs: Iterable[Dict]) -> None:
+        """
+        Serves `environs` and discards the responses, loading the sites they are for, without logging them.
+        """
+        for environ in environs:
+            body_chunks = self._call(environ, lambda status, headers, exc_info=None: None)
+            for _ in body_chunks:
+                pass
+            if hasattr(body_chunks, "close"):
+                body_chunks.close()
+
+    def _get_site(self, host: str) -> Optional[Site]:
+        with self._lock:
+            entry = self._sites.get(host)
+            if entry is not None:
+                self._sites.move_to_end(host)
+
+                return entry[0]
+
+            missing_until = self._missing_hosts.get(host)
+            if missing_until is not None and self._clock() < missing_until:
+                return None
+
+        # Sites are loaded without holding the lock, so loading one site does not hold up requests for the others.
+        return self._single_flight.do(key=host, function=lambda: self._load_site(host))
+
+    def _load_site(self, host: str) -> Optional[Site]:
+        with self._lock:
+            entry = self._sites.get(host)
+            if entry is not None:
+                # Another request loaded the same site after this one looked for it.
+                self._sites.move_to_end(host)
+
+                return entry[0]
+
+        site = self._site_loader(host)
+        if site is None:
+            with self._lock:
+                self._missing_hosts.pop(host, None)
+                self._missing_hosts[host] = self._clock() + self._missing_host_ttl
+                if len(self._missing_hosts) > self._maximum_missing_hosts:
+                    self._missing_hosts.popitem(last=False)
+
+            return None
+
+        memory_size = site.memory_size()
+        with self._lock:
+            self._sites[host] = (site, memory_size)
+            self._memory_size += memory_size
+            self.loads += 1
+            self._evict(keep_host=host)
+
+        return site
+
+    def _update_memory_size(self, host: str, site: Site) -> None:
+        memory_size = site.memory_size()
+        with self._lock:
+            entry = self._sites.get(host)
+            if entry is None or entry[0] is not site:
+                return
+
+            self._sites[host] = (site, memory_size)
+            self._memory_size += memory_size - entry[1]
+            self._evict(keep_host=host)
+
+    def _evict(self, keep_host: str) -> None:
+        while self._memory_size > self._maximum_memory_size:
+            host = next(iter(self._sites))
+            if host == keep_host:
+                break
+
+            _, memory_size = self._sites.pop(host)
+            self._memory_size -= memory_size
+            self.evictions += 1
+
+
+def get_multi_site_application() -> MultiSiteApplication:
+    """
+    Serves a site for every `<host>.json` content bundle file in `BROCHURE_SITES_DIRECTORY`, keeping at most
+    `BROCHURE_SITES_MEMORY_LIMIT` bytes (256 MiB by default) of loaded sites and looking for the file of a host that had
+    none again after `BROCHURE_SITES_MISSING_HOST_TTL` seconds (10 by default). Static files, host redirects and template
+    caching are configured as for `get_brochure_wsgi_application`.
+    """
+    static_file_index = get_static_file_index()
+    html_template_provider = get_html_template_provider(static_url_provider=static_file_index.url_for,
+                                                        template_bytecode_cache=get_template_bytecode_cache())
+    site_loader = SiteDirectoryLoader(directory=os.environ["BROCHURE_SITES_DIRECTORY"],
+                                      html_template_provider=html_template_provider,
+                                      check_interval=float(os.environ.get("BROCHURE_CONTENT_CHECK_INTERVAL", "1.0")),
+                                      refresh_in_background=is_background_refresh_enabled())
+    command_preprocessors = get_admission_control_preprocessors() + get_host_redirect_preprocessors() + (
+        StaticDirectoryPreprocessor(static_file_index=static_file_index),)
+
+    return MultiSiteApplication(site_loader=site_loader,
+                                maximum_memory_size=int(os.environ.get("BROCHURE_SITES_MEMORY_LIMIT", 256 * 1024 * 1024)),
+                                command_preprocessors=command_preprocessors,
+                                access_log=get_access_log(),
+                                missing_host_ttl=float(os.environ.get("BROCHURE_SITES_MISSING_HOST_TTL", "10")))
@@ -1,8 +1,19 @@
-from typing import Dict, Callable, Tuple
+from functools import lru_cache
+from typing import Dict, Callable, Tuple, Optional, Any
 
 from brochure.commands.command_types import CommandType
-from werkzeug.exceptions import NotFound
-from werkzeug.routing import Map
+from werkzeug.exceptions import NotFound, HTTPException
+from werkzeug.routing import Map, Rule, RoutingException
+from werkzeug.wsgi import get_path_info
+
+from brochure_wsgi.stage_timer import current_request_timings
+
+Command = Tuple[CommandType, Dict]
+COMMAND_TYPE_ENVIRON_KEY = "brochure_wsgi.command_type"
+
+
+class _RequestDependentMatch(Exception):
+    pass
 
 
 class GetPathCommandProvider(object):
@@ -11,21 +22,104 @@ class GetPathCommandProvider(object):
 
     Takes in data from an HTTP request (the contents of the `environ` parameter: path, method,
     etc) and returns a command type and associated command parameters for the brochure application.
+
+    With `compiled_routing` (the default) the `url_map` is compiled when the provider is created: requests for the
+    path of a static rule are matched with a dictionary lookup, and other paths are matched by werkzeug once and
+    remembered, by path and method, in an LRU of `maximum_cache_size` results. Matches that depend on more than the
+    path and method (redirects, disallowed methods, host rules) are always left to werkzeug, so routing behaves exactly
+    as `url_map` does. Rules added to `url_map` after the provider is created are not seen by compiled routing.
+
+    The matched command type is also recorded in `environ` under `COMMAND_TYPE_ENVIRON_KEY`.
     """
 
-    def __init__(self, url_map: Map) -> None:
+    def __init__(self, url_map: Map, compiled_routing: bool = True, maximum_cache_size: int = 256) -> None:
         super().__init__()
         self._url_map = url_map
+        self._static_routes = {}
+        self._match_path = None
+        if compiled_routing and not url_map.host_matching and not any(rule.subdomain for rule in url_map.iter_rules()):
+            self._static_routes = _compile_static_routes(url_map)
+            self._map_adapter = url_map.bind("localhost")
+            self._match_path = lru_cache(maxsize=maximum_cache_size)(self._match_path_uncached)
 
-    def __call__(self, environ: Dict) -> Callable[[], Tuple[CommandType, Dict]]:
-        def _command_provider() -> Tuple[CommandType, Dict]:
-            map_adapter = self._url_map.bind_to_environ(environ)
-            try:
-                command_type_provider, command_parameters = map_adapter.match()
-                command_type = command_type_provider()
+    def __call__(self, environ: Dict) -> Callable[[], Command]:
+        # Annotated with a module-level alias: annotations of nested functions are evaluated on every call.
+        def _command_provider() -> Command:
+            timings = current_request_timings()
+            if timings is None:
+                match = self._match(environ)
+            else:
+                with timings.stage("route"):
+                    match = self._match(environ)
+            if match is None:
+                environ[COMMAND_TYPE_ENVIRON_KEY] = CommandType.UNKNOWN
 
-                return command_type, command_parameters
-            except NotFound:
                 return CommandType.UNKNOWN, {}
 
+            command_type_provider, command_parameters = match
+            command_type = command_type_provider()
+            environ[COMMAND_TYPE_ENVIRON_KEY] = command_type
+
+            return command_type, command_parameters
+
         return _command_provider
+
+    def _match(self, environ: Dict) -> Optional[Tuple[Callable[[], CommandType], Dict]]:
+        if self._match_path is not None:
+            path = environ.get("PATH_INFO", "")
+            method = environ.get("REQUEST_METHOD", "GET").upper()
+            static_route = self._static_routes.get(path)
+            if static_route is not None and (static_route[2] is None or method in static_route[2]):
+                return static_route[0], dict(static_route[1])
+
+            try:
+                match = self._match_path(path, method)
+            except _RequestDependentMatch:
+                pass
+            else:
+                return None if match is None else (match[0], dict(match[1]))
+
+        map_adapter = self._url_map.bind_to_environ(environ)
+        try:
+            return map_adapter.match()
+        except NotFound:
+            return None
+
+    def _match_path_uncached(self, path: str, method: str) -> Optional[Tuple[Any, Dict]]:
+        try:
+            return self._map_adapter.match(path_info=get_path_info({"PATH_INFO": path}, charset=self._url_map.charset),
+                                           method=method)
+        except NotFound:
+            return None
+        except (RoutingException, HTTPException):
+            raise _RequestDependentMatch()
+
+
+def _compile_static_routes(url_map: Map) -> Dict[str, Tuple[Any, Dict, Optional[frozenset]]]:
+    rules_by_path = {}
+    for rule in url_map.iter_rules():
+        path = rule.rule.rstrip("/") or "/"
+        rules_by_path[path] = rules_by_path.get(path, ()) + (rule,)
+
+    static_routes = {}
+    for rules in rules_by_path.values():
+        # Rules that share a path (up to a trailing slash) can redirect to each other or split methods between them.
+        # Otherwise werkzeug always tries rules without arguments before rules with arguments.
+        if len(rules) != 1:
+            continue
+
+        rule = rules[0]
+        if _is_static(url_map=url_map, rule=rule):
+            methods = frozenset(rule.methods) if rule.methods is not None else None
+            static_routes[rule.rule.encode(url_map.charset).decode("latin-1")] = (rule.endpoint, dict(rule.defaults or {}), methods)
+
+    return static_routes
+
+
+def _is_static(url_map: Map, rule: Rule) -> bool:
+    # With `redirect_defaults` werkzeug may redirect a rule's own path to another rule for the same endpoint.
+    return all((not rule.arguments,
+                not rule.build_only,
+                rule.redirect_to is None,
+                not rule.alias,
+                not url_map.redirect_defaults or len(list(url_map.iter_rules(rule.endpoint))) == 1))
@@ -0,0 +1,324 @@
+"""
+Production server for the brochure WSGI application that only needs the standard library.
+
+Run with `python -m brochure_wsgi.prefork_server --host 0.0.0.0 --port 8000`; `--help` lists the options.
+"""
+import argparse
+import gc
+import os
+import random
+import select
+import selectors
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+from wsgiref.util import setup_testing_defaults
+
+from brochure_wsgi.brochure_wsgi_application import BrochureWSGIApplication, get_brochure_wsgi_application
+
+WARM_UP_REQUESTS = (("/", "text/html"), ("/", "application/json"))
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+def get_default_worker_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+def get_warm_up_environs(host: str) -> List[Dict]:
+    environs = []
+    for path, accept in WARM_UP_REQUESTS:
+        environ = {"PATH_INFO": path, "HTTP_HOST": host, "HTTP_ACCEPT": accept, "HTTP_ACCEPT_ENCODING": "gzip"}
+        setup_testing_defaults(environ)
+        environs.append(environ)
+
+    return environs
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    """
+    Does not log successful requests, and gives clients `timeout` seconds to send their request.
+    """
+    timeout = 30
+
+    def log_request(self, code="-", size="-") -> None:
+        pass
+
+
+class WorkerServer(WSGIServer):
+    """
+    Serves requests one at a time from a listening socket that it may share with other worker processes, until it is
+    stopped or has handled `max_requests` requests.
+
+    The listening socket is non-blocking: when another worker accepts a connection first, `accept` fails and this worker
+    goes back to waiting instead of blocking.
+    """
+    timeout = 0.5
+
+    def __init__(self,
+                 listening_socket: socket.socket,
+                 application: Callable,
+                 max_requests: Optional[int] = None) -> None:
+        host, port = listening_socket.getsockname()[:2]
+        super().__init__((host, port), QuietWSGIRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listening_socket
+        self.socket.setblocking(False)
+        self.server_name = host
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+        self.max_requests = max_requests
+        self.handled_requests = 0
+        self.stopping = False
+
+    def finish_request(self, request, client_address) -> None:
+        self.handled_requests += 1
+        super().finish_request(request, client_address)
+
+    def serve_until_stopped(self) -> None:
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            while not self.stopping and (self.max_requests is None or self.handled_requests < self.max_requests):
+                if selector.select(self.timeout):
+                    # Returns without handling anything when another worker accepted the connection first.
+                    self._handle_request_noblock()
+
+    def stop(self) -> None:
+        self.stopping = True
+
+
+class PreforkServer(object):
+    """
+    Builds the application once, warms its caches, then forks `worker_count` worker processes that inherit the warmed
+    application copy-on-write. The workers accept connections from one shared listening socket or, with `reuse_port`,
+    from one `SO_REUSEPORT` socket each so that the kernel spreads connections between them.
+
+    `serve_forever` runs the server until SIGTERM or SIGINT, which stop the workers gracefully. SIGHUP builds and warms
+    a new application, starts a new generation of workers with it and then gracefully stops the old generation; if the
+    new application cannot be built, the old workers keep serving. A worker exits after `max_requests` requests, plus a
+    random number up to `max_requests_jitter` so that workers don't all restart at once, and is replaced.
+    """
+    poll_interval = 1.0
+
+    def __init__(self,
+                 application_factory: Callable[[], BrochureWSGIApplication] = get_brochure_wsgi_application,
+                 host: str = "127.0.0.1",
+                 port: int = 8000,
+                 worker_count: Optional[int] = None,
+                 max_requests: Optional[int] = None,
+                 max_requests_jitter: int = 0,
+                 reuse_port: bool = False,
+                 graceful_timeout: float = 30.0,
+                 backlog: int = 1024) -> None:
+        super().__init__()
+        self._application_factory = application_factory
+        self._address = (host, port)
+        self._worker_count = worker_count or get_default_worker_count()
+        self._max_requests = max_requests
+        self._max_requests_jitter = max_requests_jitter
+        self._reuse_port = reuse_port
+        self._graceful_timeout = graceful_timeout
+        self._backlog = backlog
+        self._socket = None
+        self._application = None
+        self._generation = 0
+        self._workers = {}
+        self._stopping = False
+        self._pending_signals = []
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        return self._socket.getsockname()[:2]
+
+    @property
+    def worker_pids(self) -> List[int]:
+        return sorted(self._workers)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._socket = self._create_socket(self._address)
+        if not self._reuse_port:
+            self._socket.listen(self._backlog)
+        # With `reuse_port` this socket only reserves the address (and, for port 0, the port) for the workers' sockets:
+        # it never listens, so the kernel gives it no connections.
+        self._application = self._load_application()
+        for _ in range(self._worker_count):
+            self._spawn_worker()
+
+    def reload(self) -> bool:
+        try:
+            application = self._load_application()
+        except Exception:
+            traceback.print_exc()
+
+            return False
+
+        self._application = application
+        self._generation += 1
+        old_worker_pids = list(self._workers)
+        for _ in range(self._worker_count):
+            self._spawn_worker()
+        self._signal_workers(old_worker_pids, signal.SIGTERM)
+
+        return True
+
+    def reap_workers(self) -> None:
+        for pid, generation in list(self._workers.items()):
+            if os.waitpid(pid, os.WNOHANG)[0] == 0:
+                continue
+            del self._workers[pid]
+            if generation == self._generation and not self._stopping:
+                self._spawn_worker()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._signal_workers(list(self._workers), signal.SIGTERM)
+        deadline = time.monotonic() + self._graceful_timeout
+        while self._workers and time.monotonic() < deadline:
+            self.reap_workers()
+            time.sleep(0.01)
+        self._signal_workers(list(self._workers), signal.SIGKILL)
+        for pid in list(self._workers):
+            os.waitpid(pid, 0)
+            del self._workers[pid]
+        self._socket.close()
+
+    def serve_forever(self) -> None:
+        wake_up_fd, signal_fd = os.pipe()
+        os.set_blocking(signal_fd, False)
+        previous_wakeup_fd = signal.set_wakeup_fd(signal_fd)
+        previous_handlers = {signum: signal.signal(signum, self._remember_signal) for signum in STOP_SIGNALS + (signal.SIGHUP,)}
+        # Only wakes the loop up, through the wakeup fd, so that exited workers are replaced promptly.
+        previous_handlers[signal.SIGCHLD] = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        try:
+            self.start()
+            while not self._stopping:
+                if select.select([wake_up_fd], [], [], self.poll_interval)[0]:
+                    os.read(wake_up_fd, 1024)
+                self._handle_pending_signals()
+                self.reap_workers()
+        finally:
+            for signum, previous_handler in previous_handlers.items():
+                signal.signal(signum, previous_handler)
+            signal.set_wakeup_fd(previous_wakeup_fd)
+            os.close(wake_up_fd)
+            os.close(signal_fd)
+            if self._socket is not None:
+                self.stop()
+
+    def _remember_signal(self, signum, frame) -> None:
+        self._pending_signals.append(signum)
+
+    def _handle_pending_signals(self) -> None:
+        while self._pending_signals:
+            if self._pending_signals.pop(0) == signal.SIGHUP:
+                self.reload()
+            else:
+                self._stopping = True
+
+    def _create_socket(self, address: Tuple[str, int]) -> socket.socket:
+        listening_socket = socket.socket(socket.AF_INET6 if ":" in address[0] else socket.AF_INET, socket.SOCK_STREAM)
+        listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self._reuse_port:
+            listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        listening_socket.bind(address)
+
+        return listening_socket
+
+    def _load_application(self) -> BrochureWSGIApplication:
+        # Objects of the previous application may have been frozen by an earlier load.
+        gc.unfreeze()
+        application = self._application_factory()
+        application.warm_up(get_warm_up_environs(host="{}:{}".format(*self.server_address)))
+        # Keeps the garbage collector from writing to the warmed objects' pages in the workers, which would copy them.
+        gc.collect()
+        gc.freeze()
+
+        return application
+
+    def _spawn_worker(self) -> None:
+        max_requests = None
+        if self._max_requests is not None:
+            max_requests = self._max_requests + random.randint(0, self._max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            exit_status = 1
+            try:
+                self._run_worker(max_requests=max_requests)
+                exit_status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(exit_status)
+        self._workers[pid] = self._generation
+
+    def _run_worker(self, max_requests: Optional[int]) -> None:  # pragma: no cover
+        # Runs in the forked worker process, where coverage is not collected.
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        listening_socket = self._socket
+        if self._reuse_port:
+            listening_socket = self._create_socket(self.server_address)
+            listening_socket.listen(self._backlog)
+            self._socket.close()
+        worker_server = WorkerServer(listening_socket=listening_socket,
+                                     application=self._application,
+                                     max_requests=max_requests)
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, lambda received_signum, frame: worker_server.stop())
+        worker_server.serve_until_stopped()
+        # Workers leave with `os._exit`, which skips `atexit`, so the application writes out e.g. its access log here.
+        close = getattr(self._application, "close", None)
+        if close is not None:
+            close()
+
+    def _signal_workers(self, pids: List[int], signum: int) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:  # pragma: no cover
+                pass
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: available CPUs)")
+    parser.add_argument("--max-requests", type=int, default=None, help="replace a worker after this many requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=0, help="add up to this many to --max-requests")
+    parser.add_argument("--reuse-port", action="store_true", help="give each worker its own SO_REUSEPORT socket")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="seconds workers get to finish their request when stopping")
+
+    return parser
+
+
+def get_prefork_server(arguments: Optional[List[str]] = None) -> PreforkServer:
+    options = get_argument_parser().parse_args(arguments)
+    application_factory = get_brochure_wsgi_application
+    if os.environ.get("BROCHURE_SITES_DIRECTORY"):
+        from brochure_wsgi.multi_site_application import get_multi_site_application
+
+        application_factory = get_multi_site_application
+
+    return PreforkServer(application_factory=application_factory,
+                         host=options.host,
+                         port=options.port,
+                         worker_count=options.workers,
+                         max_requests=options.max_requests,
+                         max_requests_jitter=options.max_requests_jitter,
+                         reuse_port=options.reuse_port,
+                         graceful_timeout=options.graceful_timeout)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    get_prefork_server(sys.argv[1:]).serve_forever()
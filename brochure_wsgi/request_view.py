@@ -0,0 +1,48 @@
+from typing import Dict, NamedTuple
+from urllib.parse import quote
+
+REQUEST_VIEW_ENVIRON_KEY = "brochure_wsgi.request_view"
+
+
+class RequestView(NamedTuple):
+    scheme: str
+    host: str
+    script_name: str
+    path: str
+    query: str
+
+
+def get_request_view(environ: Dict) -> RequestView:
+    """
+    Returns the scheme, host, path and query of a request, reading them from `environ` at most once per request.
+    """
+    request_view = environ.get(REQUEST_VIEW_ENVIRON_KEY)
+    if request_view is None:
+        scheme = environ.get("wsgi.url_scheme", "http")
+        host = environ.get("HTTP_HOST")
+        if not host:
+            host = environ.get("SERVER_NAME", "")
+            port = environ.get("SERVER_PORT")
+            if port and port != ("443" if scheme == "https" else "80"):
+                host = "{}:{}".format(host, port)
+        request_view = RequestView(scheme=scheme,
+                                   host=host.lower(),
+                                   script_name=environ.get("SCRIPT_NAME", ""),
+                                   path=environ.get("PATH_INFO") or "/",
+                                   query=environ.get("QUERY_STRING", ""))
+        environ[REQUEST_VIEW_ENVIRON_KEY] = request_view
+
+    return request_view
+
+
+def path_and_query_from_request_view(environ: Dict) -> str:
+    request_view = get_request_view(environ)
+    path = quote(request_view.script_name + request_view.path, safe="/;=,", encoding="latin-1")
+
+    return "{}?{}".format(path, request_view.query) if request_view.query else path
+
+
+def url_from_request_view(environ: Dict) -> str:
+    request_view = get_request_view(environ)
+
+    return "{}://{}{}".format(request_view.scheme, request_view.host, path_and_query_from_request_view(environ))
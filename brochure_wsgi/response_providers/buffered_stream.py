@@ -0,0 +1,22 @@
+from typing import Iterable, Iterator
+
+
+def buffered_stream(pieces: Iterable[str], chunk_size: int = 8192, encoding: str = "utf-8") -> Iterator[bytes]:
+    """
+    Encodes `pieces` (e.g. the events of Jinja's `Template.generate`) into chunks of roughly `chunk_size` bytes, so that
+    the server does not write the many tiny pieces a template produces one by one, and no chunk grows much beyond
+    `chunk_size` either.
+    """
+    buffered = []
+    buffered_size = 0
+    for piece in pieces:
+        for start in range(0, len(piece), chunk_size):
+            data = piece[start:start + chunk_size].encode(encoding)
+            buffered.append(data)
+            buffered_size += len(data)
+            if buffered_size >= chunk_size:
+                yield b"".join(buffered)
+                buffered = []
+                buffered_size = 0
+    if buffered:
+        yield b"".join(buffered)
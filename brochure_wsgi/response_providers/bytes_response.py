@@ -0,0 +1,41 @@
+from http import HTTPStatus
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class BytesResponse(object):
+    """
+    A response with a body that is already encoded and a header list that is built once, when the response is created.
+
+    Calling it costs one `start_response` call and returns a one-element list; `HEAD` requests get the same headers,
+    including `Content-Length`, and no body. Use werkzeug's `Response` for anything else (e.g. streamed bodies).
+    """
+
+    __slots__ = ("status_code", "status", "headers", "body")
+
+    is_streamed = False
+
+    def __init__(self,
+                 body: bytes,
+                 status: int = 200,
+                 content_type: Optional[str] = None,
+                 headers: Iterable[Tuple[str, str]] = ()) -> None:
+        response_headers = list(headers)
+        if content_type is not None:
+            response_headers.append(("Content-Type", content_type))
+        response_headers.append(("Content-Length", str(len(body))))
+
+        self.status_code = status
+        self.status = "{} {}".format(status, HTTPStatus(status).phrase)
+        self.headers = tuple(response_headers)
+        self.body = body
+
+    def __call__(self, environ: Dict, start_response: Callable) -> List[bytes]:
+        start_response(self.status, list(self.headers))
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return []
+
+        return [self.body]
+
+
+def redirect_response(location: str, status: int = 301) -> BytesResponse:
+    return BytesResponse(body=b"", status=status, headers=(("Location", location),))
@@ -0,0 +1,211 @@
+import zlib
+from email.utils import formatdate, parsedate_tz, mktime_tz
+from hashlib import sha256
+from typing import Callable, Dict, Iterable, List, Tuple, Optional, Union
+
+from werkzeug.wrappers import Response
+
+from brochure_wsgi.accept_encoding_negotiator import negotiate_content_encoding
+from brochure_wsgi.response_providers.bytes_response import BytesResponse
+
+NOT_MODIFIED_HEADER_NAMES = frozenset(("cache-control", "content-location", "etag", "expires", "last-modified", "vary"))
+COMPRESSION_LEVEL = 9
+CONTENT_ENCODERS = (
+    ("gzip", lambda body: _compress(body, window_bits=16 + zlib.MAX_WBITS)),
+    ("deflate", lambda body: _compress(body, window_bits=zlib.MAX_WBITS)),
+)
+
+
+def _compress(body: bytes, window_bits: int) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, window_bits)
+
+    return compressor.compress(body) + compressor.flush()
+
+
+class ResponseVariant(object):
+    __slots__ = ("headers", "body", "etag", "not_modified_headers")
+
+    def __init__(self, headers: Tuple[Tuple[str, str], ...], body: bytes, etag: Optional[str]) -> None:
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.not_modified_headers = tuple(header for header in headers if header[0].lower() in NOT_MODIFIED_HEADER_NAMES)
+
+
+class CachedResponse(object):
+    """
+    A fully rendered response (status line, headers and encoded body) that can be replayed to any number of requests.
+
+    Responses with an `etag` or `last_modified` validator answer matching `If-None-Match` / `If-Modified-Since` GET and
+    HEAD requests with `304 Not Modified`. `from_response` derives the ETag from the body and `last_modified` from the
+    content it was rendered from (see `last_modified_provider`), so that every worker sends the same validators.
+
+    When `compression_minimum_size` is set and the body is at least that many bytes long, gzip and deflate variants
+    are compressed once, up front, and the variant to send is chosen from each request's `Accept-Encoding` header.
+    Compressed variants get their own ETag, and every variant adds `Accept-Encoding` to `Vary`. `size` is the number of
+    body bytes held by all variants.
+    """
+
+    __slots__ = ("status", "headers", "body", "etag", "last_modified", "size", "_variant", "_variants", "_encodings")
+
+    def __init__(self,
+                 status: str,
+                 headers: Iterable[Tuple[str, str]],
+                 body: bytes,
+                 etag: Optional[str] = None,
+                 last_modified: Optional[int] = None,
+                 compression_minimum_size: Optional[int] = None) -> None:
+        headers = list(headers)
+        if etag is not None:
+            headers.append(("ETag", etag))
+        if last_modified is not None:
+            headers.append(("Last-Modified", formatdate(last_modified, usegmt=True)))
+
+        compressed_bodies = []
+        if compression_minimum_size is not None and len(body) >= compression_minimum_size:
+            compressed_bodies = [(encoding, encoder(body)) for encoding, encoder in CONTENT_ENCODERS]
+            compressed_bodies = [(encoding, compressed_body) for encoding, compressed_body in compressed_bodies
+                                 if len(compressed_body) < len(body)]
+        if compressed_bodies:
+            headers = _vary_by_accept_encoding(headers)
+
+        self.status = status
+        self.headers = tuple(headers)
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self._variant = ResponseVariant(headers=self.headers, body=body, etag=etag)
+        self._variants = {"identity": self._variant}
+        for encoding, compressed_body in compressed_bodies:
+            self._variants[encoding] = _compressed_variant(headers=headers,
+                                                           body=compressed_body,
+                                                           encoding=encoding,
+                                                           etag=etag)
+        self._encodings = tuple(encoding for encoding, _ in compressed_bodies)
+        self.size = len(body) + sum(len(compressed_body) for _, compressed_body in compressed_bodies)
+
+    @classmethod
+    def from_response(cls,
+                      response: Union[BytesResponse, Response],
+                      last_modified_provider: Optional[Callable[[], Optional[float]]] = None,
+                      compression_minimum_size: Optional[int] = None) -> "CachedResponse":
+        if isinstance(response, BytesResponse):
+            body = response.body
+            headers = response.headers
+        else:
+            body = response.get_data()
+            headers = response.headers.to_wsgi_list()
+        etag = None
+        last_modified = None
+        if 200 <= response.status_code < 300:
+            etag = '"{}"'.format(sha256(body).hexdigest()[:32])
+            modified_at = last_modified_provider() if last_modified_provider is not None else None
+            last_modified = int(modified_at) if modified_at is not None else None
+
+        return cls(status=response.status,
+                   headers=headers,
+                   body=body,
+                   etag=etag,
+                   last_modified=last_modified,
+                   compression_minimum_size=compression_minimum_size)
+
+    def with_headers(self, headers: Iterable[Tuple[str, str]]) -> "CachedResponse":
+        """
+        Returns this response with `headers` added to every variant, sharing its bodies and compressed variants instead
+        of compressing them again.
+        """
+        headers = tuple(headers)
+        response = CachedResponse.__new__(CachedResponse)
+        response.status = self.status
+        response.headers = self.headers + headers
+        response.body = self.body
+        response.etag = self.etag
+        response.last_modified = self.last_modified
+        response.size = self.size
+        response._variants = {encoding: ResponseVariant(headers=variant.headers + headers, body=variant.body, etag=variant.etag)
+                              for encoding, variant in self._variants.items()}
+        response._variant = response._variants["identity"]
+        response._encodings = self._encodings
+
+        return response
+
+    @property
+    def encodings(self) -> Tuple[str, ...]:
+        return self._encodings
+
+    def __call__(self, environ: Dict, start_response: Callable) -> List[bytes]:
+        variant = self._get_variant(environ)
+        if self._is_not_modified(environ, variant):
+            start_response("304 Not Modified", list(variant.not_modified_headers))
+
+            return []
+
+        start_response(self.status, list(variant.headers))
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return []
+
+        return [variant.body]
+
+    def is_not_modified(self, environ: Dict) -> bool:
+        return self._is_not_modified(environ, self._get_variant(environ))
+
+    def _get_variant(self, environ: Dict) -> ResponseVariant:
+        if not self._encodings:
+            return self._variant
+
+        encoding = negotiate_content_encoding(environ.get("HTTP_ACCEPT_ENCODING"), self._encodings)
+
+        return self._variants[encoding]
+
+    def _is_not_modified(self, environ: Dict, variant: ResponseVariant) -> bool:
+        if environ.get("REQUEST_METHOD") not in ("GET", "HEAD"):
+            return False
+
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            return variant.etag is not None and etag_matches(etag=variant.etag, if_none_match=if_none_match)
+
+        if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since is not None and self.last_modified is not None:
+            parsed_if_modified_since = parsedate_tz(if_modified_since)
+
+            return parsed_if_modified_since is not None and self.last_modified <= mktime_tz(parsed_if_modified_since)
+
+        return False
+
+
+def _vary_by_accept_encoding(headers: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == "vary":
+            return headers[:index] + [(name, "{}, Accept-Encoding".format(value))] + headers[index + 1:]
+
+    return headers + [("Vary", "Accept-Encoding")]
+
+
+def _compressed_variant(headers: List[Tuple[str, str]], body: bytes, encoding: str, etag: Optional[str]) -> ResponseVariant:
+    variant_etag = '{}-{}"'.format(etag[:-1], encoding) if etag is not None else None
+    variant_headers = []
+    for name, value in headers:
+        lower_name = name.lower()
+        if lower_name == "content-length":
+            value = str(len(body))
+        elif lower_name == "etag":
+            value = variant_etag
+        variant_headers.append((name, value))
+    variant_headers.append(("Content-Encoding", encoding))
+
+    return ResponseVariant(headers=tuple(variant_headers), body=body, etag=variant_etag)
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
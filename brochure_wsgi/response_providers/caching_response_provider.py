@@ -0,0 +1,85 @@
+from contextvars import ContextVar, Token
+from typing import Callable, Hashable, List, Optional, Union
+
+from werkzeug.wrappers import Response
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.response_providers.response_cache import ResponseCache
+from brochure_wsgi.single_flight import SingleFlight
+from brochure_wsgi.stage_timer import timed_stage
+
+_current_cache_outcomes = ContextVar("brochure_wsgi_cache_outcomes", default=None)
+
+
+def collect_cache_outcomes(cache_outcomes: List[str]) -> Token:
+    """
+    Has every `CachingResponseProvider` called in the current context append `"hit"` or `"miss"` to `cache_outcomes`,
+    until `reset_cache_outcomes` is called with the returned token.
+    """
+    return _current_cache_outcomes.set(cache_outcomes)
+
+
+def reset_cache_outcomes(token: Token) -> None:
+    _current_cache_outcomes.reset(token)
+
+
+def _record_cache_outcome(cache_outcome: str) -> None:
+    cache_outcomes = _current_cache_outcomes.get()
+    if cache_outcomes is not None:
+        cache_outcomes.append(cache_outcome)
+
+
+class CachingResponseProvider(object):
+    """
+    Wraps a response provider so that its rendered responses are stored in a `ResponseCache`.
+
+    `cache_key_provider` and `fingerprint_provider` receive the same arguments as the wrapped response provider. On a
+    cache hit the wrapped response provider is not called at all, so no template rendering or serialization happens.
+    Concurrent misses for the same key and fingerprint share one render (see `SingleFlight`). Streamed responses (see
+    `SectionResponseProvider`) are passed through without being cached or shared.
+    """
+
+    def __init__(self,
+                 response_provider: Callable[..., Response],
+                 response_cache: ResponseCache,
+                 cache_key_provider: Callable[..., Hashable],
+                 fingerprint_provider: Callable[..., Hashable],
+                 cached_response_factory: Callable[[Response], CachedResponse] = CachedResponse.from_response) -> None:
+        self._response_provider = response_provider
+        self._cached_response_factory = cached_response_factory
+        self._response_cache = response_cache
+        self._cache_key_provider = cache_key_provider
+        self._fingerprint_provider = fingerprint_provider
+        self._single_flight = SingleFlight()
+        super().__init__()
+
+    def __call__(self, *args, **kwargs) -> Union[CachedResponse, Response]:
+        cache_key = self._cache_key_provider(*args, **kwargs)
+        fingerprint = self._fingerprint_provider(*args, **kwargs)
+        cached_response = self._response_cache.get(key=cache_key, fingerprint=fingerprint)
+        if cached_response is not None:
+            _record_cache_outcome("hit")
+
+            return cached_response
+
+        _record_cache_outcome("miss")
+        streamed_responses = []
+
+        def render_and_store() -> Optional[CachedResponse]:
+            response = self._response_provider(*args, **kwargs)
+            if response.is_streamed:
+                streamed_responses.append(response)
+
+                return None
+            with timed_stage("cache_store"):
+                rendered_response = self._cached_response_factory(response)
+            self._response_cache.put(key=cache_key, fingerprint=fingerprint, response=rendered_response)
+
+            return rendered_response
+
+        cached_response = self._single_flight.do(key=(cache_key, fingerprint), function=render_and_store)
+        if cached_response is None:
+            # A streamed response can only be sent once, so requests that waited for another one stream their own.
+            return streamed_responses[0] if streamed_responses else self._response_provider(*args, **kwargs)
+
+        return cached_response
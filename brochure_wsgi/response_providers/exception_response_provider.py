@@ -4,6 +4,8 @@ from brochure.values.basics import Basics
 from jinja2 import Template
 from werkzeug.wrappers import Response
 
+from brochure_wsgi.stage_timer import timed_stage
+
 
 class ExceptionReponseProvider(object):
     def __init__(self,
@@ -16,9 +18,10 @@ class ExceptionReponseProvider(object):
         super().__init__()
 
     def __call__(self, exception: Exception, basics: Optional[Basics], *args, **kwargs) -> Response:
-        basics_context = self._basics_context_serializer(basics) if basics is not None else {}
-        exception_context = {"exception": exception}
-        context = {**basics_context, **exception_context}
-        body = self._template.render(context)
-
-        return self._response_serializer(body, 500)
+        with timed_stage("render"):
+            basics_context = self._basics_context_serializer(basics) if basics is not None else {}
+            exception_context = {"exception": exception}
+            context = {**basics_context, **exception_context}
+            body = self._template.render(context)
+        with timed_stage("serialize"):
+            return self._response_serializer(body, 500)
@@ -4,6 +4,8 @@ from brochure.values.basics import Basics
 from jinja2 import Template
 from werkzeug.wrappers import Response
 
+from brochure_wsgi.stage_timer import timed_stage
+
 
 class NotFoundResponseProvider(object):
 
@@ -17,8 +19,9 @@ class NotFoundResponseProvider(object):
         super().__init__()
 
     def __call__(self, basics: Basics, path: str) -> Response:
-        context = self._basics_context_serializer(basics)
-        context["path"] = path
-        body = self._template.render(context)
-
-        return self._serializer(body)
+        with timed_stage("render"):
+            context = self._basics_context_serializer(basics)
+            context["path"] = path
+            body = self._template.render(context)
+        with timed_stage("serialize"):
+            return self._serializer(body)
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+
+class ResponseCache(object):
+    """
+    Bounded LRU of rendered responses for a single content fingerprint.
+
+    The fingerprint identifies the fetched values the cached responses were rendered from. Every entry is evicted as
+    soon as a response is requested or stored for a different fingerprint. `hits` and `misses` count the results of
+    `get`, and `size` is the number of body bytes held by the cached responses.
+    """
+
+    def __init__(self, maximum_size: int) -> None:
+        self._maximum_size = maximum_size
+        self._fingerprint = None
+        self._responses = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        super().__init__()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: Hashable, fingerprint: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._reset(fingerprint=fingerprint)
+                self.misses += 1
+
+                return None
+
+            response = self._responses.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._responses.move_to_end(key)
+
+            return response
+
+    def put(self, key: Hashable, fingerprint: Hashable, response: CachedResponse) -> None:
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._reset(fingerprint=fingerprint)
+
+            replaced_response = self._responses.pop(key, None)
+            if replaced_response is not None:
+                self.size -= replaced_response.size
+            self._responses[key] = response
+            self.size += response.size
+            if len(self._responses) > self._maximum_size:
+                _, evicted_response = self._responses.popitem(last=False)
+                self.size -= evicted_response.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(fingerprint=None)
+
+    def _reset(self, fingerprint: Optional[Hashable]) -> None:
+        self._fingerprint = fingerprint
+        self._responses.clear()
+        self.size = 0
@@ -1,25 +1,43 @@
-from typing import Dict, Callable
+from typing import Dict, Callable, Iterable, Optional
 
 from brochure.values.basics import Basics
 from brochure.values.section import Section
 from jinja2 import Template
 from werkzeug.wrappers import Response
 
+from brochure_wsgi.stage_timer import timed_stage
+
 
 class SectionResponseProvider(object):
+    """
+    Renders a section into a single string or, when `streaming_minimum_size` is set and the section body is at least that
+    many characters long, passes the pieces the template generates to `streaming_response_serializer`. Streamed pages
+    start sooner and never hold the whole page in memory, but they are not cached.
+    """
 
     def __init__(self,
                  template: Template,
                  section_context_serializer: Callable[[Section, Basics], Dict[str, Dict[str, str]]],
-                 response_serializer: Callable[[str], Response]) -> None:
+                 response_serializer: Callable[[str], Response],
+                 streaming_response_serializer: Optional[Callable[[Iterable[str]], Response]] = None,
+                 streaming_minimum_size: Optional[int] = None) -> None:
         self._template = template
         self._section_context_serializer = section_context_serializer
         self._serializer = response_serializer
+        self._streaming_serializer = streaming_response_serializer
+        self._streaming_minimum_size = streaming_minimum_size
         super().__init__()
 
     def __call__(self, cover_section: Section, basics: Basics, *args, **kwargs) -> Response:
-        context = self._section_context_serializer(cover_section, basics)
-        body = self._template.render(context)
-        response = self._serializer(body)
+        if self._streaming_minimum_size is not None and len(cover_section.body) >= self._streaming_minimum_size:
+            context = self._section_context_serializer(cover_section, basics)
+
+            return self._streaming_serializer(self._template.generate(context))
+
+        with timed_stage("render"):
+            context = self._section_context_serializer(cover_section, basics)
+            body = self._template.render(context)
+        with timed_stage("serialize"):
+            response = self._serializer(body)
 
         return response
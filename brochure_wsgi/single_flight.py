@@ -0,0 +1,72 @@
+import asyncio
+from threading import Event, Lock
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key: while `function` runs for a key, other threads that call `do` with that
+    key wait for it and get its result, or its exception, instead of calling their own function. Calls made after it
+    finished start a new flight.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as exception:
+            call.exception = exception
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class AsyncSingleFlight(object):
+    """
+    `SingleFlight` for coroutines running on one event loop: concurrent `do` calls for the same key await one task
+    created from `coroutine_function`. A caller that is cancelled stops waiting without cancelling the shared task.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tasks = {}
+
+    async def do(self, key: Hashable, coroutine_function: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(coroutine_function())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        return await asyncio.shield(task)
@@ -0,0 +1,114 @@
+from contextvars import ContextVar
+from time import perf_counter_ns
+from typing import Callable, Dict, Iterable, Optional
+
+_current_request_timings = ContextVar("brochure_wsgi_request_timings", default=None)
+
+
+class RequestTimings(object):
+    """
+    Nanoseconds spent in each named stage of one request, in the order the stages first ran.
+
+    Stages can nest (`process_command` includes `route`, `fetch` and `render`) and run more than once (one `fetch` per
+    fetcher); repeated stages are summed.
+    """
+
+    __slots__ = ("durations",)
+
+    def __init__(self) -> None:
+        self.durations = {}
+
+    def add(self, stage: str, duration: int) -> None:
+        self.durations[stage] = self.durations.get(stage, 0) + duration
+
+    def stage(self, stage: str) -> "_TimedStage":
+        return _TimedStage(self, stage)
+
+    def server_timing(self) -> str:
+        return ", ".join("{};dur={:.3f}".format(stage, duration / 1e6) for stage, duration in self.durations.items())
+
+
+class _TimedStage(object):
+    __slots__ = ("_timings", "_stage", "_started")
+
+    def __init__(self, timings: RequestTimings, stage: str) -> None:
+        self._timings = timings
+        self._stage = stage
+
+    def __enter__(self) -> None:
+        self._started = perf_counter_ns()
+
+    def __exit__(self, *exc_info) -> None:
+        self._timings.add(self._stage, perf_counter_ns() - self._started)
+
+
+class _UntimedStage(object):
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_UNTIMED_STAGE = _UntimedStage()
+
+# Returns the `RequestTimings` of the request being timed, or `None`. Code that runs on every request branches on this
+# rather than entering a `timed_stage` block, which keeps the cost of disabled timing to a single C call.
+current_request_timings = _current_request_timings.get
+
+
+def timed_stage(stage: str):
+    """
+    Context manager that adds the time spent in its block to `stage` of the request being timed by a `StageTimer`.
+
+    Outside of a timed request it returns a shared object that does nothing.
+    """
+    timings = _current_request_timings.get()
+
+    return _UNTIMED_STAGE if timings is None else _TimedStage(timings, stage)
+
+
+class StageTimer(object):
+    """
+    Times the stages of each request handled by `time_request` and passes the results to every hook.
+
+    Hooks are called with the request's `environ` and its `RequestTimings` once the response provider has returned. With
+    `server_timing` the stages that finished before the response started are also sent in a `Server-Timing` header.
+    """
+
+    def __init__(self,
+                 hooks: Iterable[Callable[[Dict, RequestTimings], None]] = (),
+                 server_timing: bool = False) -> None:
+        super().__init__()
+        self._hooks = tuple(hooks)
+        self._server_timing = server_timing
+
+    def time_request(self, environ: Dict, start_response: Callable, application: Callable) -> Iterable[bytes]:
+        timings = RequestTimings()
+        if self._server_timing:
+            start_response = _server_timing_start_response(start_response=start_response, timings=timings)
+
+        token = _current_request_timings.set(timings)
+        try:
+            with timings.stage("total"):
+                body = application(environ, start_response)
+        finally:
+            _current_request_timings.reset(token)
+
+        for hook in self._hooks:
+            hook(environ, timings)
+
+        return body
+
+
+def _server_timing_start_response(start_response: Callable, timings: RequestTimings) -> Callable:
+    def start_response_with_server_timing(status: str, headers, exc_info: Optional[tuple] = None):
+        headers = list(headers) + [("Server-Timing", timings.server_timing())]
+        if exc_info is None:
+            return start_response(status, headers)
+
+        return start_response(status, headers, exc_info)
+
+    return start_response_with_server_timing
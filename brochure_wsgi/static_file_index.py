@@ -0,0 +1,171 @@
+import mimetypes
+import os
+from email.utils import formatdate
+from hashlib import sha256
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from werkzeug.wsgi import FileWrapper
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse, etag_matches, NOT_MODIFIED_HEADER_NAMES
+
+HASHED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNHASHED_CACHE_CONTROL = "public, max-age=60"
+COMPRESSIBLE_MIMETYPES = frozenset(("application/javascript", "application/json", "application/xml", "image/svg+xml",
+                                    "image/x-icon", "image/vnd.microsoft.icon"))
+FILE_BLOCK_SIZE = 64 * 1024
+METHOD_NOT_ALLOWED_RESPONSE = CachedResponse(status="405 Method Not Allowed",
+                                             headers=(("Allow", "GET, HEAD"), ("Content-Length", "0")),
+                                             body=b"")
+
+
+class FileResponse(object):
+    """
+    Streams a file that is too large to keep in memory, through `wsgi.file_wrapper` when the server provides one.
+    """
+
+    __slots__ = ("file_path", "headers", "etag", "not_modified_headers")
+
+    def __init__(self, file_path: str, headers: Iterable[Tuple[str, str]], etag: str) -> None:
+        self.file_path = file_path
+        self.headers = tuple(headers) + (("ETag", etag),)
+        self.etag = etag
+        self.not_modified_headers = tuple(header for header in self.headers if header[0].lower() in NOT_MODIFIED_HEADER_NAMES)
+
+    def __call__(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None and etag_matches(etag=self.etag, if_none_match=if_none_match):
+            start_response("304 Not Modified", list(self.not_modified_headers))
+
+            return []
+
+        start_response("200 OK", list(self.headers))
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return []
+
+        file_wrapper = environ.get("wsgi.file_wrapper", FileWrapper)
+
+        return file_wrapper(open(self.file_path, "rb"), FILE_BLOCK_SIZE)
+
+
+class StaticFileIndex(object):
+    """
+    Index of every file below `directory`, built once, at startup.
+
+    Each file is served at its plain URL (`<url_prefix><relative path>`) with a short `Cache-Control` lifetime, and at a
+    content-hashed URL (`<url_prefix>css/site.3f2a9c1b7d4e.css`) that can be cached forever. Templates should link to the
+    hashed URL returned by `url_for`. `aliases` serves files at additional URL paths, like `/favicon.ico`.
+
+    Files of up to `maximum_memory_file_size` bytes are held in memory as `CachedResponse`s with their headers, ETag
+    and (for text formats) compressed variants precomputed once and shared by both URLs. Once the files held in memory
+    take `maximum_memory_size` bytes (see `memory_size`), further files are streamed from disk, as are larger files.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 url_prefix: str = "/static/",
+                 aliases: Optional[Mapping[str, str]] = None,
+                 maximum_memory_file_size: int = 256 * 1024,
+                 maximum_memory_size: int = 16 * 1024 * 1024,
+                 compression_minimum_size: Optional[int] = 512) -> None:
+        super().__init__()
+        self._hashed_url_paths = {}
+        self._responses = {}
+        self._memory_size = 0
+        for relative_path in _relative_file_paths(directory):
+            file_path = os.path.join(directory, *relative_path.split("/"))
+            content_hash = _hash_file(file_path)
+            hashed_url_path = "{}{}".format(url_prefix, _hashed_relative_path(relative_path, content_hash))
+            headers = _file_headers(file_path=file_path, relative_path=relative_path)
+            last_modified = int(os.path.getmtime(file_path))
+            etag = '"{}"'.format(content_hash)
+            file_size = os.path.getsize(file_path)
+            if file_size <= maximum_memory_file_size and self._memory_size + file_size <= maximum_memory_size:
+                with open(file_path, "rb") as static_file:
+                    body = static_file.read()
+                compressible = _is_compressible(headers[0][1])
+                response = CachedResponse(status="200 OK",
+                                          headers=headers,
+                                          body=body,
+                                          etag=etag,
+                                          last_modified=last_modified,
+                                          compression_minimum_size=compression_minimum_size if compressible else None)
+                unhashed_response, hashed_response = (response.with_headers((("Cache-Control", cache_control),))
+                                                      for cache_control in (UNHASHED_CACHE_CONTROL, HASHED_CACHE_CONTROL))
+                self._memory_size += response.size
+            else:
+                unhashed_response, hashed_response = (
+                    FileResponse(file_path=file_path,
+                                 headers=headers + (("Cache-Control", cache_control),
+                                                    ("Last-Modified", formatdate(last_modified, usegmt=True))),
+                                 etag=etag)
+                    for cache_control in (UNHASHED_CACHE_CONTROL, HASHED_CACHE_CONTROL))
+            self._hashed_url_paths[relative_path] = hashed_url_path
+            self._responses["{}{}".format(url_prefix, relative_path)] = unhashed_response
+            self._responses[hashed_url_path] = hashed_response
+
+        for alias_url_path, relative_path in (aliases or {}).items():
+            self._responses[alias_url_path] = self._responses["{}{}".format(url_prefix, relative_path)]
+
+    @property
+    def memory_size(self) -> int:
+        return self._memory_size
+
+    @property
+    def url_paths(self) -> frozenset:
+        return frozenset(self._responses)
+
+    def url_for(self, relative_path: str) -> str:
+        try:
+            return self._hashed_url_paths[relative_path.lstrip("/")]
+        except KeyError:
+            raise ValueError("No static file named '{}'.".format(relative_path))
+
+    def get_response(self, url_path: str, method: str) -> Optional[Callable[[Dict, Callable], Iterable[bytes]]]:
+        response = self._responses.get(url_path)
+        if response is not None and method not in ("GET", "HEAD"):
+            return METHOD_NOT_ALLOWED_RESPONSE
+
+        return response
+
+
+def _relative_file_paths(directory: str) -> List[str]:
+    relative_paths = []
+    for root, directory_names, file_names in os.walk(directory):
+        directory_names[:] = sorted(name for name in directory_names if not name.startswith("."))
+        for file_name in sorted(file_names):
+            if not file_name.startswith("."):
+                relative_paths.append(os.path.relpath(os.path.join(root, file_name), directory).replace(os.sep, "/"))
+
+    return relative_paths
+
+
+def _hash_file(file_path: str) -> str:
+    file_hash = sha256()
+    with open(file_path, "rb") as static_file:
+        for block in iter(lambda: static_file.read(FILE_BLOCK_SIZE), b""):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()[:12]
+
+
+def _hashed_relative_path(relative_path: str, content_hash: str) -> str:
+    directory, _, file_name = relative_path.rpartition("/")
+    stem, _, extension = file_name.rpartition(".")
+    hashed_file_name = "{}.{}.{}".format(stem, content_hash, extension) if stem else "{}.{}".format(file_name, content_hash)
+
+    return "{}/{}".format(directory, hashed_file_name) if directory else hashed_file_name
+
+
+def _file_headers(file_path: str, relative_path: str) -> Tuple[Tuple[str, str], ...]:
+    mimetype, _ = mimetypes.guess_type(relative_path)
+    content_type = mimetype or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type = "{}; charset=utf-8".format(content_type)
+
+    return ("Content-Type", content_type), ("Content-Length", str(os.path.getsize(file_path)))
+
+
+def _is_compressible(content_type: str) -> bool:
+    mimetype = content_type.split(";", 1)[0]
+
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
@@ -0,0 +1,33 @@
+from threading import local
+from typing import Callable, Optional
+
+from brochure.brochure_application import BrochureApplication
+
+
+class ThreadLocalDomainApplicationProvider(object):
+    """
+    Returns a `BrochureApplication` owned by the calling thread.
+
+    The brochure application keeps the registered user interface in instance state while it processes a command, so a
+    single instance cannot serve concurrent requests. Each thread gets its own instance from
+    `domain_application_factory` the first time it asks for one; `initial_domain_application`, when given, is used for
+    the thread that creates the provider.
+    """
+
+    def __init__(self,
+                 domain_application_factory: Callable[[], BrochureApplication],
+                 initial_domain_application: Optional[BrochureApplication] = None) -> None:
+        super().__init__()
+        self._domain_application_factory = domain_application_factory
+        self._thread_local = local()
+        if initial_domain_application is not None:
+            self._thread_local.domain_application = initial_domain_application
+
+    def __call__(self) -> BrochureApplication:
+        try:
+            return self._thread_local.domain_application
+        except AttributeError:
+            domain_application = self._domain_application_factory()
+            self._thread_local.domain_application = domain_application
+
+            return domain_application
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+
+def validator_key_from_environment(environ: Dict) -> Tuple[Optional[str], Optional[str]]:
+    return environ.get("PATH_INFO"), environ.get("HTTP_ACCEPT")
+
+
+class ValidatorCache(object):
+    """
+    Remembers which cached response (and therefore which ETag / Last-Modified validators) each request received, along
+    with the version of the content it was rendered from.
+
+    `content_version_provider` must be cheap: it is called for every conditional request and should not do more than
+    compare already fetched snapshots (see `CachingValueFetcher.get_snapshot`). A remembered response is only returned
+    by `get_response` while the content version is unchanged.
+    """
+
+    def __init__(self,
+                 content_version_provider: Callable[[], Hashable],
+                 validator_key_provider: Callable[[Dict], Hashable] = validator_key_from_environment,
+                 maximum_size: int = 256) -> None:
+        self._content_version_provider = content_version_provider
+        self._validator_key_provider = validator_key_provider
+        self._maximum_size = maximum_size
+        self._responses = OrderedDict()
+        self._lock = Lock()
+        super().__init__()
+
+    def get_content_version(self) -> Optional[Hashable]:
+        # noinspection PyBroadException
+        try:
+            return self._content_version_provider()
+        except Exception:
+            return None
+
+    def get_response(self, environ: Dict) -> Optional[CachedResponse]:
+        key = self._validator_key_provider(environ)
+        with self._lock:
+            entry = self._responses.get(key)
+        if entry is None:
+            return None
+
+        content_version, response = entry
+        if content_version != self.get_content_version():
+            return None
+
+        return response
+
+    def remember(self, environ: Dict, content_version: Optional[Hashable], response: Callable) -> None:
+        if content_version is None or getattr(response, "etag", None) is None:
+            return
+
+        key = self._validator_key_provider(environ)
+        with self._lock:
+            self._responses[key] = (content_version, response)
+            self._responses.move_to_end(key)
+            if len(self._responses) > self._maximum_size:
+                self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
@@ -0,0 +1,126 @@
+import time
+from typing import Callable, Generic, Hashable, NamedTuple, Optional, TypeVar, Any
+
+from brochure_wsgi.single_flight import SingleFlight
+from brochure_wsgi.stage_timer import current_request_timings
+
+T = TypeVar('T')
+LOAD_FLIGHT_KEY = "load"
+
+
+class ValueSnapshot(NamedTuple):
+    value: Any
+    version_key: Hashable
+    loaded_at: float
+
+
+class CachingValueFetcher(Generic[T]):
+    """
+    Serves an immutable snapshot of the value returned by another fetcher.
+
+    The wrapped fetcher is only called again when:
+        - the snapshot is explicitly invalidated (`invalidate`) or reloaded (`reload`)
+        - the value returned by `version_key_provider` no longer matches the one recorded with the snapshot
+        - `time_to_live` seconds have passed since the snapshot was last checked and no `version_key_provider` is set
+
+    When both a `version_key_provider` and a `time_to_live` are given, the version key is only checked once the time to
+    live has expired. Threads that find the snapshot out of date at the same time share one call of the wrapped fetcher
+    (see `SingleFlight`), and its exception if it fails.
+
+    With a `time_to_live`, a snapshot that fails to load again (e.g. the file it was parsed from is now malformed or
+    gone) is kept and served for another `time_to_live` seconds before the next attempt; such failures are counted in
+    `load_failures`. Without a snapshot to keep, or without a time to live, the exception is raised.
+    """
+
+    def __init__(self,
+                 fetcher: Callable[[], T],
+                 version_key_provider: Optional[Callable[[], Hashable]] = None,
+                 time_to_live: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._fetcher = fetcher
+        self._version_key_provider = version_key_provider
+        self._time_to_live = time_to_live
+        self._clock = clock
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._single_flight = SingleFlight()
+        self.load_failures = 0
+        super().__init__()
+
+    def __call__(self, *args, **kwargs) -> T:
+        timings = current_request_timings()
+        if timings is None:
+            return self.get_snapshot().value
+
+        with timings.stage("fetch"):
+            return self.get_snapshot().value
+
+    def get_snapshot(self) -> ValueSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or not self._time_to_live:
+            return self._get_current_snapshot(snapshot)
+
+        try:
+            return self._get_current_snapshot(snapshot)
+        except Exception:
+            self.load_failures += 1
+            self._checked_at = self._clock()
+
+            return snapshot
+
+    def _get_current_snapshot(self, snapshot: Optional[ValueSnapshot]) -> ValueSnapshot:
+        if snapshot is not None and self._is_current(snapshot):
+            return snapshot
+
+        def load_unless_replaced() -> ValueSnapshot:
+            current_snapshot = self._snapshot
+            if current_snapshot is not None and current_snapshot is not snapshot:
+                return current_snapshot
+
+            return self._load()
+
+        return self._single_flight.do(key=LOAD_FLIGHT_KEY, function=load_unless_replaced)
+
+    def has_snapshot(self) -> bool:
+        return self._snapshot is not None
+
+    def has_current_snapshot(self) -> bool:
+        """
+        Whether `get_snapshot` would return the current snapshot without calling the version key provider or the
+        wrapped fetcher, i.e. without blocking on e.g. a file that has to be checked.
+        """
+        if self._snapshot is None:
+            return False
+
+        if self._time_to_live is not None:
+            return self._clock() - self._checked_at < self._time_to_live
+
+        return self._version_key_provider is None
+
+    def reload(self) -> ValueSnapshot:
+        return self._single_flight.do(key=LOAD_FLIGHT_KEY, function=self._load)
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def _is_current(self, snapshot: ValueSnapshot) -> bool:
+        if self._time_to_live is not None:
+            now = self._clock()
+            if now - self._checked_at < self._time_to_live:
+                return True
+            if self._version_key_provider is None or self._version_key_provider() != snapshot.version_key:
+                return False
+            self._checked_at = now
+
+            return True
+
+        return self._version_key_provider is None or self._version_key_provider() == snapshot.version_key
+
+    def _load(self) -> ValueSnapshot:
+        version_key = self._version_key_provider() if self._version_key_provider is not None else None
+        value = self._fetcher()
+        loaded_at = self._clock()
+        self._snapshot = ValueSnapshot(value=value, version_key=version_key, loaded_at=loaded_at)
+        self._checked_at = loaded_at
+
+        return self._snapshot
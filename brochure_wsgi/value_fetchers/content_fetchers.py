@@ -0,0 +1,101 @@
+import os
+from functools import lru_cache
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from brochure_wsgi.value_fetchers.environment_contact_method_fetcher import environment_contact_method_fetcher
+from brochure_wsgi.value_fetchers.environment_cover_section_fetcher import environment_cover_section_fetcher
+from brochure_wsgi.value_fetchers.environment_enterprise_fetcher import environment_enterprise_fetcher
+from brochure_wsgi.value_fetchers.file_content_bundle_fetcher import ContentBundleFieldFetcher, FileContentBundleFetcher
+from brochure_wsgi.value_fetchers.refreshing_value_fetcher import RefreshingValueFetcher
+
+
+class ContentFetchers(NamedTuple):
+    contact_method: Callable[[], Any]
+    cover_section: Callable[[], Any]
+    enterprise: Callable[[], Any]
+
+
+environment_content_fetchers = ContentFetchers(contact_method=environment_contact_method_fetcher,
+                                               cover_section=environment_cover_section_fetcher,
+                                               enterprise=environment_enterprise_fetcher)
+
+
+def create_file_content_fetchers(file_path: str,
+                                 check_interval: float,
+                                 refresh_in_background: bool = False) -> ContentFetchers:
+    """
+    With `refresh_in_background` the file is checked, and parsed when it changed, by a `RefreshingValueFetcher` in a
+    background thread, so requests never wait for it after the first load.
+    """
+    if refresh_in_background:
+        content_bundle_fetcher = RefreshingValueFetcher(fetcher=FileContentBundleFetcher(file_path=file_path, check_interval=0.0),
+                                                        freshness=check_interval)
+    else:
+        content_bundle_fetcher = FileContentBundleFetcher(file_path=file_path, check_interval=check_interval)
+
+    return ContentFetchers(contact_method=ContentBundleFieldFetcher(content_bundle_fetcher, "contact_method"),
+                           cover_section=ContentBundleFieldFetcher(content_bundle_fetcher, "cover_section"),
+                           enterprise=ContentBundleFieldFetcher(content_bundle_fetcher, "enterprise"))
+
+
+@lru_cache(maxsize=None)
+def get_file_content_fetchers(file_path: str, check_interval: float, refresh_in_background: bool = False) -> ContentFetchers:
+    return create_file_content_fetchers(file_path=file_path,
+                                        check_interval=check_interval,
+                                        refresh_in_background=refresh_in_background)
+
+
+def get_refreshing_fetchers(content_fetchers: ContentFetchers) -> List[RefreshingValueFetcher]:
+    refreshing_fetchers = []
+    for fetcher in content_fetchers:
+        fetcher = getattr(fetcher, "content_bundle_fetcher", fetcher)
+        if isinstance(fetcher, RefreshingValueFetcher) and fetcher not in refreshing_fetchers:
+            refreshing_fetchers.append(fetcher)
+
+    return refreshing_fetchers
+
+
+def get_last_modified_provider(content_fetchers: ContentFetchers) -> Optional[Callable[[], Optional[float]]]:
+    """
+    Returns a callable that gives the modification time of the content file that `content_fetchers` last loaded, or
+    `None` when they serve content that has no modification time (the environment variables).
+    """
+    content_bundle_fetcher = getattr(content_fetchers.cover_section, "content_bundle_fetcher", None)
+    if content_bundle_fetcher is None:
+        return None
+
+    if isinstance(content_bundle_fetcher, RefreshingValueFetcher):
+        content_bundle_fetcher = content_bundle_fetcher.fetcher
+
+    return content_bundle_fetcher.get_last_modified
+
+
+def can_fetch_without_blocking(content_fetchers: ContentFetchers) -> bool:
+    """
+    Whether `content_fetchers` can answer from memory: environment content once it is parsed (checking whether it
+    changed only reads `os.environ`), and file content while the file does not have to be checked or parsed again.
+    """
+    if content_fetchers is environment_content_fetchers:
+        return all(fetcher.has_snapshot() for fetcher in content_fetchers)
+
+    return all(fetcher.has_current_snapshot() for fetcher in content_fetchers)
+
+
+def is_background_refresh_enabled() -> bool:
+    return os.environ.get("BROCHURE_CONTENT_REFRESH_IN_BACKGROUND", "").lower() in ("1", "true", "yes")
+
+
+def get_content_fetchers() -> ContentFetchers:
+    """
+    Fetchers for the content named by `BROCHURE_CONTENT_FILE`, re-checked every `BROCHURE_CONTENT_CHECK_INTERVAL`
+    seconds (1 by default) in a background thread when `BROCHURE_CONTENT_REFRESH_IN_BACKGROUND` is set, or for the
+    `BROCHURE_COVER_SECTION`, `BROCHURE_ENTERPRISE` and `BROCHURE_CONTACT_METHOD` environment variables when no content
+    file is set. Every call for the same file returns the same fetchers.
+    """
+    content_file_path = os.environ.get("BROCHURE_CONTENT_FILE")
+    if not content_file_path:
+        return environment_content_fetchers
+
+    return get_file_content_fetchers(file_path=os.path.abspath(content_file_path),
+                                     check_interval=float(os.environ.get("BROCHURE_CONTENT_CHECK_INTERVAL", "1.0")),
+                                     refresh_in_background=is_background_refresh_enabled())
@@ -3,6 +3,7 @@ from typing import Optional
 from brochure.values.contact_method import ContactMethod, ContactMethodType
 
 from brochure_wsgi.deserializers.json_deserializer import JSONDeserializer
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher
 from brochure_wsgi.value_fetchers.environment_variable_fetcher import EnvironmentVariableFetcher
 
 
@@ -12,5 +13,7 @@ def contact_method_deserializer(contact_method) -> Optional[ContactMethod]:
 
 
 contact_method_json_deserializer = JSONDeserializer(deserializer=contact_method_deserializer)
-environment_contact_method_fetcher = EnvironmentVariableFetcher(key="BROCHURE_CONTACT_METHOD",
-                                                                deserializer=contact_method_json_deserializer)
+environment_contact_method_variable_fetcher = EnvironmentVariableFetcher(key="BROCHURE_CONTACT_METHOD",
+                                                                         deserializer=contact_method_json_deserializer)
+environment_contact_method_fetcher = CachingValueFetcher(fetcher=environment_contact_method_variable_fetcher,
+                                                         version_key_provider=environment_contact_method_variable_fetcher.raw_value)
@@ -1,8 +1,11 @@
 from brochure.values.section import Section
 
 from brochure_wsgi.deserializers.json_deserializer import JSONDeserializer
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher
 from brochure_wsgi.value_fetchers.environment_variable_fetcher import EnvironmentVariableFetcher
 
 section_json_deserializer = JSONDeserializer(deserializer=lambda section: Section(**section))
-environment_cover_section_fetcher = EnvironmentVariableFetcher(key="BROCHURE_COVER_SECTION",
-                                                               deserializer=section_json_deserializer)
+environment_cover_section_variable_fetcher = EnvironmentVariableFetcher(key="BROCHURE_COVER_SECTION",
+                                                                        deserializer=section_json_deserializer)
+environment_cover_section_fetcher = CachingValueFetcher(fetcher=environment_cover_section_variable_fetcher,
+                                                        version_key_provider=environment_cover_section_variable_fetcher.raw_value)
@@ -1,8 +1,11 @@
 from brochure.values.enterprise import Enterprise
 
 from brochure_wsgi.deserializers.json_deserializer import JSONDeserializer
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher
 from brochure_wsgi.value_fetchers.environment_variable_fetcher import EnvironmentVariableFetcher
 
 enterprise_json_deserializer = JSONDeserializer(deserializer=lambda eo: Enterprise(**eo))
-environment_enterprise_fetcher = EnvironmentVariableFetcher(key="BROCHURE_ENTERPRISE",
-                                                            deserializer=enterprise_json_deserializer)
+environment_enterprise_variable_fetcher = EnvironmentVariableFetcher(key="BROCHURE_ENTERPRISE",
+                                                                     deserializer=enterprise_json_deserializer)
+environment_enterprise_fetcher = CachingValueFetcher(fetcher=environment_enterprise_variable_fetcher,
+                                                     version_key_provider=environment_enterprise_variable_fetcher.raw_value)
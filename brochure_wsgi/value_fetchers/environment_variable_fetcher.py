@@ -1,5 +1,5 @@
 import os
-from typing import Callable, Generic, TypeVar
+from typing import Callable, Generic, TypeVar, Optional
 
 T = TypeVar('T')
 
@@ -12,6 +12,9 @@ class EnvironmentVariableFetcher(Generic[T]):
         super().__init__()
 
     def __call__(self, *args, **kwargs) -> T:
-        string_value = os.environ.get(self._key)
+        string_value = self.raw_value()
 
         return self._deserializer(string_value)
+
+    def raw_value(self) -> Optional[str]:
+        return os.environ.get(self._key)
@@ -0,0 +1,108 @@
+import mmap
+import os
+import time
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Union
+
+from brochure.values.contact_method import ContactMethod
+from brochure.values.enterprise import Enterprise
+from brochure.values.section import Section
+
+from brochure_wsgi.deserializers.json_deserializer import JSONDeserializer
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher, ValueSnapshot
+from brochure_wsgi.value_fetchers.environment_contact_method_fetcher import contact_method_deserializer
+from brochure_wsgi.value_fetchers.refreshing_value_fetcher import RefreshingValueFetcher
+
+MMAP_MINIMUM_SIZE = 64 * 1024
+
+
+class ContentBundle(NamedTuple):
+    cover_section: Section
+    enterprise: Enterprise
+    contact_method: Optional[ContactMethod]
+
+
+def content_bundle_deserializer(content_bundle: Dict[str, Dict[str, str]]) -> ContentBundle:
+    return ContentBundle(cover_section=Section(**content_bundle["cover_section"]),
+                         enterprise=Enterprise(**content_bundle["enterprise"]),
+                         contact_method=contact_method_deserializer(content_bundle["contact_method"]))
+
+
+content_bundle_json_deserializer = JSONDeserializer(deserializer=content_bundle_deserializer)
+
+
+def file_version_key(file_path: str) -> Hashable:
+    file_stat = os.stat(file_path)
+
+    return file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+def read_text_file(file_path: str, mmap_minimum_size: int = MMAP_MINIMUM_SIZE) -> str:
+    with open(file_path, "rb") as text_file:
+        if os.fstat(text_file.fileno()).st_size < mmap_minimum_size:
+            return text_file.read().decode("utf-8")
+
+        with mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            # Decodes straight from the mapped pages, without first copying the file into a bytes object.
+            return str(mapped_file, "utf-8")
+
+
+class FileContentBundleFetcher(CachingValueFetcher[ContentBundle]):
+    """
+    Serves the `ContentBundle` parsed from the JSON file at `file_path`, e.g.
+
+        {"cover_section": {"title": "…", "body": "…"},
+         "enterprise": {"name": "…"},
+         "contact_method": {"contact_method_type": "email", "value": "…"}}
+
+    The file is parsed once per change rather than per request. Whether it changed is checked with `os.stat` (device,
+    inode, size and modification time) at most once every `check_interval` seconds, and a changed file is parsed and
+    swapped in as a new snapshot. Replace the file atomically (write a new file, then rename it over the old one) so
+    that a half-written file is never read. Files of at least `mmap_minimum_size` bytes are memory-mapped.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 check_interval: float = 1.0,
+                 mmap_minimum_size: int = MMAP_MINIMUM_SIZE,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__(fetcher=lambda: content_bundle_json_deserializer(read_text_file(file_path, mmap_minimum_size)),
+                         version_key_provider=lambda: file_version_key(file_path),
+                         time_to_live=check_interval,
+                         clock=clock)
+
+    def get_last_modified(self) -> Optional[float]:
+        """
+        Modification time of the file the current snapshot was parsed from, without checking the file again.
+        """
+        snapshot = self._snapshot
+
+        return snapshot.version_key[3] / 1e9 if snapshot is not None else None
+
+
+class ContentBundleFieldFetcher(object):
+    """
+    Fetches one field of the content bundle served by `content_bundle_fetcher`, sharing its snapshot.
+    """
+
+    def __init__(self,
+                 content_bundle_fetcher: Union[FileContentBundleFetcher, RefreshingValueFetcher[ContentBundle]],
+                 field_name: str) -> None:
+        self._content_bundle_fetcher = content_bundle_fetcher
+        self._field_name = field_name
+        super().__init__()
+
+    @property
+    def content_bundle_fetcher(self) -> Union[FileContentBundleFetcher, RefreshingValueFetcher[ContentBundle]]:
+        return self._content_bundle_fetcher
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return getattr(self._content_bundle_fetcher(), self._field_name)
+
+    def get_snapshot(self) -> ValueSnapshot:
+        return self._content_bundle_fetcher.get_snapshot()
+
+    def has_snapshot(self) -> bool:
+        return self._content_bundle_fetcher.has_snapshot()
+
+    def has_current_snapshot(self) -> bool:
+        return self._content_bundle_fetcher.has_current_snapshot()
@@ -0,0 +1,116 @@
+import threading
+import time
+from threading import Lock
+from typing import Callable, Generic, Optional, TypeVar
+
+from brochure_wsgi.single_flight import SingleFlight
+from brochure_wsgi.stage_timer import current_request_timings
+from brochure_wsgi.value_fetchers.caching_value_fetcher import LOAD_FLIGHT_KEY, ValueSnapshot
+
+T = TypeVar('T')
+
+
+class RefreshingValueFetcher(Generic[T]):
+    """
+    Serves a snapshot of the value returned by another fetcher without ever waiting for it to be refreshed.
+
+    Only the first load happens in the calling threads, which share it (see `SingleFlight`). Once the snapshot has not
+    been refreshed for `freshness` seconds, the next reader starts a refresh in a background thread and keeps serving
+    the current snapshot; at most one refresh runs at a time. A refreshed value that equals the current one keeps the current
+    snapshot, so validators derived from it stay valid. A failed refresh keeps the current snapshot and is retried after
+    another `freshness` seconds.
+
+    `refreshes` and `refresh_failures` count the background refreshes, and the refresh observer (see
+    `set_refresh_observer`) is called with the duration in seconds of each one and whether it succeeded.
+    """
+
+    def __init__(self,
+                 fetcher: Callable[[], T],
+                 freshness: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 thread_factory: Callable[..., threading.Thread] = threading.Thread) -> None:
+        self._fetcher = fetcher
+        self._freshness = freshness
+        self._clock = clock
+        self._thread_factory = thread_factory
+        self._snapshot = None
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self._refresh_observer = None
+        self._lock = Lock()
+        self._single_flight = SingleFlight()
+        self.refreshes = 0
+        self.refresh_failures = 0
+        super().__init__()
+
+    @property
+    def fetcher(self) -> Callable[[], T]:
+        return self._fetcher
+
+    def __call__(self, *args, **kwargs) -> T:
+        timings = current_request_timings()
+        if timings is None:
+            return self.get_snapshot().value
+
+        with timings.stage("fetch"):
+            return self.get_snapshot().value
+
+    def get_snapshot(self) -> ValueSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load_first_snapshot()
+
+        if not self._refreshing and self._clock() - self._refreshed_at >= self._freshness:
+            self._start_refresh()
+
+        return snapshot
+
+    def has_snapshot(self) -> bool:
+        return self._snapshot is not None
+
+    def has_current_snapshot(self) -> bool:
+        # Once loaded, the snapshot is served while it is refreshed in the background.
+        return self._snapshot is not None
+
+    def set_refresh_observer(self, refresh_observer: Optional[Callable[[float, bool], None]]) -> None:
+        self._refresh_observer = refresh_observer
+
+    def _load_first_snapshot(self) -> ValueSnapshot:
+        def load_unless_loaded() -> ValueSnapshot:
+            if self._snapshot is None:
+                loaded_at = self._clock()
+                self._snapshot = ValueSnapshot(value=self._fetcher(), version_key=None, loaded_at=loaded_at)
+                self._refreshed_at = loaded_at
+
+            return self._snapshot
+
+        return self._single_flight.do(key=LOAD_FLIGHT_KEY, function=load_unless_loaded)
+
+    def _start_refresh(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        self._thread_factory(target=self._refresh, name="brochure-refresh", daemon=True).start()
+
+    def _refresh(self) -> None:
+        started = time.perf_counter()
+        # noinspection PyBroadException
+        try:
+            value = self._fetcher()
+        except Exception:
+            succeeded = False
+            self.refresh_failures += 1
+        else:
+            succeeded = True
+            if value != self._snapshot.value:
+                self._snapshot = ValueSnapshot(value=value, version_key=None, loaded_at=self._clock())
+        duration = time.perf_counter() - started
+        self.refreshes += 1
+        self._refreshed_at = self._clock()
+        self._refreshing = False
+
+        refresh_observer = self._refresh_observer
+        if refresh_observer is not None:
+            refresh_observer(duration, succeeded)
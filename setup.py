@@ -19,6 +19,7 @@ setup(name=package_name,
           "{}.response_providers".format(package_name),
           "{}.value_fetchers".format(package_name),
           "{}.command_preprocessors".format(package_name),
+          "{}.metrics".format(package_name),
       ],
       install_requires=[
           'brochure',
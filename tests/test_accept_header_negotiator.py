@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from brochure_wsgi.accept_header_negotiator import AcceptHeaderNegotiator, parse_accept_header
+
+
+class TestAcceptHeaderNegotiator(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.negotiator = AcceptHeaderNegotiator(representations=("text/html", "application/json"))
+
+    def test_missing_header_returns_first_representation(self):
+        self.assertEqual("text/html", self.negotiator(None))
+
+    def test_exact_media_type_is_chosen(self):
+        self.assertEqual("application/json", self.negotiator("application/json"))
+
+    def test_exact_media_type_beats_wildcard_with_equal_quality(self):
+        self.assertEqual("application/json", self.negotiator("application/json, text/plain, */*"))
+
+    def test_browser_header_prefers_html(self):
+        accept = "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+
+        self.assertEqual("text/html", self.negotiator(accept))
+
+    def test_higher_quality_wins(self):
+        self.assertEqual("application/json", self.negotiator("text/html;q=0.5, application/json;q=0.9"))
+
+    def test_sub_type_wildcard_matches(self):
+        self.assertEqual("application/json", self.negotiator("application/*"))
+
+    def test_other_sub_type_of_same_main_type_does_not_match(self):
+        self.assertEqual("application/json", self.negotiator("text/plain, application/json;q=0.5"))
+
+    def test_full_wildcard_returns_first_representation(self):
+        self.assertEqual("text/html", self.negotiator("*/*"))
+
+    def test_zero_quality_excludes_representation(self):
+        self.assertEqual("application/json", self.negotiator("text/html;q=0, */*;q=0.1"))
+
+    def test_most_specific_range_determines_quality(self):
+        self.assertEqual("application/json", self.negotiator("*/*;q=1, text/html;q=0.2"))
+
+    def test_unacceptable_header_returns_first_representation(self):
+        self.assertEqual("text/html", self.negotiator("image/png"))
+
+    def test_results_are_memoized_per_raw_header(self):
+        self.negotiator("application/json")
+        self.negotiator("application/json")
+
+        self.assertEqual(1, self.negotiator._negotiate.cache_info().hits)
+
+    def test_parse_skips_malformed_ranges_and_clamps_quality(self):
+        media_ranges = parse_accept_header("garbage, text/html;level=1;q=7, application/json;q=abc")
+
+        self.assertEqual([("text", "html", 1.0), ("application", "json", 0.0)], media_ranges)
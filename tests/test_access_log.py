@@ -0,0 +1,215 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from io import BytesIO
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.access_log import AccessLog, join_lines
+from brochure_wsgi.brochure_wsgi_application import get_access_log, get_brochure_wsgi_application
+
+
+class DeferredThread(object):
+    """
+    Thread factory whose writer threads only start when the test starts them, so entries stay queued until then.
+    """
+
+    def __init__(self, target, args, name, daemon):
+        self.thread = threading.Thread(target=target, args=args, name=name, daemon=daemon)
+
+    def start(self):
+        pass
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+
+class BrokenStream(object):
+
+    def write(self, data):
+        raise OSError("Disk full")
+
+
+class RecordingStream(BytesIO):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+        return super().write(data)
+
+
+def entries_from(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestAccessLog(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stream = BytesIO()
+        self.threads = []
+
+    def deferred_thread_factory(self, **kwargs):
+        thread = DeferredThread(**kwargs)
+        self.threads.append(thread)
+
+        return thread
+
+    @staticmethod
+    def application(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/html; charset=utf-8")])
+
+        return [b"Hello, ", b"world"]
+
+    def test_request_is_written_as_json_line(self):
+        access_log = AccessLog(stream=self.stream, clock=lambda: 1000.0)
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "HTTP_HOST": "example.com"}
+
+        body = access_log.observe_request(environ=environ, start_response=lambda status, headers: None,
+                                          application=self.application)
+        access_log.close()
+
+        self.assertEqual([b"Hello, ", b"world"], body)
+        entry, = entries_from(self.stream)
+        self.assertLess(entry.pop("duration"), 1.0)
+        self.assertEqual({"time": 1000.0, "method": "GET", "path": "/", "host": "example.com", "status": 200,
+                          "representation": "text/html", "bytes": 12, "cache": None}, entry)
+        self.assertEqual((1, 0), (access_log.written, access_log.dropped))
+
+    def test_failed_requests_and_closed_streamed_bodies_are_written(self):
+        access_log = AccessLog(stream=self.stream)
+
+        def failing_application(environ, start_response):
+            raise ValueError("Broken")
+
+        def streaming_application(environ, start_response):
+            start_response("200 OK", [])
+
+            return iter([b"Streamed"])
+
+        with self.assertRaises(ValueError):
+            access_log.observe_request(environ={}, start_response=None, application=failing_application)
+        body = access_log.observe_request(environ={}, start_response=lambda status, headers: None,
+                                          application=streaming_application)
+        self.assertEqual([b"Streamed"], list(body))
+        body.close()
+        access_log.close()
+
+        self.assertEqual([(None, None, None), (200, None, None)],
+                         [(entry["status"], entry["representation"], entry["bytes"]) for entry in entries_from(self.stream)])
+
+    def test_entries_are_dropped_when_queue_is_full_and_queued_ones_are_written_on_close(self):
+        access_log = AccessLog(stream=self.stream, maximum_queue_size=2, batch_size=1,
+                               thread_factory=self.deferred_thread_factory)
+        for _ in range(3):
+            access_log.observe_request(environ={}, start_response=lambda status, headers: None,
+                                       application=self.application)
+
+        self.threads[0].thread.start()
+        access_log.close()
+
+        self.assertEqual(2, len(entries_from(self.stream)))
+        self.assertEqual((2, 1), (access_log.written, access_log.dropped))
+
+    def test_close_gives_up_when_queue_stays_full(self):
+        access_log = AccessLog(stream=self.stream, maximum_queue_size=1, thread_factory=self.deferred_thread_factory)
+        access_log.record((0.0, "GET", "/", "example.com", "200 OK", [], 0, 0.0, None))
+
+        access_log.close(timeout=0.01)
+        access_log.close()
+
+        self.assertEqual(b"", self.stream.getvalue())
+
+    def test_entries_that_cannot_be_written_are_dropped(self):
+        access_log = AccessLog(stream=BrokenStream())
+        access_log.record((0.0, "GET", "/", "example.com", "200 OK", [], 0, 0.0, None))
+
+        access_log.close()
+
+        self.assertEqual((0, 1), (access_log.written, access_log.dropped))
+
+    def test_batches_are_written_in_chunks_of_whole_lines(self):
+        stream = RecordingStream()
+        access_log = AccessLog(stream=stream, maximum_write_size=300, thread_factory=self.deferred_thread_factory)
+        for _ in range(5):
+            access_log.observe_request(environ={}, start_response=lambda status, headers: None,
+                                       application=self.application)
+        self.threads[0].thread.start()
+        access_log.close()
+
+        self.assertEqual(5, len(entries_from(stream)))
+        self.assertGreater(len(stream.writes), 1)
+        for chunk in stream.writes:
+            self.assertLessEqual(len(chunk), 300)
+            self.assertTrue(chunk.endswith(b"\n"))
+
+    def test_lines_are_joined_up_to_maximum_size_and_longer_lines_are_kept_whole(self):
+        self.assertEqual([b"ab\ncd\n", b"long line\n", b"e\n"],
+                         list(join_lines([b"ab\n", b"cd\n", b"long line\n", b"e\n"], maximum_size=6)))
+
+    def test_writer_is_started_again_after_close(self):
+        access_log = AccessLog(stream=self.stream)
+        access_log.record((0.0, "GET", "/", "example.com", "200 OK", [], 0, 0.0, None))
+        access_log.close()
+
+        access_log.record((0.0, "GET", "/", "example.com", "200 OK", [], 0, 0.0, None))
+        queue = access_log._start_writer()
+        access_log.close()
+
+        self.assertIs(queue, access_log._queue)
+        self.assertEqual(2, access_log.written)
+
+
+class TestAccessLogRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.access_log_path = os.path.join(directory.name, "access.log")
+        os.environ["BROCHURE_ACCESS_LOG"] = self.access_log_path
+        self.addCleanup(os.environ.pop, "BROCHURE_ACCESS_LOG")
+
+    def test_requests_are_logged_with_representation_and_cache_outcome(self):
+        web_application = get_brochure_wsgi_application()
+        app = TestApp(web_application)
+
+        app.get("/")
+        app.get("/", headers={"Accept": "application/json"})
+        app.get("/")
+        app.get("/favicon.ico")
+        web_application.close()
+
+        with open(self.access_log_path) as access_log_file:
+            entries = [json.loads(line) for line in access_log_file]
+        self.assertEqual([("/", 200, "text/html", "miss"),
+                          ("/", 200, "application/json", "miss"),
+                          ("/", 200, "text/html", "hit"),
+                          ("/favicon.ico", 200, "image/vnd.microsoft.icon", None)],
+                         [(entry["path"], entry["status"], entry["representation"], entry["cache"]) for entry in entries])
+        self.assertEqual(len(app.get("/").body), entries[2]["bytes"])
+
+    def test_access_log_goes_to_standard_output_for_dash(self):
+        os.environ["BROCHURE_ACCESS_LOG"] = "-"
+        web_application = get_brochure_wsgi_application()
+
+        self.assertIs(sys.stdout.buffer, get_access_log()._stream)
+        web_application.close()
+
+    def test_no_access_log_by_default(self):
+        os.environ.pop("BROCHURE_ACCESS_LOG")
+        self.addCleanup(os.environ.__setitem__, "BROCHURE_ACCESS_LOG", self.access_log_path)
+
+        get_brochure_wsgi_application().close()
+
+        self.assertIsNone(get_access_log())
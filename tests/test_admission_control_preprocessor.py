@@ -0,0 +1,145 @@
+import json
+import os
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.command_preprocessors.admission_control_preprocessor import AdmissionControlPreprocessor, \
+    get_client_address
+from brochure_wsgi.command_preprocessors.command_preprocessor import finish_request
+from brochure_wsgi.stage_timer import StageTimer
+
+
+class TestClientAddress(TestCase):
+
+    def test_peer_address_is_used_without_trusted_proxies(self):
+        environ = {"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": "203.0.113.7"}
+
+        self.assertEqual("10.0.0.1", get_client_address(environ))
+
+    def test_address_added_by_outermost_trusted_proxy_is_used(self):
+        environ = {"REMOTE_ADDR": "10.0.0.2", "HTTP_X_FORWARDED_FOR": "198.51.100.9, 203.0.113.7, 10.0.0.1"}
+
+        self.assertEqual("203.0.113.7", get_client_address(environ, trusted_proxy_depth=2))
+
+    def test_peer_address_is_used_when_trusted_proxies_did_not_forward(self):
+        self.assertEqual("10.0.0.1", get_client_address({"REMOTE_ADDR": "10.0.0.1"}, trusted_proxy_depth=1))
+        self.assertEqual("10.0.0.1", get_client_address({"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": "203.0.113.7"},
+                                                        trusted_proxy_depth=2))
+
+
+class TestAdmissionControlPreprocessor(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+
+    def preprocess(self, preprocessor, client_address="203.0.113.7", environ=None):
+        environ = environ if environ is not None else {}
+        environ["REMOTE_ADDR"] = client_address
+
+        return preprocessor.preprocess(environ=environ, start_response=lambda status, headers: None)
+
+    def test_client_over_its_rate_gets_too_many_requests(self):
+        preprocessor = AdmissionControlPreprocessor(requests_per_second=1.0, burst=2.0, retry_after=5,
+                                                    clock=lambda: self.now)
+
+        responses = [self.preprocess(preprocessor) for _ in range(3)]
+
+        self.assertEqual([None, None], responses[:2])
+        self.assertEqual("429 Too Many Requests", responses[2].status)
+        self.assertIn(("Retry-After", "5"), responses[2].headers)
+        self.assertIsNone(self.preprocess(preprocessor, client_address="198.51.100.9"))
+        self.assertEqual(1, preprocessor.rate_limited)
+
+    def test_bucket_refills_at_rate(self):
+        preprocessor = AdmissionControlPreprocessor(requests_per_second=2.0, clock=lambda: self.now)
+        self.preprocess(preprocessor)
+        self.preprocess(preprocessor)
+        self.now = 0.5
+
+        self.assertIsNone(self.preprocess(preprocessor))
+        self.assertIsNotNone(self.preprocess(preprocessor))
+
+    def test_least_recently_seen_clients_are_forgotten(self):
+        preprocessor = AdmissionControlPreprocessor(requests_per_second=1.0, maximum_clients=1, clock=lambda: self.now)
+        self.preprocess(preprocessor)
+        self.preprocess(preprocessor, client_address="198.51.100.9")
+
+        self.assertIsNone(self.preprocess(preprocessor))
+
+    def test_requests_over_in_flight_limit_get_service_unavailable_until_one_finishes(self):
+        preprocessor = AdmissionControlPreprocessor(maximum_in_flight=1)
+        environ = {}
+        self.preprocess(preprocessor, environ=environ)
+
+        self.assertEqual("503 Service Unavailable", self.preprocess(preprocessor).status)
+        finish_request(environ)
+        self.assertIsNone(self.preprocess(preprocessor))
+        self.assertEqual((1, 1), (preprocessor.in_flight, preprocessor.overloaded))
+
+
+class TestAdmissionControlRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        for name, value in (("BROCHURE_RATE_LIMIT", "0.001"),
+                            ("BROCHURE_RATE_LIMIT_BURST", "2"),
+                            ("BROCHURE_TRUSTED_PROXY_DEPTH", "1"),
+                            ("BROCHURE_MAXIMUM_IN_FLIGHT", "4")):
+            os.environ[name] = value
+            self.addCleanup(os.environ.pop, name)
+        self.web_application = get_brochure_wsgi_application()
+        self.app = TestApp(self.web_application)
+
+    def test_client_over_its_rate_is_rejected_before_processing(self):
+        headers = {"X-Forwarded-For": "203.0.113.7"}
+        self.app.get("/", headers=headers)
+        self.app.get("/missing", headers=headers, status=404)
+        self.web_application._domain_application._command_map = None
+
+        response = self.app.get("/", headers=headers, status=429)
+
+        self.assertEqual("1", response.headers["Retry-After"])
+        self.app.get("/", headers={"X-Forwarded-For": "198.51.100.9"})
+
+    def test_admitted_requests_are_released_when_they_finish(self):
+        preprocessor = self.web_application._command_preprocessors[0]
+
+        self.app.get("/")
+        self.app.get("/static/missing.css", status=404)
+
+        self.assertEqual(0, preprocessor.in_flight)
+
+    def test_streamed_bodies_keep_their_slot_until_closed(self):
+        os.environ["BROCHURE_COVER_SECTION"] = json.dumps({"title": "Cover Title", "body": "Long body text. " * 20000})
+        preprocessor = self.web_application._command_preprocessors[0]
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+                   "wsgi.url_scheme": "http", "HTTP_ACCEPT": "text/html", "REMOTE_ADDR": "203.0.113.7"}
+
+        body = self.web_application(environ, lambda status, headers, exc_info=None: None)
+
+        self.assertNotIsInstance(body, list)
+        self.assertEqual(1, preprocessor.in_flight)
+        self.assertIn(b"Long body text.", b"".join(body))
+        self.assertEqual(1, preprocessor.in_flight)
+        body.close()
+        self.assertEqual(0, preprocessor.in_flight)
+
+    def test_admitted_requests_are_released_when_they_fail(self):
+        preprocessor = self.web_application._command_preprocessors[0]
+
+        def failing_process(environ):
+            raise RuntimeError("Broken")
+
+        self.web_application.process = failing_process
+        for client_address, stage_timer in (("203.0.113.7", None), ("198.51.100.9", StageTimer())):
+            self.web_application._stage_timer = stage_timer
+            with self.assertRaises(RuntimeError):
+                self.app.get("/", headers={"X-Forwarded-For": client_address})
+
+        self.assertEqual(0, preprocessor.in_flight)
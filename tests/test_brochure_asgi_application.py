@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+from unittest import TestCase
+
+from brochure_wsgi.brochure_asgi_application import BrochureASGIApplication, get_brochure_asgi_application, \
+    environ_from_scope
+from brochure_wsgi.value_fetchers.environment_contact_method_fetcher import environment_contact_method_fetcher
+from brochure_wsgi.value_fetchers.environment_cover_section_fetcher import environment_cover_section_fetcher
+from brochure_wsgi.value_fetchers.environment_enterprise_fetcher import environment_enterprise_fetcher
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted_count = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted_count += 1
+
+        return super().submit(*args, **kwargs)
+
+
+class TestASGIRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        for fetcher in (environment_contact_method_fetcher, environment_cover_section_fetcher, environment_enterprise_fetcher):
+            fetcher.invalidate()
+        self.executor = RecordingExecutor()
+        self.app = get_brochure_asgi_application(executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super().tearDown()
+
+    def _get(self, path: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Tuple[int, Dict[bytes, bytes], bytes]:
+        return asyncio.run(self._request(path=path, headers=headers))
+
+    async def _request(self, path: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Tuple[int, Dict[bytes, bytes], bytes]:
+        scope = {"type": "http",
+                 "http_version": "1.1",
+                 "method": "GET",
+                 "scheme": "https",
+                 "path": path,
+                 "query_string": b"",
+                 "headers": headers or [],
+                 "server": ("www.example.com", 443),
+                 "client": ("127.0.0.1", 50000)}
+        sent_messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}  # pragma nocover
+
+        async def send(message):
+            sent_messages.append(message)
+
+        await self.app(scope, receive, send)
+        start_message, *body_messages = sent_messages
+        self.assertEqual([True] * (len(body_messages) - 1) + [False], [message["more_body"] for message in body_messages])
+        self.body_message_count = len(body_messages)
+
+        return start_message["status"], dict(start_message["headers"]), b"".join(message["body"] for message in body_messages)
+
+    def test_homepage_contains_section_title(self):
+        status, headers, body = self._get("/")
+
+        self.assertEqual(200, status)
+        self.assertEqual(b"text/html; charset=utf-8", headers[b"content-type"])
+        self.assertIn(b"Cover Title", body)
+
+    def test_homepage_json_contains_section(self):
+        status, headers, body = self._get("/", headers=[(b"accept", b"application/json")])
+
+        self.assertEqual({"title": "Cover Title", "body": "Body text"}, json.loads(body.decode("utf-8"))["section"])
+
+    def test_random_path_returns_not_found(self):
+        status, headers, body = self._get("/asdf")
+
+        self.assertEqual(404, status)
+        self.assertIn(b'Resource "/asdf" not found.', body)
+
+    def test_homepage_is_sent_in_one_body_message(self):
+        self._get("/")
+
+        self.assertEqual(1, self.body_message_count)
+
+    def test_favicon_is_served_without_executor_once_content_is_loaded(self):
+        self._get("/")
+
+        status, headers, body = self._get("/favicon.ico")
+
+        self.assertEqual((200, 1), (status, self.executor.submitted_count))
+        self.assertEqual(os.path.getsize(os.path.join(os.path.dirname(__file__), "..", "brochure_wsgi", "static", "favicon.ico")),
+                         len(body))
+
+    def test_large_static_file_is_streamed_and_closed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, "video.mp4"), "wb") as static_file:
+            static_file.write(b"\x00" * 300000)
+        os.environ["BROCHURE_STATIC_DIRECTORY"] = directory
+        self.addCleanup(os.environ.pop, "BROCHURE_STATIC_DIRECTORY")
+        self.app = get_brochure_asgi_application(executor=self.executor)
+
+        status, headers, body = self._get("/static/video.mp4")
+
+        self.assertEqual((200, 300000), (status, len(body)))
+        self.assertGreater(self.body_message_count, 2)
+        self.assertEqual(1 + self.body_message_count, self.executor.submitted_count)
+
+    def test_first_request_processes_on_executor(self):
+        self._get("/")
+
+        self.assertEqual(1, self.executor.submitted_count)
+
+    def test_requests_after_content_is_loaded_process_on_event_loop(self):
+        self._get("/")
+        self._get("/")
+        self._get("/asdf")
+
+        self.assertEqual(1, self.executor.submitted_count)
+
+    def test_application_processes_every_request_on_executor_by_default(self):
+        self.app = BrochureASGIApplication(wsgi_application=self.app._wsgi_application, executor=self.executor)
+
+        self._get("/")
+        self._get("/")
+
+        self.assertEqual(2, self.executor.submitted_count)
+
+    def test_concurrent_first_requests_share_one_content_load(self):
+        async def get_concurrently():
+            return await asyncio.gather(*(self._request("/") for _ in range(8)))
+
+        responses = asyncio.run(get_concurrently())
+
+        self.assertEqual([200] * 8, [status for status, headers, body in responses])
+        self.assertEqual(1, self.executor.submitted_count)
+
+    def test_failed_content_load_is_processed_on_executor(self):
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Broken"'
+
+        status, headers, body = self._get("/")
+
+        self.assertEqual((500, 2), (status, self.executor.submitted_count))
+
+    def test_list_body_chunks_are_sent_as_separate_messages(self):
+        def application(environ, start_response):
+            start_response("200 OK", [])
+
+            return [b"Hello, ", b"world"] if environ["PATH_INFO"] == "/" else []
+
+        self.app = BrochureASGIApplication(wsgi_application=application, processes_without_blocking=lambda: True)
+
+        self.assertEqual((200, {}, b"Hello, world"), self._get("/"))
+        self.assertEqual(2, self.body_message_count)
+        self.assertEqual((200, {}, b""), self._get("/empty"))
+
+    def test_requests_are_written_to_access_log(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.environ["BROCHURE_ACCESS_LOG"] = os.path.join(directory, "access.log")
+        self.addCleanup(os.environ.pop, "BROCHURE_ACCESS_LOG")
+        self.app = get_brochure_asgi_application(executor=self.executor)
+
+        self._get("/")
+        self._get("/asdf")
+        self.app._wsgi_application.close()
+
+        with open(os.environ["BROCHURE_ACCESS_LOG"]) as access_log_file:
+            entries = [json.loads(line) for line in access_log_file]
+        self.assertEqual([("/", 200, "miss"), ("/asdf", 404, "miss")],
+                         [(entry["path"], entry["status"], entry["cache"]) for entry in entries])
+
+    def test_content_file_is_checked_on_executor_once_its_check_interval_expires(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        content_file_path = os.path.join(directory, "content.json")
+        with open(content_file_path, "w") as content_file:
+            json.dump({"cover_section": {"title": "File Title", "body": "Body text"},
+                       "enterprise": {"name": "File Enterprise"},
+                       "contact_method": {"contact_method_type": "email", "value": "ejemplo@example.com"}}, content_file)
+        os.environ["BROCHURE_CONTENT_FILE"] = content_file_path
+        self.addCleanup(os.environ.pop, "BROCHURE_CONTENT_FILE")
+        submitted_counts = []
+        for check_interval in ("3600", "0"):
+            os.environ["BROCHURE_CONTENT_CHECK_INTERVAL"] = check_interval
+            self.app = get_brochure_asgi_application(executor=self.executor)
+            self._get("/")
+            self._get("/")
+            submitted_counts.append(self.executor.submitted_count)
+        os.environ.pop("BROCHURE_CONTENT_CHECK_INTERVAL")
+
+        # Without a check interval, every request loads the content and is then processed on the executor.
+        self.assertEqual([1, 5], submitted_counts)
+
+    def test_lifespan_startup_and_shutdown_are_acknowledged(self):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent_messages = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent_messages.append(message)
+
+        asyncio.run(self.app({"type": "lifespan"}, receive, send))
+
+        self.assertEqual([{"type": "lifespan.startup.complete"}, {"type": "lifespan.shutdown.complete"}], sent_messages)
+
+    def test_unsupported_scope_type_sends_nothing(self):
+        sent_messages = []
+
+        async def send(message):
+            sent_messages.append(message)  # pragma nocover
+
+        asyncio.run(self.app({"type": "websocket"}, None, send))
+
+        self.assertEqual([], sent_messages)
+
+    def test_environ_from_scope_translates_headers_and_query_string(self):
+        environ = environ_from_scope({"type": "http",
+                                      "method": "GET",
+                                      "path": "/café",
+                                      "query_string": b"q=1",
+                                      "headers": [(b"content-type", b"text/plain"),
+                                                  (b"x-forwarded-for", b"10.0.0.1"),
+                                                  (b"x-forwarded-for", b"10.0.0.2")]})
+
+        self.assertEqual(("/cafÃ©", "q=1", "text/plain", "10.0.0.1,10.0.0.2", "localhost", "http"),
+                         (environ["PATH_INFO"], environ["QUERY_STRING"], environ["CONTENT_TYPE"],
+                          environ["HTTP_X_FORWARDED_FOR"], environ["SERVER_NAME"], environ["wsgi.url_scheme"]))
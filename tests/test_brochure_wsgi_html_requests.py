@@ -87,3 +87,23 @@ class TestHTMLRequests(TestCase):
 
     def test_favicon(self):
         self.app.get("/favicon.ico")
+
+    def test_homepage_reflects_changed_cover_section(self):
+        self.app.get("/")
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Changed Title", "body": "Changed text"}'
+        html = self.app.get("/").html
+
+        self.assertEqual(html.body.h2.text, "Changed Title")
+
+    def test_not_found_page_for_second_path_contains_second_path(self):
+        self.app.get("/first", status=404)
+        html = self.app.get("/second", status=404).html
+
+        self.assertEqual(html.body.p.text, "Resource \"/second\" not found.")
+
+    def test_homepage_renders_after_response_caches_are_cleared(self):
+        self.app.get("/")
+        self.app.app._user_interface_provider.clear_response_caches()
+        html = self.app.get("/").html
+
+        self.assertEqual(html.title.text, "Example Enterprise")
@@ -54,3 +54,13 @@ class TestJSONRequests(TestCase):
         }
 
         self.assertEqual(expected_response_body, response.json_body)
+
+    def test_homepage_with_typical_http_client_accept_header_returns_json(self):
+        response = self.app.get('/', headers={'Accept': 'application/json, text/plain, */*'})
+
+        self.assertEqual("application/json", response.content_type)
+
+    def test_homepage_varies_by_accept_header(self):
+        response = self.app.get('/', headers={'Accept': 'application/json'})
+
+        self.assertEqual("Accept", response.headers["Vary"])
@@ -0,0 +1,79 @@
+import os
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.response_providers.bytes_response import BytesResponse, redirect_response
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+
+class TestBytesResponse(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.started = []
+
+    def start_response(self, status, headers):
+        self.started.append((status, headers))
+
+    def test_headers_include_content_type_and_content_length_in_bytes(self):
+        response = BytesResponse("Café".encode("utf-8"), status=404, content_type="text/plain; charset=utf-8",
+                                 headers=(("Vary", "Accept"),))
+
+        body = response({"REQUEST_METHOD": "GET"}, self.start_response)
+
+        self.assertEqual([b"Caf\xc3\xa9"], body)
+        self.assertEqual([("404 Not Found", [("Vary", "Accept"),
+                                             ("Content-Type", "text/plain; charset=utf-8"),
+                                             ("Content-Length", "5")])], self.started)
+
+    def test_head_requests_get_the_headers_without_the_body(self):
+        response = BytesResponse(b"Body", content_type="text/plain")
+
+        body = response({"REQUEST_METHOD": "HEAD"}, self.start_response)
+
+        self.assertEqual([], body)
+        self.assertEqual(("Content-Length", "4"), self.started[0][1][-1])
+
+    def test_redirect_has_location_and_empty_body(self):
+        body = redirect_response(location="https://example.com/", status=308)({}, self.start_response)
+
+        self.assertEqual([b""], body)
+        self.assertEqual([("308 Permanent Redirect", [("Location", "https://example.com/"), ("Content-Length", "0")])],
+                         self.started)
+
+    def test_cached_response_keeps_body_and_headers(self):
+        response = BytesResponse(b"Body", content_type="text/plain")
+
+        cached_response = CachedResponse.from_response(response, last_modified_provider=lambda: 0)
+
+        self.assertEqual(b"Body", cached_response.body)
+        self.assertEqual(response.headers, cached_response.headers[:2])
+        self.assertIsNotNone(cached_response.etag)
+
+
+class TestBytesResponsePages(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self.app = TestApp(get_brochure_wsgi_application())
+
+    def test_head_request_has_the_content_length_of_the_page(self):
+        page = self.app.get("/")
+
+        head = self.app.head("/")
+
+        self.assertEqual(b"", head.body)
+        self.assertEqual(str(len(page.body)), head.headers["Content-Length"])
+
+    def test_exception_page_has_its_content_length(self):
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Broken"'
+
+        response = self.app.get("/", status=500)
+
+        self.assertEqual("500 Internal Server Error", response.status)
+        self.assertEqual(len(response.body), response.content_length)
@@ -0,0 +1,193 @@
+import os
+from unittest import TestCase
+
+from brochure.values.section import Section
+
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher
+from brochure_wsgi.value_fetchers.environment_cover_section_fetcher import environment_cover_section_fetcher
+
+
+class TestCachingValueFetcher(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._fetch_count = 0
+        self._version_key = "version-1"
+        self._now = 0.0
+
+    def _fake_fetcher(self):
+        self._fetch_count += 1
+
+        return "value-{}".format(self._fetch_count)
+
+    def _fake_clock(self):
+        return self._now
+
+    def test_call_without_version_key_or_time_to_live_fetches_once(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher)
+
+        fetcher()
+        fetcher()
+        value = fetcher()
+
+        self.assertEqual(("value-1", 1), (value, self._fetch_count))
+
+    def test_call_returns_same_snapshot_while_version_key_is_unchanged(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher, version_key_provider=lambda: self._version_key)
+
+        first_snapshot = fetcher.get_snapshot()
+        second_snapshot = fetcher.get_snapshot()
+
+        self.assertIs(first_snapshot, second_snapshot)
+
+    def test_call_refetches_when_version_key_changes(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher, version_key_provider=lambda: self._version_key)
+
+        fetcher()
+        self._version_key = "version-2"
+        value = fetcher()
+
+        self.assertEqual("value-2", value)
+
+    def test_snapshot_is_current_without_checking_only_within_time_to_live(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: self._version_key,
+                                      time_to_live=10,
+                                      clock=self._fake_clock)
+        self.assertFalse(fetcher.has_current_snapshot())
+        fetcher()
+        self._now = 9.0
+        self.assertTrue(fetcher.has_current_snapshot())
+        self._now = 10.0
+
+        self.assertFalse(fetcher.has_current_snapshot())
+
+    def test_snapshot_with_version_key_needs_checking(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher, version_key_provider=lambda: self._version_key)
+        fetcher()
+
+        self.assertFalse(fetcher.has_current_snapshot())
+
+    def test_snapshot_is_current_without_checking(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher)
+        fetcher()
+
+        self.assertTrue(fetcher.has_current_snapshot())
+
+    def test_snapshot_records_version_key_and_load_time(self):
+        self._now = 12.5
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: self._version_key,
+                                      clock=self._fake_clock)
+
+        snapshot = fetcher.get_snapshot()
+
+        self.assertEqual(("value-1", "version-1", 12.5), snapshot)
+
+    def test_call_within_time_to_live_does_not_check_version_key(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: self._version_key,
+                                      time_to_live=10,
+                                      clock=self._fake_clock)
+
+        fetcher()
+        self._version_key = "version-2"
+        self._now = 9
+        value = fetcher()
+
+        self.assertEqual("value-1", value)
+
+    def test_call_after_time_to_live_with_unchanged_version_key_keeps_snapshot(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: self._version_key,
+                                      time_to_live=10,
+                                      clock=self._fake_clock)
+
+        fetcher()
+        self._now = 11
+        fetcher()
+        self._version_key = "version-2"
+        self._now = 20
+        value = fetcher()
+
+        self.assertEqual("value-1", value)
+
+    def test_call_after_time_to_live_with_changed_version_key_refetches(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: self._version_key,
+                                      time_to_live=10,
+                                      clock=self._fake_clock)
+
+        fetcher()
+        self._version_key = "version-2"
+        self._now = 10
+        value = fetcher()
+
+        self.assertEqual("value-2", value)
+
+    def test_call_after_time_to_live_without_version_key_refetches(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher, time_to_live=10, clock=self._fake_clock)
+
+        fetcher()
+        self._now = 10
+        value = fetcher()
+
+        self.assertEqual("value-2", value)
+
+    def test_invalidate_causes_next_call_to_refetch(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher)
+
+        fetcher()
+        fetcher.invalidate()
+        value = fetcher()
+
+        self.assertEqual("value-2", value)
+
+    def test_reload_refetches_immediately(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher)
+
+        fetcher()
+        snapshot = fetcher.reload()
+
+        self.assertEqual(("value-2", 2), (snapshot.value, self._fetch_count))
+
+    def test_fetcher_exception_is_raised_and_not_cached(self):
+        def failing_fetcher():
+            self._fetch_count += 1
+            raise ValueError("Malformed content")
+
+        fetcher = CachingValueFetcher(fetcher=failing_fetcher)
+
+        with self.assertRaises(ValueError):
+            fetcher()
+        with self.assertRaises(ValueError):
+            fetcher()
+
+        self.assertEqual(2, self._fetch_count)
+
+    def test_stale_reader_returns_snapshot_loaded_by_another_reader_instead_of_refetching(self):
+        fetcher = CachingValueFetcher(fetcher=self._fake_fetcher,
+                                      version_key_provider=lambda: concurrent_version_key_provider())
+
+        def concurrent_version_key_provider():
+            if self._version_key == "version-2" and self._fetch_count == 1:
+                self._version_key = "version-3"
+                fetcher.reload()
+
+            return self._version_key
+
+        fetcher()
+        self._version_key = "version-2"
+        value = fetcher()
+
+        self.assertEqual(("value-2", 2), (value, self._fetch_count))
+
+    def test_environment_cover_section_fetcher_reuses_parsed_section_until_variable_changes(self):
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cached Title", "body": "Cached body"}'
+        first_section = environment_cover_section_fetcher()
+        second_section = environment_cover_section_fetcher()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "New Title", "body": "New body"}'
+        third_section = environment_cover_section_fetcher()
+
+        self.assertIs(first_section, second_section)
+        self.assertEqual(Section(title="New Title", body="New body"), third_section)
@@ -0,0 +1,170 @@
+import os
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.circuit_breaker import CircuitBreaker
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+GOOD_RESPONSE = CachedResponse(status="200 OK", headers=(), body=b"Good")
+OTHER_GOOD_RESPONSE = CachedResponse(status="200 OK", headers=(), body=b"Other")
+NOT_FOUND_RESPONSE = CachedResponse(status="404 NOT FOUND", headers=(), body=b"Not found")
+FAILURE_RESPONSE = CachedResponse(status="500 INTERNAL SERVER ERROR", headers=(), body=b"Failure")
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+        self.calls = 0
+        self.circuit_breaker = CircuitBreaker(probe_interval=1.0, clock=lambda: self.now)
+
+    def call(self, response, path="/", accept="text/html"):
+        def function():
+            self.calls += 1
+            if isinstance(response, Exception):
+                raise response
+
+            return response
+
+        return self.circuit_breaker.call(environ={"PATH_INFO": path, "HTTP_ACCEPT": accept}, function=function)
+
+    def fail_requests(self, count=3, path="/"):
+        for _ in range(count):
+            self.call(FAILURE_RESPONSE, path=path)
+
+    def test_failure_serves_last_good_response(self):
+        self.call(GOOD_RESPONSE)
+
+        self.assertIs(GOOD_RESPONSE, self.call(FAILURE_RESPONSE))
+        self.assertFalse(self.circuit_breaker.is_open)
+        self.assertEqual(1, self.circuit_breaker.fallbacks)
+
+    def test_breaker_opens_after_failure_threshold(self):
+        self.fail_requests(count=2)
+        self.assertFalse(self.circuit_breaker.is_open)
+
+        self.fail_requests(count=1)
+
+        self.assertTrue(self.circuit_breaker.is_open)
+
+    def test_success_resets_failure_count(self):
+        self.fail_requests(count=2)
+        self.call(GOOD_RESPONSE)
+        self.fail_requests(count=2)
+
+        self.assertFalse(self.circuit_breaker.is_open)
+
+    def test_open_breaker_serves_fallbacks_for_its_key_without_calling(self):
+        self.call(GOOD_RESPONSE)
+        self.fail_requests()
+        self.fail_requests(path="/missing")
+        self.calls = 0
+
+        self.assertIs(GOOD_RESPONSE, self.call(FAILURE_RESPONSE))
+        self.assertIs(FAILURE_RESPONSE, self.call(GOOD_RESPONSE, path="/missing"))
+        self.assertEqual(0, self.calls)
+
+    def test_open_breaker_only_affects_the_key_that_failed(self):
+        self.fail_requests()
+        self.calls = 0
+
+        self.assertIs(GOOD_RESPONSE, self.call(GOOD_RESPONSE, path="/other"))
+        self.assertIs(GOOD_RESPONSE, self.call(GOOD_RESPONSE, accept="application/json"))
+        self.assertEqual(2, self.calls)
+
+    def test_open_breaker_calls_requests_without_fallback(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.call(ValueError("Broken"))
+        self.assertTrue(self.circuit_breaker.is_open)
+        self.calls = 0
+
+        self.assertIs(GOOD_RESPONSE, self.call(GOOD_RESPONSE))
+        self.assertEqual(1, self.calls)
+        self.assertFalse(self.circuit_breaker.is_open)
+
+    def test_one_probe_per_interval_closes_the_breaker_when_it_succeeds(self):
+        self.call(GOOD_RESPONSE)
+        self.fail_requests()
+        self.calls = 0
+        self.now = 1.0
+
+        self.assertIs(GOOD_RESPONSE, self.call(FAILURE_RESPONSE))
+        self.assertIs(GOOD_RESPONSE, self.call(OTHER_GOOD_RESPONSE))
+        self.assertEqual(1, self.calls)
+        self.now = 2.0
+
+        self.assertIs(OTHER_GOOD_RESPONSE, self.call(OTHER_GOOD_RESPONSE))
+        self.assertFalse(self.circuit_breaker.is_open)
+        self.assertIs(OTHER_GOOD_RESPONSE, self.call(FAILURE_RESPONSE))
+
+    def test_exception_serves_last_good_response_or_is_raised(self):
+        self.call(GOOD_RESPONSE)
+
+        self.assertIs(GOOD_RESPONSE, self.call(ValueError("Broken")))
+        with self.assertRaises(ValueError):
+            self.call(ValueError("Broken"), path="/other")
+
+    def test_least_recently_used_keys_are_forgotten(self):
+        self.circuit_breaker = CircuitBreaker(maximum_size=1, clock=lambda: self.now)
+
+        self.call(GOOD_RESPONSE, path="/first")
+        self.call(OTHER_GOOD_RESPONSE, path="/second")
+        self.call(OTHER_GOOD_RESPONSE, path="/second")
+
+        self.assertIs(FAILURE_RESPONSE, self.call(FAILURE_RESPONSE, path="/first"))
+        self.assertIs(FAILURE_RESPONSE, self.call(FAILURE_RESPONSE, path="/second"))
+
+    def test_only_successful_responses_are_remembered(self):
+        self.circuit_breaker = CircuitBreaker(maximum_size=1, clock=lambda: self.now)
+        self.call(GOOD_RESPONSE)
+
+        self.assertIs(NOT_FOUND_RESPONSE, self.call(NOT_FOUND_RESPONSE, path="/missing"))
+        self.assertIs(GOOD_RESPONSE, self.call(FAILURE_RESPONSE))
+        self.assertIs(FAILURE_RESPONSE, self.call(FAILURE_RESPONSE, path="/missing"))
+
+
+class TestCircuitBreakerRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self.web_application = get_brochure_wsgi_application()
+        self.app = TestApp(self.web_application)
+
+    def test_broken_content_serves_last_good_page(self):
+        self.app.get("/")
+        os.environ["BROCHURE_COVER_SECTION"] = "{"
+
+        titles = [self.app.get("/").html.body.h2.text for _ in range(3)]
+
+        self.assertEqual(["Cover Title"] * 3, titles)
+        self.assertTrue(self.web_application._circuit_breaker.is_open)
+        self.assertEqual(500, self.app.get("/", headers={"Accept": "application/json"}, status=500).status_int)
+
+    def test_requests_for_missing_pages_do_not_push_out_last_good_page(self):
+        self.app.get("/")
+        for number in range(300):
+            self.app.get("/scan{}".format(number), status=404)
+        os.environ["BROCHURE_COVER_SECTION"] = "{"
+
+        self.assertEqual("Cover Title", self.app.get("/").html.body.h2.text)
+
+    def test_exception_page_is_rendered_once_per_exception_class(self):
+        os.environ["BROCHURE_CIRCUIT_BREAKER_PROBE_INTERVAL"] = "0"
+        self.addCleanup(os.environ.pop, "BROCHURE_CIRCUIT_BREAKER_PROBE_INTERVAL")
+        web_application = get_brochure_wsgi_application()
+        web_application._domain_application._command_map = None
+        app = TestApp(web_application)
+
+        first_body = app.get("/", status=500).body
+        second_body = app.get("/", status=500).body
+
+        exception_response_cache = web_application._user_interface_provider.response_caches["exception"]
+        self.assertEqual(first_body, second_body)
+        self.assertEqual((1, 1), (exception_response_cache.misses, exception_response_cache.hits))
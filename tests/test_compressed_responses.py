@@ -0,0 +1,106 @@
+import gzip
+import os
+import zlib
+from typing import Tuple, Dict
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.accept_encoding_negotiator import negotiate_content_encoding
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+
+class TestCompressedResponses(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        web_application = get_brochure_wsgi_application()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self.app = TestApp(web_application)
+
+    def _get_raw(self, accept_encoding: str) -> Tuple[Dict[str, str], bytes]:
+        captured_headers = {}
+
+        def start_response(status, headers):
+            captured_headers.update(headers)
+
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "HTTP_ACCEPT_ENCODING": accept_encoding,
+                   "SERVER_NAME": "www.example.com", "SERVER_PORT": "443", "wsgi.url_scheme": "https"}
+        body = b"".join(self.app.app(environ, start_response))
+
+        return captured_headers, body
+
+    def test_homepage_is_gzipped_when_client_accepts_gzip(self):
+        identity_response = self.app.get("/")
+        headers, body = self._get_raw(accept_encoding="gzip, deflate")
+
+        self.assertEqual("gzip", headers["Content-Encoding"])
+        self.assertEqual(identity_response.body, gzip.decompress(body))
+        self.assertEqual(str(len(body)), headers["Content-Length"])
+
+    def test_homepage_is_deflated_when_client_prefers_deflate(self):
+        identity_response = self.app.get("/")
+        headers, body = self._get_raw(accept_encoding="gzip;q=0.5, deflate")
+
+        self.assertEqual("deflate", headers["Content-Encoding"])
+        self.assertEqual(identity_response.body, zlib.decompress(body))
+
+    def test_homepage_varies_by_accept_and_accept_encoding(self):
+        response = self.app.get("/", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual("Accept, Accept-Encoding", response.headers["Vary"])
+
+    def test_identity_response_has_no_content_encoding(self):
+        response = self.app.get("/", headers={"Accept-Encoding": "identity"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_compressed_variant_has_its_own_etag(self):
+        identity_etag = self.app.get("/").headers["ETag"]
+        gzip_etag = self.app.get("/", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+        self.assertEqual('{}-gzip"'.format(identity_etag[:-1]), gzip_etag)
+        self.app.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}, status=304)
+        self.app.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": identity_etag}, status=200)
+
+    def test_json_homepage_below_minimum_size_is_not_compressed(self):
+        response = self.app.get("/", headers={"Accept": "application/json", "Accept-Encoding": "gzip"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual("Accept", response.headers["Vary"])
+
+    def test_compressed_variants_are_built_once(self):
+        response = CachedResponse(status="200 OK", headers=(("Content-Length", "2048"),), body=b"a" * 2048,
+                                  compression_minimum_size=512)
+
+        self.assertEqual(("gzip", "deflate"), response.encodings)
+        self.assertEqual([("Content-Length", "2048"), ("Vary", "Accept-Encoding")], list(response.headers))
+
+    def test_incompressible_body_has_no_compressed_variants(self):
+        response = CachedResponse(status="200 OK", headers=(), body=os.urandom(2048), compression_minimum_size=512)
+
+        self.assertEqual((), response.encodings)
+
+    def test_negotiate_content_encoding(self):
+        available_encodings = ("gzip", "deflate")
+        expectations = (
+            (None, "identity"),
+            ("", "identity"),
+            ("gzip", "gzip"),
+            ("deflate, gzip", "gzip"),
+            ("br", "identity"),
+            ("*", "gzip"),
+            ("*;q=0.5, deflate", "deflate"),
+            ("gzip;q=0.5, identity", "identity"),
+            ("gzip;q=invalid, deflate", "deflate"),
+            ("deflate;q=0.1", "identity"),
+            ("deflate;level=1", "deflate"),
+            ("gzip;q=0, deflate;q=0, identity;q=0", "identity"),
+        )
+
+        for accept_encoding, expected_encoding in expectations:
+            self.assertEqual(expected_encoding, negotiate_content_encoding(accept_encoding, available_encodings),
+                             accept_encoding)
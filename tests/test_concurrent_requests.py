@@ -0,0 +1,79 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import BrochureWSGIApplication, get_brochure_wsgi_application
+from brochure_wsgi.thread_local_domain_application_provider import ThreadLocalDomainApplicationProvider
+
+
+class TestConcurrentRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._web_application = get_brochure_wsgi_application()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self._switch_interval)
+        super().tearDown()
+
+    def _request(self, request_number: int) -> Tuple[int, str, str, int, str, str]:
+        path = "/" if request_number % 3 == 0 else "/missing-{}".format(request_number)
+        accept = "application/json" if request_number % 2 == 0 else "text/html"
+        expected_status = 200 if path == "/" else 404
+        response = TestApp(self._web_application).get(path, headers={"Accept": accept}, status="*")
+        if response.content_type == "application/json":
+            body = response.json_body.get("error", response.json_body.get("section", {}).get("title"))
+        else:
+            body = response.html.body.p.text if expected_status == 404 else response.html.body.h2.text
+
+        return expected_status, accept, path, response.status_int, response.content_type, body
+
+    def test_concurrent_requests_each_receive_their_own_response(self):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(self._request, range(600)))
+
+        for expected_status, accept, path, status, content_type, body in results:
+            self.assertEqual((expected_status, accept), (status, content_type))
+            if path == "/":
+                self.assertEqual("Cover Title", body)
+            elif accept == "application/json":
+                self.assertEqual("Resource '{}' not found.".format(path), body)
+            else:
+                self.assertEqual("Resource \"{}\" not found.".format(path), body)
+
+    def test_application_without_provider_uses_its_domain_application(self):
+        web_application = BrochureWSGIApplication(
+            domain_application=self._web_application._domain_application,
+            user_interface_provider=self._web_application._user_interface_provider,
+            get_path_command_provider=self._web_application._get_path_command_provider)
+
+        html = TestApp(web_application).get("/").html
+
+        self.assertEqual("Cover Title", html.body.h2.text)
+
+    def test_thread_local_domain_application_provider_returns_one_application_per_thread(self):
+        created_domain_applications = []
+
+        def domain_application_factory():
+            created_domain_applications.append(object())
+
+            return created_domain_applications[-1]
+
+        provider = ThreadLocalDomainApplicationProvider(domain_application_factory=domain_application_factory)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other_thread_applications = [executor.submit(provider).result() for _ in range(3)]
+        this_thread_applications = [provider() for _ in range(3)]
+
+        self.assertEqual(2, len(created_domain_applications))
+        self.assertEqual(1, len(set(map(id, other_thread_applications))))
+        self.assertEqual(1, len(set(map(id, this_thread_applications))))
+        self.assertIsNot(other_thread_applications[0], this_thread_applications[0])
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+from email.utils import formatdate
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application, BrochureWSGIApplication
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.validator_cache import ValidatorCache
+
+
+class TestConditionalRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        web_application = get_brochure_wsgi_application()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self.app = TestApp(web_application)
+
+    def test_homepage_has_etag(self):
+        response = self.app.get("/")
+
+        self.assertTrue(response.headers["ETag"].startswith('"'))
+
+    def test_homepage_from_environment_has_no_last_modified(self):
+        response = self.app.get("/")
+
+        self.app.get("/", headers={"If-Modified-Since": formatdate(usegmt=True)}, status=200)
+        self.assertNotIn("Last-Modified", response.headers)
+
+    def test_matching_if_none_match_returns_not_modified_without_body(self):
+        etag = self.app.get("/").headers["ETag"]
+
+        response = self.app.get("/", headers={"If-None-Match": etag}, status=304)
+
+        self.assertEqual((b"", etag), (response.body, response.headers["ETag"]))
+        self.assertEqual("Accept, Accept-Encoding", response.headers["Vary"])
+
+    def test_not_modified_is_returned_before_domain_application_runs(self):
+        etag = self.app.get("/").headers["ETag"]
+        self.app.app._domain_application._command_map = None
+
+        self.app.get("/", headers={"If-None-Match": etag}, status=304)
+
+    def test_weak_and_listed_if_none_match_values_match(self):
+        etag = self.app.get("/").headers["ETag"]
+
+        self.app.get("/", headers={"If-None-Match": '"other", W/{}'.format(etag)}, status=304)
+
+    def test_wildcard_if_none_match_matches(self):
+        self.app.get("/")
+
+        self.app.get("/", headers={"If-None-Match": "*"}, status=304)
+
+    def test_non_matching_if_none_match_returns_page(self):
+        self.app.get("/")
+
+        self.app.get("/", headers={"If-None-Match": '"other"'}, status=200)
+
+    def test_changed_content_returns_new_page_for_old_etag(self):
+        etag = self.app.get("/").headers["ETag"]
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Changed Title", "body": "Changed text"}'
+
+        response = self.app.get("/", headers={"If-None-Match": etag}, status=200)
+
+        self.assertNotEqual(etag, response.headers["ETag"])
+        self.assertEqual("Changed Title", response.html.body.h2.text)
+
+    def test_json_and_html_representations_have_different_etags(self):
+        html_etag = self.app.get("/").headers["ETag"]
+
+        response = self.app.get("/", headers={"Accept": "application/json", "If-None-Match": html_etag}, status=200)
+
+        self.assertNotEqual(html_etag, response.headers["ETag"])
+
+    def test_application_without_validator_cache_still_answers_matching_conditional_request(self):
+        web_application = self.app.app
+        application_without_validator_cache = BrochureWSGIApplication(
+            domain_application=web_application._domain_application,
+            user_interface_provider=web_application._user_interface_provider,
+            get_path_command_provider=web_application._get_path_command_provider)
+        app = TestApp(application_without_validator_cache)
+        etag = app.get("/").headers["ETag"]
+
+        app.get("/", headers={"If-None-Match": etag}, status=304)
+
+    def test_not_found_page_has_no_validators(self):
+        response = self.app.get("/asdf", status=404)
+
+        self.assertNotIn("ETag", response.headers)
+        self.assertNotIn("Last-Modified", response.headers)
+
+    def test_post_with_matching_if_none_match_is_not_answered_with_not_modified(self):
+        etag = self.app.get("/").headers["ETag"]
+
+        self.app.post("/", headers={"If-None-Match": etag}, status=200)
+
+    def test_cached_response_without_validators_ignores_conditional_headers(self):
+        response = CachedResponse(status="200 OK", headers=(), body=b"")
+
+        self.assertFalse(response.is_not_modified({"REQUEST_METHOD": "GET", "HTTP_IF_NONE_MATCH": "*"}))
+        self.assertFalse(response.is_not_modified({"REQUEST_METHOD": "GET", "HTTP_IF_MODIFIED_SINCE": formatdate(0)}))
+
+    def test_validator_cache_ignores_failing_content_version_provider(self):
+        def failing_content_version_provider():
+            raise ValueError("Malformed content")
+
+        validator_cache = ValidatorCache(content_version_provider=failing_content_version_provider)
+        response = CachedResponse(status="200 OK", headers=(), body=b"", etag='"etag"')
+        validator_cache.remember(environ={}, content_version=validator_cache.get_content_version(), response=response)
+
+        self.assertIsNone(validator_cache.get_response({}))
+
+    def test_validator_cache_is_bounded_and_clearable(self):
+        validator_cache = ValidatorCache(content_version_provider=lambda: "version", maximum_size=1)
+        response = CachedResponse(status="200 OK", headers=(), body=b"", etag='"etag"')
+        validator_cache.remember(environ={"PATH_INFO": "/a"}, content_version="version", response=response)
+        validator_cache.remember(environ={"PATH_INFO": "/b"}, content_version="version", response=response)
+
+        self.assertIsNone(validator_cache.get_response({"PATH_INFO": "/a"}))
+        self.assertIs(response, validator_cache.get_response({"PATH_INFO": "/b"}))
+
+        validator_cache.clear()
+
+        self.assertIsNone(validator_cache.get_response({"PATH_INFO": "/b"}))
+
+
+class TestContentFileConditionalRequests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.file_path = os.path.join(directory, "content.json")
+        self.write_content(title="Cover Title", modified_at=1500000000)
+        for name, value in (("BROCHURE_CONTENT_FILE", self.file_path), ("BROCHURE_CONTENT_CHECK_INTERVAL", "0")):
+            os.environ[name] = value
+            self.addCleanup(os.environ.pop, name)
+        self.app = TestApp(get_brochure_wsgi_application())
+
+    def write_content(self, title, modified_at):
+        with open(self.file_path, "w") as content_file:
+            json.dump({"cover_section": {"title": title, "body": "Body text"},
+                       "enterprise": {"name": "Example Enterprise"},
+                       "contact_method": {"contact_method_type": "email", "value": "ejemplo@example.com"}}, content_file)
+        os.utime(self.file_path, (modified_at, modified_at))
+
+    def test_last_modified_is_the_content_file_modification_time(self):
+        response = self.app.get("/")
+
+        self.assertEqual(formatdate(1500000000, usegmt=True), response.headers["Last-Modified"])
+
+    def test_last_modified_is_the_same_for_every_application(self):
+        last_modified = self.app.get("/").headers["Last-Modified"]
+
+        self.assertEqual(last_modified, TestApp(get_brochure_wsgi_application()).get("/").headers["Last-Modified"])
+
+    def test_changed_content_file_gets_new_last_modified(self):
+        self.app.get("/")
+        self.write_content(title="Changed Title", modified_at=1600000000)
+
+        response = self.app.get("/", headers={"If-Modified-Since": formatdate(1500000000, usegmt=True)}, status=200)
+
+        self.assertEqual(formatdate(1600000000, usegmt=True), response.headers["Last-Modified"])
+
+    def test_if_modified_since_last_modified_returns_not_modified(self):
+        last_modified = self.app.get("/").headers["Last-Modified"]
+
+        self.app.get("/", headers={"If-Modified-Since": last_modified}, status=304)
+
+    def test_if_modified_since_before_last_modified_returns_page(self):
+        self.app.get("/")
+
+        self.app.get("/", headers={"If-Modified-Since": formatdate(0, usegmt=True)}, status=200)
+
+    def test_invalid_if_modified_since_returns_page(self):
+        self.app.get("/")
+
+        self.app.get("/", headers={"If-Modified-Since": "yesterday"}, status=200)
@@ -44,15 +44,17 @@ class TestDomainRedirectPreprocessor(TestCase):
 
         self.assertEqual("301 Moved Permanently", self._response_body)
 
-    def test_preprocess_when_matching_source_url_is_present_sets_correct_number_of_response_headers(self):
+    def test_preprocess_when_matching_source_url_is_present_returns_an_empty_body_with_its_content_length(self):
         preprocessor = DomainRedirectPreprocessor(url_from_environment=lambda e: "http://www.example.com",
                                                   source_domain_provider=lambda: ("www.example.com",),
                                                   target_domain_provider=lambda: "www.destination.com")
 
         response_handler = preprocessor.preprocess(environ={}, start_response=self._fake_start_response)
-        response_handler({}, self._fake_start_response)
+        body = response_handler({}, self._fake_start_response)
 
-        self.assertEqual(1, len(self._response_headers))
+        self.assertEqual([b""], body)
+        self.assertEqual(2, len(self._response_headers))
+        self.assertEqual(("Content-Length", "0"), self._response_headers[1])
 
     def test_preprocess_when_matching_source_url_is_present_sets_correct_location_response_header(self):
         preprocessor = DomainRedirectPreprocessor(url_from_environment=lambda e: "http://example.com/asdf?q",
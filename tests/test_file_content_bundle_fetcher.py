@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from brochure.values.contact_method import ContactMethod, ContactMethodType
+from brochure.values.enterprise import Enterprise
+from brochure.values.section import Section
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.value_fetchers.content_fetchers import get_content_fetchers
+from brochure_wsgi.value_fetchers.file_content_bundle_fetcher import FileContentBundleFetcher, ContentBundleFieldFetcher, \
+    read_text_file
+
+
+def content_bundle(title="Cover Title", name="Example Enterprise"):
+    return {"cover_section": {"title": title, "body": "Body text"},
+            "enterprise": {"name": name},
+            "contact_method": {"contact_method_type": "email", "value": "ejemplo@example.com"}}
+
+
+class TestFileContentBundleFetcher(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "content.json")
+        self.now = 100.0
+
+    def write_content(self, content):
+        temporary_file_path = "{}.tmp".format(self.file_path)
+        with open(temporary_file_path, "w") as content_file:
+            json.dump(content, content_file)
+        os.replace(temporary_file_path, self.file_path)
+
+    def get_fetcher(self, **kwargs):
+        return FileContentBundleFetcher(file_path=self.file_path, clock=lambda: self.now, **kwargs)
+
+    def test_content_bundle_is_parsed(self):
+        self.write_content(content_bundle())
+
+        content = self.get_fetcher()()
+
+        self.assertEqual(Section(title="Cover Title", body="Body text"), content.cover_section)
+        self.assertEqual(Enterprise(name="Example Enterprise"), content.enterprise)
+        self.assertEqual(ContactMethod(contact_method_type=ContactMethodType.EMAIL, value="ejemplo@example.com"),
+                         content.contact_method)
+
+    def test_large_files_are_memory_mapped(self):
+        with open(self.file_path, "wb") as text_file:
+            text_file.write('{"title": "Café"}'.encode("utf-8"))
+
+        self.assertEqual(read_text_file(self.file_path), read_text_file(self.file_path, mmap_minimum_size=1))
+        self.assertEqual('{"title": "Café"}', read_text_file(self.file_path, mmap_minimum_size=1))
+
+    def test_file_is_not_checked_again_within_the_check_interval(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher(check_interval=5.0)
+        first_content = fetcher()
+        os.remove(self.file_path)
+
+        self.now += 4.9
+
+        self.assertIs(first_content, fetcher())
+
+    def test_changed_file_is_swapped_in_after_the_check_interval(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher(check_interval=5.0)
+        first_content = fetcher()
+        self.write_content(content_bundle(title="New Title"))
+
+        unchanged_content = fetcher()
+        self.now += 5.0
+        changed_content = fetcher()
+
+        self.assertIs(first_content, unchanged_content)
+        self.assertEqual("New Title", changed_content.cover_section.title)
+
+    def test_malformed_file_keeps_last_content_and_is_checked_once_per_interval(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher(check_interval=5.0)
+        first_content = fetcher()
+        with open(self.file_path, "w") as content_file:
+            content_file.write("{")
+
+        self.now += 5.0
+        contents = [fetcher() for _ in range(3)]
+        self.now += 4.9
+        contents.append(fetcher())
+
+        self.assertEqual([first_content] * 4, contents)
+        self.assertEqual(1, fetcher.load_failures)
+        self.now += 0.1
+        self.assertIs(first_content, fetcher())
+        self.assertEqual(2, fetcher.load_failures)
+        self.write_content(content_bundle(title="New Title"))
+        self.now += 5.0
+        self.assertEqual("New Title", fetcher().cover_section.title)
+
+    def test_deleted_file_keeps_last_content(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher(check_interval=5.0)
+        first_content = fetcher()
+        os.remove(self.file_path)
+
+        self.now += 5.0
+
+        self.assertIs(first_content, fetcher())
+        self.assertIs(first_content, fetcher())
+        self.assertEqual(1, fetcher.load_failures)
+
+    def test_malformed_file_is_raised_without_earlier_content(self):
+        with open(self.file_path, "w") as content_file:
+            content_file.write("{")
+
+        with self.assertRaises(ValueError):
+            self.get_fetcher()()
+
+    def test_unchanged_file_is_not_parsed_again(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher(check_interval=5.0)
+        first_snapshot = fetcher.get_snapshot()
+
+        self.now += 10.0
+
+        self.assertIs(first_snapshot, fetcher.get_snapshot())
+
+    def test_field_fetchers_share_the_bundle_snapshot(self):
+        self.write_content(content_bundle())
+        fetcher = self.get_fetcher()
+        cover_section_fetcher = ContentBundleFieldFetcher(fetcher, "cover_section")
+        enterprise_fetcher = ContentBundleFieldFetcher(fetcher, "enterprise")
+
+        self.assertFalse(cover_section_fetcher.has_snapshot())
+        self.assertEqual("Cover Title", cover_section_fetcher().title)
+        self.assertTrue(enterprise_fetcher.has_snapshot())
+        self.assertTrue(enterprise_fetcher.has_current_snapshot())
+        self.assertIs(cover_section_fetcher.get_snapshot(), enterprise_fetcher.get_snapshot())
+
+
+class TestContentFileApplication(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "content.json")
+        with open(self.file_path, "w") as content_file:
+            json.dump(content_bundle(title="File Title", name="File Enterprise"), content_file)
+        os.environ["BROCHURE_CONTENT_FILE"] = self.file_path
+        os.environ["BROCHURE_CONTENT_CHECK_INTERVAL"] = "0"
+        self.addCleanup(os.environ.pop, "BROCHURE_CONTENT_FILE")
+        self.addCleanup(os.environ.pop, "BROCHURE_CONTENT_CHECK_INTERVAL")
+
+    def test_content_is_served_from_the_file(self):
+        html = TestApp(get_brochure_wsgi_application()).get("/").html
+
+        self.assertEqual("File Enterprise", html.title.text)
+        self.assertIn("File Title", html.body.text)
+
+    def test_content_changes_without_a_restart(self):
+        app = TestApp(get_brochure_wsgi_application())
+        etag = app.get("/").headers["ETag"]
+        with open(self.file_path + ".tmp", "w") as content_file:
+            json.dump(content_bundle(title="Updated Title", name="File Enterprise"), content_file)
+        os.replace(self.file_path + ".tmp", self.file_path)
+
+        response = app.get("/", headers={"If-None-Match": etag})
+
+        self.assertEqual(200, response.status_int)
+        self.assertIn("Updated Title", response.html.body.text)
+
+    def test_applications_share_the_content_fetchers(self):
+        self.assertIs(get_content_fetchers(), get_content_fetchers())
@@ -0,0 +1,133 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.command_preprocessors.host_redirect_preprocessor import HostRedirectPreprocessor
+from brochure_wsgi.host_redirect_table import HostRedirectTable, HostRedirect, normalize_host
+
+
+class TestHostRedirectTable(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.table = HostRedirectTable(redirects=(HostRedirect(source="old.example.com", target_host="new.example.com"),
+                                                  HostRedirect(source="*.example.com", target_host="www.example.com", status=302),
+                                                  HostRedirect(source="*.shop.example.com", target_host="shop.example.net", status=308),
+                                                  HostRedirect(source="Parked.Example.ORG.", target_host="example.org")))
+
+    def test_exact_host_wins_over_wildcard(self):
+        self.assertEqual("new.example.com", self.table.get_response("old.example.com").redirect.target_host)
+
+    def test_wildcard_matches_subdomains_at_any_depth(self):
+        self.assertEqual("www.example.com", self.table.get_response("a.example.com").redirect.target_host)
+        self.assertEqual("www.example.com", self.table.get_response("a.b.example.com").redirect.target_host)
+
+    def test_wildcard_does_not_match_its_own_domain(self):
+        self.assertIsNone(self.table.get_response("example.com"))
+
+    def test_longest_wildcard_suffix_wins(self):
+        self.assertEqual(308, self.table.get_response("a.shop.example.com").redirect.status)
+        self.assertEqual(302, self.table.get_response("shop.example.com").redirect.status)
+
+    def test_sources_are_normalized(self):
+        self.assertEqual("example.org", self.table.get_response("parked.example.org").redirect.target_host)
+
+    def test_ports_are_ignored(self):
+        self.assertEqual("new.example.com", self.table.get_response(normalize_host("old.example.com:8080")).redirect.target_host)
+        self.assertEqual("[::1]", normalize_host("[::1]:8080"))
+
+    def test_unknown_hosts_are_not_redirected(self):
+        self.assertIsNone(self.table.get_response("example.net"))
+        self.assertIsNone(self.table.get_response("a.example.net"))
+
+    def test_table_without_wildcards_only_checks_exact_hosts(self):
+        table = HostRedirectTable(redirects=(HostRedirect(source="old.example.com", target_host="new.example.com"),))
+
+        self.assertIsNone(table.get_response("a.old.example.com"))
+        self.assertEqual(1, len(table))
+
+    def test_length_counts_exact_and_wildcard_sources(self):
+        self.assertEqual(4, len(self.table))
+
+    def test_unsupported_status_is_rejected(self):
+        with self.assertRaises(ValueError):
+            HostRedirectTable(redirects=(HostRedirect(source="old.example.com", target_host="new.example.com", status=200),))
+
+    def test_from_file_reads_entries_and_skips_comments(self):
+        table = HostRedirectTable.from_file(file_path=self._write_file("# Parked domains\n"
+                                                                        "\n"
+                                                                        "old.example.com new.example.com\n"
+                                                                        "*.example.net www.example.com 302  # campaign\n"))
+
+        self.assertEqual((301, 302), (table.get_response("old.example.com").redirect.status,
+                                      table.get_response("a.example.net").redirect.status))
+
+    def test_from_file_rejects_malformed_lines(self):
+        for line in ("old.example.com\n", "old.example.com new.example.com permanent\n", "a b 301 extra\n"):
+            with self.subTest(line=line), self.assertRaises(ValueError):
+                HostRedirectTable.from_file(file_path=self._write_file(line))
+
+    def _write_file(self, contents: str) -> str:
+        file_descriptor, file_path = tempfile.mkstemp()
+        with os.fdopen(file_descriptor, "w") as redirect_file:
+            redirect_file.write(contents)
+        self.addCleanup(os.remove, file_path)
+
+        return file_path
+
+
+class TestHostRedirectPreprocessor(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        table = HostRedirectTable(redirects=(HostRedirect(source="old.example.com", target_host="new.example.com"),
+                                             HostRedirect(source="*.example.net", target_host="www.example.com", status=307)))
+        self.preprocessor = HostRedirectPreprocessor(host_redirect_table=table)
+
+    def _preprocess(self, environ):
+        start_response_calls = []
+        response_provider = self.preprocessor.preprocess(environ=environ, start_response=None)
+        if response_provider is None:
+            return None
+
+        body = response_provider(environ, lambda status, headers: start_response_calls.append((status, dict(headers))))
+
+        return start_response_calls[0] + (body,)
+
+    def test_exact_host_redirects_to_https_target_with_path_and_query(self):
+        status, headers, body = self._preprocess({"HTTP_HOST": "Old.Example.com:8080",
+                                                  "PATH_INFO": "/a b",
+                                                  "QUERY_STRING": "q=1"})
+
+        self.assertEqual(("301 Moved Permanently", "https://new.example.com/a%20b?q=1", [b""]),
+                         (status, headers["Location"], body))
+
+    def test_wildcard_host_uses_its_status(self):
+        status, headers, body = self._preprocess({"HTTP_HOST": "shop.example.net", "PATH_INFO": "/"})
+
+        self.assertEqual(("307 Temporary Redirect", "https://www.example.com/"), (status, headers["Location"]))
+
+    def test_unknown_host_is_not_redirected(self):
+        self.assertIsNone(self._preprocess({"HTTP_HOST": "www.example.com", "PATH_INFO": "/"}))
+
+    def test_response_is_prebuilt_per_entry(self):
+        first = self.preprocessor.preprocess(environ={"HTTP_HOST": "a.example.net"}, start_response=None)
+        second = self.preprocessor.preprocess(environ={"HTTP_HOST": "b.example.net"}, start_response=None)
+
+        self.assertIs(first, second)
+
+    def test_application_loads_redirects_from_environment(self):
+        file_descriptor, file_path = tempfile.mkstemp()
+        with os.fdopen(file_descriptor, "w") as redirect_file:
+            redirect_file.write("old.example.com www.example.com\n")
+        self.addCleanup(os.remove, file_path)
+        os.environ["BROCHURE_HOST_REDIRECT_FILE"] = file_path
+        self.addCleanup(os.environ.pop, "BROCHURE_HOST_REDIRECT_FILE")
+        app = TestApp(get_brochure_wsgi_application())
+
+        response = app.get("/favicon.ico", extra_environ={"HTTP_HOST": "old.example.com"}, status=301)
+
+        self.assertEqual("https://www.example.com/favicon.ico", response.headers["Location"])
@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.command_preprocessors.metrics_preprocessor import MetricsPreprocessor
+from brochure_wsgi.metrics.metrics_registry import MetricsRegistry
+from brochure_wsgi.metrics.request_metrics import RequestMetrics
+
+
+class TestMetricsEndpoint(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        os.environ["BROCHURE_METRICS_PATH"] = "/metrics"
+        self.addCleanup(os.environ.pop, "BROCHURE_METRICS_PATH")
+        self.app = TestApp(get_brochure_wsgi_application())
+
+    def test_metrics_are_served_as_prometheus_text(self):
+        response = self.app.get("/metrics")
+
+        self.assertEqual("text/plain; version=0.0.4; charset=utf-8", response.headers["Content-Type"])
+        self.assertIn("# TYPE brochure_requests_total counter", response.text)
+
+    def test_requests_are_counted_by_command_representation_and_status(self):
+        self.app.get("/")
+        self.app.get("/", headers={"Accept": "application/json"})
+        self.app.get("/asdf", status=404)
+        self.app.get("/favicon.ico")
+
+        text = self.app.get("/metrics").text
+
+        self.assertIn('brochure_requests_total{command_type="show_cover",representation="text/html",status="200"} 1', text)
+        self.assertIn('brochure_requests_total{command_type="show_cover",representation="application/json",status="200"} 1', text)
+        self.assertIn('brochure_requests_total{command_type="unknown",representation="text/html",status="404"} 1', text)
+        self.assertIn('brochure_requests_total{command_type="none",representation="image/vnd.microsoft.icon",status="200"} 1', text)
+        self.assertIn('brochure_request_duration_seconds_count{command_type="unknown",representation="text/html",status="404"} 1', text)
+
+    def test_in_flight_requests_include_the_scrape(self):
+        self.assertIn("brochure_requests_in_flight 1", self.app.get("/metrics").text)
+
+    def test_response_cache_hit_ratio(self):
+        self.app.get("/")
+        self.app.get("/")
+
+        self.assertIn('brochure_response_cache_hit_ratio{cache="page"} 0.5', self.app.get("/metrics").text)
+        self.assertIn('brochure_response_cache_hit_ratio{cache="not_found"} 0.0', self.app.get("/metrics").text)
+
+    def test_metrics_directory_merges_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.environ["BROCHURE_METRICS_DIRECTORY"] = directory
+        self.addCleanup(os.environ.pop, "BROCHURE_METRICS_DIRECTORY")
+        app = TestApp(get_brochure_wsgi_application())
+        app.get("/")
+
+        text = app.get("/metrics").text
+
+        self.assertIn('brochure_requests_total{command_type="show_cover",representation="text/html",status="200"} 1', text)
+        self.assertTrue(any(name.startswith("metrics-") for name in os.listdir(directory)))
+
+    def test_closing_application_writes_out_its_metrics(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.environ["BROCHURE_METRICS_DIRECTORY"] = directory
+        self.addCleanup(os.environ.pop, "BROCHURE_METRICS_DIRECTORY")
+        web_application = get_brochure_wsgi_application()
+        app = TestApp(web_application)
+        app.get("/")
+        app.get("/asdf", status=404)
+
+        web_application.close()
+
+        with open(os.path.join(directory, "metrics-{}.json".format(os.getpid()))) as metrics_file:
+            metric_families = json.load(metrics_file)["metric_families"]
+        requests_total, = [metric_family for metric_family in metric_families if metric_family["name"] == "brochure_requests_total"]
+        self.assertEqual(2, sum(value for _, _, value in requests_total["samples"]))
+
+    def test_closing_application_without_metrics_directory_writes_nothing(self):
+        web_application = get_brochure_wsgi_application()
+        TestApp(web_application).get("/")
+
+        web_application.close()
+
+        self.assertIsNone(web_application._request_metrics._on_close)
+
+    def test_warm_up_requests_are_not_counted(self):
+        application = get_brochure_wsgi_application()
+        environs = [{"PATH_INFO": "/", "REQUEST_METHOD": "GET", "wsgi.url_scheme": "http", "SERVER_NAME": "localhost",
+                     "SERVER_PORT": "80", "HTTP_ACCEPT": accept} for accept in ("text/html", "application/json")]
+        application.warm_up(environs)
+        os.environ["BROCHURE_COVER_SECTION"] = json.dumps({"title": "Long", "body": "Long body. " * 32 * 1024})
+        application.warm_up(environs[:1])
+
+        text = TestApp(application).get("/metrics").text
+
+        self.assertNotIn("brochure_requests_total{", text)
+
+    def test_request_that_raises_is_counted_as_server_error(self):
+        registry = MetricsRegistry()
+        request_metrics = RequestMetrics(registry=registry)
+
+        def application(environ, start_response):
+            raise ValueError("Broken")
+
+        with self.assertRaises(ValueError):
+            request_metrics.observe_request(environ={}, start_response=None, application=application)
+
+        samples = {(sample.name, sample.labels): sample.value for family in registry.collect() for sample in family.samples}
+        self.assertEqual(1, samples[("brochure_requests_total", (("command_type", "none"), ("representation", "none"), ("status", "500")))])
+        self.assertEqual(0, samples[("brochure_requests_in_flight", ())])
+
+    def test_streamed_request_is_in_flight_until_its_body_is_closed(self):
+        registry = MetricsRegistry()
+        request_metrics = RequestMetrics(registry=registry)
+
+        def application(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+
+            return iter([b"Streamed"])
+
+        def collect_samples():
+            return {(sample.name, sample.labels): sample.value for family in registry.collect() for sample in family.samples}
+
+        body = request_metrics.observe_request(environ={}, start_response=lambda status, headers: None,
+                                               application=application)
+        self.assertEqual([b"Streamed"], list(body))
+
+        self.assertEqual(1, collect_samples()[("brochure_requests_in_flight", ())])
+        body.close()
+        samples = collect_samples()
+        self.assertEqual(0, samples[("brochure_requests_in_flight", ())])
+        self.assertEqual(1, samples[("brochure_requests_total", (("command_type", "none"), ("representation", "text/plain"), ("status", "200")))])
+
+    def test_preprocessor_ignores_other_paths(self):
+        preprocessor = MetricsPreprocessor(metrics_path="/metrics", metrics_collector=list)
+
+        self.assertIsNone(preprocessor.preprocess(environ={"PATH_INFO": "/metrics/other"}, start_response=None))
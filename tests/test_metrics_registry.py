@@ -0,0 +1,240 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from brochure_wsgi.metrics.metrics_directory import MetricsDirectory, is_process_alive
+from brochure_wsgi.metrics.metrics_registry import MetricsRegistry
+from brochure_wsgi.metrics.prometheus_text import render_prometheus_text
+
+
+def samples_of(metric_families):
+    return {(sample.name, sample.labels): sample.value for family in metric_families for sample in family.samples}
+
+
+class TestMetricsRegistry(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = MetricsRegistry()
+
+    def test_counter_sums_increments_by_label_values(self):
+        counter = self.registry.counter("requests_total", "Requests.", label_names=("status",))
+        counter.inc(("200",))
+        counter.inc(("200",), amount=2)
+        counter.inc(("404",))
+
+        self.assertEqual({("requests_total", (("status", "200"),)): 3, ("requests_total", (("status", "404"),)): 1},
+                         samples_of(self.registry.collect()))
+
+    def test_counter_increments_from_many_threads_are_not_lost(self):
+        counter = self.registry.counter("requests_total", "Requests.")
+
+        def increment():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc()
+
+        self.assertEqual({("requests_total", ()): 80001}, samples_of(self.registry.collect()))
+        self.assertEqual({("requests_total", ()): 80001}, samples_of(self.registry.collect()))
+
+    def test_gauge_goes_up_and_down_and_reads_functions(self):
+        gauge = self.registry.gauge("in_flight", "In flight.")
+        ratio = self.registry.gauge("hit_ratio", "Ratio.", label_names=("cache",))
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        ratio.set_function(lambda: 0.5, label_values=("page",))
+
+        self.assertEqual({("in_flight", ()): 1, ("hit_ratio", (("cache", "page"),)): 0.5}, samples_of(self.registry.collect()))
+
+    def test_histogram_counts_cumulative_buckets(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual({("latency_seconds_bucket", (("le", "0.1"),)): 2,
+                          ("latency_seconds_bucket", (("le", "1.0"),)): 3,
+                          ("latency_seconds_bucket", (("le", "+Inf"),)): 4,
+                          ("latency_seconds_sum", ()): 2.65,
+                          ("latency_seconds_count", ()): 4},
+                         samples_of(self.registry.collect()))
+
+    def test_histogram_observations_from_many_threads_are_merged(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency.", buckets=(1.0,))
+        threads = [threading.Thread(target=histogram.observe, args=(0.5,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+        self.assertEqual({("latency_seconds_bucket", (("le", "1.0"),)): 2,
+                          ("latency_seconds_bucket", (("le", "+Inf"),)): 2,
+                          ("latency_seconds_sum", ()): 1.0,
+                          ("latency_seconds_count", ()): 2},
+                         samples_of(self.registry.collect()))
+
+    def test_duplicate_names_are_rejected(self):
+        self.registry.counter("requests_total", "Requests.")
+
+        with self.assertRaises(ValueError):
+            self.registry.gauge("requests_total", "Requests.")
+
+    def test_prometheus_text_format(self):
+        counter = self.registry.counter("requests_total", "Requests\nhandled.", label_names=("path",))
+        counter.inc(('/"a"\\',))
+        self.registry.gauge("in_flight", "In flight.").inc(amount=0.5)
+
+        self.assertEqual('# HELP requests_total Requests\\nhandled.\n'
+                         '# TYPE requests_total counter\n'
+                         'requests_total{path="/\\"a\\"\\\\"} 1\n'
+                         '# HELP in_flight In flight.\n'
+                         '# TYPE in_flight gauge\n'
+                         'in_flight 0.5\n',
+                         render_prometheus_text(self.registry.collect()))
+
+
+class TestMetricsDirectory(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.live_pids = {1, 2}
+
+    def _worker(self, pid):
+        registry = MetricsRegistry()
+        metrics_directory = MetricsDirectory(directory=self.directory,
+                                             registry=registry,
+                                             pid_provider=lambda: pid,
+                                             process_is_alive=lambda process_id: process_id in self.live_pids)
+        counter = registry.counter("requests_total", "Requests.")
+        in_flight = registry.gauge("in_flight", "In flight.")
+        ratio = registry.gauge("hit_ratio", "Ratio.", aggregation="per_process")
+        ratio.set_function(lambda: pid / 10)
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(1.0,))
+
+        return metrics_directory, counter, in_flight, histogram
+
+    def test_collect_merges_every_process(self):
+        first_directory, first_counter, first_in_flight, first_histogram = self._worker(1)
+        second_directory, second_counter, second_in_flight, second_histogram = self._worker(2)
+        first_counter.inc(amount=2)
+        first_in_flight.inc()
+        first_histogram.observe(0.5)
+        second_counter.inc()
+        second_in_flight.inc()
+        second_histogram.observe(2.0)
+        second_directory.flush()
+
+        samples = samples_of(first_directory.collect())
+
+        self.assertEqual(3, samples[("requests_total", ())])
+        self.assertEqual(2, samples[("in_flight", ())])
+        self.assertEqual((0.1, 0.2), (samples[("hit_ratio", (("pid", "1"),))], samples[("hit_ratio", (("pid", "2"),))]))
+        self.assertEqual((1, 2), (samples[("latency_seconds_bucket", (("le", "1.0"),))],
+                                  samples[("latency_seconds_bucket", (("le", "+Inf"),))]))
+
+    def test_exited_processes_keep_counters_but_not_gauges(self):
+        first_directory, _, _, _ = self._worker(1)
+        second_directory, second_counter, second_in_flight, _ = self._worker(2)
+        second_counter.inc()
+        second_in_flight.inc()
+        second_directory.flush()
+        self.live_pids.discard(2)
+
+        samples = samples_of(first_directory.collect())
+
+        self.assertEqual(1, samples[("requests_total", ())])
+        self.assertNotIn(("in_flight", ()), samples)
+        self.assertNotIn(("hit_ratio", (("pid", "2"),)), samples)
+
+    def test_exited_processes_are_folded_into_one_file(self):
+        first_directory, _, _, _ = self._worker(1)
+        second_directory, second_counter, _, second_histogram = self._worker(2)
+        second_counter.inc()
+        second_histogram.observe(0.5)
+        second_directory.flush()
+        self.live_pids.discard(2)
+
+        first_samples = samples_of(first_directory.collect())
+        second_samples = samples_of(first_directory.collect())
+
+        self.assertEqual(first_samples, second_samples)
+        self.assertEqual((1, 1), (second_samples[("requests_total", ())], second_samples[("latency_seconds_count", ())]))
+        self.assertEqual(["metrics-1.json", "metrics-exited.json"],
+                         sorted(name for name in os.listdir(self.directory) if name.endswith(".json")))
+
+    def test_file_left_by_exited_process_with_same_pid_is_folded_in(self):
+        exited_registry = MetricsRegistry()
+        exited_registry.counter("requests_total", "Requests.").inc(amount=5)
+        with open(os.path.join(self.directory, "metrics-2.json"), "w") as metrics_file:
+            json.dump({"process": "exited process",
+                       "metric_families": [metric_family._asdict() for metric_family in exited_registry.collect()]},
+                      metrics_file)
+        first_directory, _, _, _ = self._worker(1)
+        second_directory, second_counter, _, _ = self._worker(2)
+
+        second_counter.inc()
+        second_directory.flush()
+        second_directory.flush()
+
+        self.assertEqual(6, samples_of(first_directory.collect())[("requests_total", ())])
+
+    def test_close_writes_out_requests_since_last_flush(self):
+        first_directory, _, _, _ = self._worker(1)
+        second_directory, second_counter, _, _ = self._worker(2)
+        second_directory.flush()
+        second_counter.inc()
+
+        second_directory.close()
+        self.live_pids.discard(2)
+
+        self.assertEqual(1, samples_of(first_directory.collect())[("requests_total", ())])
+
+    def test_maybe_flush_waits_for_flush_interval(self):
+        now = [100.0]
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.")
+        metrics_directory = MetricsDirectory(directory=self.directory, registry=registry, flush_interval=5.0,
+                                             clock=lambda: now[0], pid_provider=lambda: 1)
+        reader = MetricsDirectory(directory=self.directory, registry=MetricsRegistry(), pid_provider=lambda: 3)
+
+        counter.inc()
+        metrics_directory.maybe_flush()
+        counter.inc()
+        metrics_directory.maybe_flush()
+        first_samples = samples_of(reader.collect())
+        now[0] = 105.0
+        metrics_directory.maybe_flush()
+
+        self.assertEqual(1, first_samples[("requests_total", ())])
+        self.assertEqual(2, samples_of(reader.collect())[("requests_total", ())])
+
+    def test_flush_is_skipped_while_another_thread_flushes(self):
+        metrics_directory = MetricsDirectory(directory=self.directory, registry=MetricsRegistry(), pid_provider=lambda: 1)
+        metrics_directory._flush_lock.acquire()
+        self.addCleanup(metrics_directory._flush_lock.release)
+
+        metrics_directory.maybe_flush()
+
+        self.assertEqual([], [name for name in os.listdir(self.directory) if name.endswith(".json")])
+
+    def test_unrelated_files_are_ignored(self):
+        for file_name in ("notes.txt", "metrics-abc.json"):
+            with open("{}/{}".format(self.directory, file_name), "w") as unrelated_file:
+                unrelated_file.write("not metrics")
+        metrics_directory = MetricsDirectory(directory=self.directory, registry=MetricsRegistry(), pid_provider=lambda: 1)
+
+        self.assertEqual([], metrics_directory.collect())
+
+    def test_is_process_alive(self):
+        self.assertTrue(is_process_alive(os.getpid()))
+        self.assertFalse(is_process_alive(2 ** 22 + 1))
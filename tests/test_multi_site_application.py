@@ -0,0 +1,300 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.command_preprocessors.admission_control_preprocessor import AdmissionControlPreprocessor
+from brochure_wsgi.http_user_interface import get_html_template_provider
+from brochure_wsgi.multi_site_application import MultiSiteApplication, Site, SiteDirectoryLoader, \
+    get_multi_site_application, get_site_host
+from brochure_wsgi.prefork_server import get_prefork_server
+from tests.test_file_content_bundle_fetcher import content_bundle
+from tests.test_prefork_server import get
+from tests.test_single_flight import CONCURRENT_CALLS, call_concurrently
+
+
+class ClosingBody(list):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSiteLoader(object):
+
+    def __init__(self, memory_sizes):
+        self.memory_sizes = memory_sizes
+        self.loaded_hosts = []
+        self.looked_up_hosts = []
+        self.on_call = {}
+        self.bodies = []
+
+    def __call__(self, host):
+        self.looked_up_hosts.append(host)
+        if host not in self.memory_sizes:
+            return None
+        self.loaded_hosts.append(host)
+
+        def application(environ, start_response):
+            if host in self.on_call:
+                self.on_call.pop(host)()
+            start_response("200 OK", [("Content-Type", "text/plain")])
+
+            body = ClosingBody([host.encode("utf-8")])
+            self.bodies.append(body)
+
+            return body
+
+        return Site(application=application, memory_size=lambda: self.memory_sizes[host])
+
+
+class TestMultiSiteApplication(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+
+    def get_application(self, memory_sizes, maximum_memory_size=100, **kwargs):
+        site_loader = FakeSiteLoader(memory_sizes=memory_sizes)
+
+        return site_loader, MultiSiteApplication(site_loader=site_loader, maximum_memory_size=maximum_memory_size,
+                                                 clock=lambda: self.now, **kwargs)
+
+    @staticmethod
+    def get(application, host):
+        return TestApp(application).get("/", extra_environ={"HTTP_HOST": host}, expect_errors=True)
+
+    def test_host_is_normalized(self):
+        self.assertEqual("www.example.com", get_site_host({"HTTP_HOST": "WWW.Example.com.:8080"}))
+        self.assertEqual("localhost", get_site_host({"SERVER_NAME": "localhost", "SERVER_PORT": "8000"}))
+
+    def test_hosts_that_are_not_dns_names_have_no_site(self):
+        for host in ("..", "../etc/passwd", "example..com", "-example.com", "[::1]", "a" * 254, ""):
+            self.assertIsNone(get_site_host({"HTTP_HOST": host}), host)
+
+    def test_sites_are_chosen_by_host_and_loaded_once(self):
+        site_loader, application = self.get_application(memory_sizes={"a.example.com": 10, "b.example.com": 10})
+
+        bodies = [self.get(application, host).body for host in ("a.example.com", "b.example.com", "A.example.com:80")]
+
+        self.assertEqual([b"a.example.com", b"b.example.com", b"a.example.com"], bodies)
+        self.assertEqual(["a.example.com", "b.example.com"], site_loader.loaded_hosts)
+        self.assertEqual(2, application.loads)
+
+    def test_unknown_hosts_are_not_found(self):
+        site_loader, application = self.get_application(memory_sizes={})
+
+        responses = [self.get(application, host) for host in ("unknown.example.com", "../secrets")]
+
+        self.assertEqual([404, 404], [response.status_int for response in responses])
+        self.assertEqual(b"Unknown site.\n", responses[0].body)
+        self.assertEqual([], application.hosts)
+
+    def test_least_recently_used_sites_are_evicted_over_the_memory_limit(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 40, "b": 40, "c": 40})
+
+        for host in ("a", "b", "a", "c"):
+            self.get(application, host)
+
+        self.assertEqual(["a", "c"], application.hosts)
+        self.assertEqual((80, 1), (application.memory_size, application.evictions))
+
+    def test_evicted_sites_are_loaded_again(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 60, "b": 60})
+
+        for host in ("a", "b", "a"):
+            self.get(application, host)
+
+        self.assertEqual(["a", "b", "a"], site_loader.loaded_hosts)
+
+    def test_a_site_over_the_memory_limit_is_still_served(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 500})
+
+        response = self.get(application, "a")
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(["a"], application.hosts)
+
+    def test_memory_size_is_measured_again_after_each_request(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 10, "b": 10})
+        self.get(application, "a")
+        self.get(application, "b")
+        site_loader.memory_sizes["b"] = 95
+
+        self.get(application, "b")
+
+        self.assertEqual(["b"], application.hosts)
+        self.assertEqual(95, application.memory_size)
+
+    def test_site_evicted_while_serving_is_not_measured(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 50, "b": 90})
+        site_loader.on_call["a"] = lambda: self.get(application, "b")
+
+        self.get(application, "a")
+
+        self.assertEqual(["b"], application.hosts)
+        self.assertEqual(90, application.memory_size)
+
+    def test_concurrent_requests_for_a_site_load_it_once(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 10})
+
+        def load_site_slowly(host):
+            time.sleep(0.1)
+
+            return site_loader(host)
+
+        application._site_loader = load_site_slowly
+        sites = call_concurrently(lambda: application._get_site("a"))
+
+        self.assertEqual([sites[0]] * CONCURRENT_CALLS, sites)
+        self.assertEqual((["a"], 10, 1), (application.hosts, application.memory_size, application.loads))
+        self.assertEqual(["a"], site_loader.loaded_hosts)
+
+    def test_site_loaded_after_it_was_looked_up_is_not_loaded_again(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 10})
+        site = application._get_site("a")
+
+        self.assertIs(site, application._load_site("a"))
+        self.assertEqual((["a"], 1), (site_loader.loaded_hosts, application.loads))
+
+    def test_hosts_without_site_are_looked_up_again_after_their_time_to_live(self):
+        site_loader, application = self.get_application(memory_sizes={}, missing_host_ttl=10.0)
+
+        for _ in range(3):
+            self.get(application, "unknown.example.com")
+        self.now = 9.9
+        self.get(application, "unknown.example.com")
+        self.now = 10.0
+        self.get(application, "unknown.example.com")
+
+        self.assertEqual(["unknown.example.com"] * 2, site_loader.looked_up_hosts)
+
+    def test_only_the_most_recent_hosts_without_site_are_remembered(self):
+        site_loader, application = self.get_application(memory_sizes={}, maximum_missing_hosts=1)
+
+        for host in ("first.example.com", "second.example.com", "first.example.com", "first.example.com"):
+            self.get(application, host)
+
+        self.assertEqual(["first.example.com", "second.example.com", "first.example.com"], site_loader.looked_up_hosts)
+
+    def test_warm_up_loads_sites_and_closes_bodies(self):
+        site_loader, application = self.get_application(memory_sizes={"a": 10})
+
+        application.warm_up([{"HTTP_HOST": "a"}, {"HTTP_HOST": "unknown"}])
+
+        self.assertEqual(["a"], application.hosts)
+        self.assertEqual(["a"], site_loader.loaded_hosts)
+        self.assertTrue(site_loader.bodies[0].closed)
+
+    def test_admitted_requests_are_released_when_their_body_is_closed_or_they_fail(self):
+        def streaming_application(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+
+            return iter([b"Streamed"])
+
+        def failing_application(environ, start_response):
+            raise RuntimeError("Broken")
+
+        sites = {"a": Site(application=streaming_application, memory_size=lambda: 10),
+                 "b": Site(application=failing_application, memory_size=lambda: 10)}
+        preprocessor = AdmissionControlPreprocessor(maximum_in_flight=1)
+        application = MultiSiteApplication(site_loader=sites.get, maximum_memory_size=100,
+                                           command_preprocessors=(preprocessor,))
+
+        body = application({"HTTP_HOST": "a"}, lambda status, headers, exc_info=None: None)
+
+        self.assertEqual(1, preprocessor.in_flight)
+        self.assertEqual([b"Streamed"], list(body))
+        body.close()
+        self.assertEqual(0, preprocessor.in_flight)
+        with self.assertRaises(RuntimeError):
+            application({"HTTP_HOST": "b"}, lambda status, headers, exc_info=None: None)
+        self.assertEqual(0, preprocessor.in_flight)
+
+
+class TestSiteDirectory(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for host, title in (("a.example.com", "Site A"), ("b.example.com", "Site B")):
+            with open(os.path.join(self.directory, "{}.json".format(host)), "w") as content_file:
+                json.dump(content_bundle(title=title), content_file)
+
+    def test_sites_share_one_template_environment(self):
+        html_template_provider = get_html_template_provider()
+        site_loader = SiteDirectoryLoader(directory=self.directory, html_template_provider=html_template_provider)
+
+        sites = [site_loader(host) for host in ("a.example.com", "b.example.com")]
+
+        for site in sites:
+            # noinspection PyProtectedMember
+            self.assertIs(html_template_provider, site.application._user_interface_provider._html_template_provider)
+
+    def test_site_memory_size_counts_content_and_cached_pages(self):
+        site_loader = SiteDirectoryLoader(directory=self.directory, html_template_provider=get_html_template_provider())
+        site = site_loader("a.example.com")
+        initial_memory_size = site.memory_size()
+
+        TestApp(site.application).get("/")
+
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, "a.example.com.json")), initial_memory_size)
+        self.assertGreater(site.memory_size(), initial_memory_size)
+
+    def test_hosts_without_content_file_have_no_site(self):
+        site_loader = SiteDirectoryLoader(directory=self.directory, html_template_provider=get_html_template_provider())
+
+        self.assertIsNone(site_loader("c.example.com"))
+
+    def test_sites_from_environment(self):
+        os.environ["BROCHURE_SITES_DIRECTORY"] = self.directory
+        self.addCleanup(os.environ.pop, "BROCHURE_SITES_DIRECTORY")
+        app = TestApp(get_multi_site_application())
+
+        site_a = app.get("/", extra_environ={"HTTP_HOST": "a.example.com"})
+        site_b = app.get("/", extra_environ={"HTTP_HOST": "b.example.com"}, headers={"Accept": "application/json"})
+        static_file = app.get("/favicon.ico", extra_environ={"HTTP_HOST": "unknown.example.com"})
+
+        self.assertIn("Site A", site_a.text)
+        self.assertEqual("Site B", site_b.json["section"]["title"])
+        self.assertEqual(200, static_file.status_int)
+        self.assertEqual(["a.example.com", "b.example.com"], app.app.hosts)
+        app.app.close()
+
+    def test_requests_for_every_site_are_logged(self):
+        os.environ["BROCHURE_SITES_DIRECTORY"] = self.directory
+        os.environ["BROCHURE_ACCESS_LOG"] = os.path.join(self.directory, "access.log")
+        self.addCleanup(os.environ.pop, "BROCHURE_SITES_DIRECTORY")
+        self.addCleanup(os.environ.pop, "BROCHURE_ACCESS_LOG")
+        application = get_multi_site_application()
+        application.warm_up([{"PATH_INFO": "/", "HTTP_HOST": "b.example.com"}])
+        app = TestApp(application)
+
+        app.get("/", extra_environ={"HTTP_HOST": "a.example.com"})
+        app.get("/", extra_environ={"HTTP_HOST": "b.example.com"})
+        application.close()
+
+        with open(os.environ["BROCHURE_ACCESS_LOG"]) as access_log_file:
+            entries = [json.loads(line) for line in access_log_file]
+        self.assertEqual([("a.example.com", "miss"), ("b.example.com", "hit")],
+                         [(entry["host"], entry["cache"]) for entry in entries])
+
+    def test_production_server_serves_sites_from_environment(self):
+        os.environ["BROCHURE_SITES_DIRECTORY"] = self.directory
+        self.addCleanup(os.environ.pop, "BROCHURE_SITES_DIRECTORY")
+        server = get_prefork_server(["--port", "0", "--workers", "1"])
+        server.start()
+        self.addCleanup(server.stop)
+
+        status, body = get(server.server_address, headers={"Host": "b.example.com"})
+
+        self.assertEqual(200, status)
+        self.assertIn(b"Site B", body)
@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from brochure.commands.command_types import CommandType
+from werkzeug.routing import Map, Rule, RequestRedirect
+from werkzeug.exceptions import MethodNotAllowed
+
+from brochure_wsgi.path_command_provider import GetPathCommandProvider
+
+
+class TestGetPathCommandProvider(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url_map = Map([Rule("/", endpoint=lambda: CommandType.SHOW_COVER),
+                            Rule("/cover", endpoint=lambda: CommandType.SHOW_COVER, defaults={"page": 1}),
+                            Rule("/sections/<int:section_id>", endpoint=lambda: CommandType.SHOW_COVER),
+                            Rule("/café", endpoint=lambda: CommandType.SHOW_COVER),
+                            Rule("/folder/", endpoint=lambda: CommandType.SHOW_COVER),
+                            Rule("/contact", endpoint=lambda: CommandType.SHOW_COVER, methods=["POST"]),
+                            Rule("/old", redirect_to="/")])
+        self.compiled_provider = GetPathCommandProvider(url_map=self.url_map)
+        self.werkzeug_provider = GetPathCommandProvider(url_map=self.url_map, compiled_routing=False)
+
+    def _command(self, provider, path, method="GET"):
+        environ = {"PATH_INFO": path, "REQUEST_METHOD": method, "SERVER_NAME": "www.example.com", "SERVER_PORT": "80",
+                   "wsgi.url_scheme": "http"}
+        try:
+            return provider(environ=environ)()
+        except Exception as exception:
+            return type(exception)
+
+    def test_compiled_routing_matches_werkzeug_routing(self):
+        cases = (("/", "GET"), ("/", "POST"), ("/cover", "HEAD"), ("/sections/3", "GET"), ("/sections/x", "GET"),
+                 ("/cafÃ©", "GET"), ("/folder/", "GET"), ("/folder", "GET"), ("/contact", "POST"),
+                 ("/contact", "GET"), ("/old", "GET"), ("/missing", "GET"), ("//", "GET"), ("", "GET"))
+        for path, method in cases:
+            with self.subTest(path=path, method=method):
+                expected = self._command(self.werkzeug_provider, path, method)
+
+                self.assertEqual(expected, self._command(self.compiled_provider, path, method))
+                self.assertEqual(expected, self._command(self.compiled_provider, path, method))
+
+    def test_static_and_dynamic_results(self):
+        self.assertEqual((CommandType.SHOW_COVER, {"page": 1}), self._command(self.compiled_provider, "/cover"))
+        self.assertEqual((CommandType.SHOW_COVER, {"section_id": 3}), self._command(self.compiled_provider, "/sections/3"))
+        self.assertEqual((CommandType.UNKNOWN, {}), self._command(self.compiled_provider, "/missing"))
+        self.assertIs(MethodNotAllowed, self._command(self.compiled_provider, "/contact"))
+        self.assertIs(RequestRedirect, self._command(self.compiled_provider, "/folder"))
+
+    def test_returned_parameters_are_not_shared_between_requests(self):
+        self._command(self.compiled_provider, "/sections/3")[1]["section_id"] = 4
+        self._command(self.compiled_provider, "/cover")[1]["page"] = 2
+
+        self.assertEqual({"section_id": 3}, self._command(self.compiled_provider, "/sections/3")[1])
+        self.assertEqual({"page": 1}, self._command(self.compiled_provider, "/cover")[1])
+
+    def test_endpoint_is_called_for_every_request(self):
+        calls = []
+        url_map = Map([Rule("/", endpoint=lambda: calls.append(1) or CommandType.SHOW_COVER)])
+        provider = GetPathCommandProvider(url_map=url_map)
+
+        self._command(provider, "/")
+        self._command(provider, "/")
+
+        self.assertEqual(2, len(calls))
+
+    def test_rules_that_werkzeug_can_redirect_are_not_compiled(self):
+        url_map = Map([Rule("/pages/<int:number>", endpoint="pages"),
+                       Rule("/pages", endpoint="pages", defaults={"number": 1}),
+                       Rule("/shared", endpoint=lambda: CommandType.SHOW_COVER, methods=["GET"]),
+                       Rule("/shared", endpoint=lambda: CommandType.UNKNOWN, methods=["POST"])])
+        provider = GetPathCommandProvider(url_map=url_map)
+
+        self.assertIs(RequestRedirect, self._command(provider, "/pages/1"))
+        self.assertEqual((CommandType.UNKNOWN, {}), self._command(provider, "/shared", "POST"))
+
+    def test_host_matching_maps_are_routed_by_werkzeug(self):
+        url_map = Map([Rule("/", endpoint=lambda: CommandType.SHOW_COVER, host="www.example.com")], host_matching=True)
+        provider = GetPathCommandProvider(url_map=url_map)
+
+        self.assertEqual((CommandType.SHOW_COVER, {}), self._command(provider, "/"))
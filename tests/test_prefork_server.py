@@ -0,0 +1,233 @@
+import os
+import signal
+import socket
+import threading
+import time
+from http.client import HTTPConnection
+from unittest import TestCase
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.prefork_server import PreforkServer, WorkerServer, get_default_worker_count, get_prefork_server
+
+
+def get(address, path="/", headers=None, attempts=50):
+    for attempt in range(attempts):
+        connection = HTTPConnection(*address, timeout=5)
+        try:
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+
+            return response.status, response.read()
+        except ConnectionRefusedError:
+            # Workers with their own SO_REUSEPORT socket may not be listening yet.
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+        finally:
+            connection.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for {}".format(condition))
+        time.sleep(0.01)
+
+
+class SlowApplication(object):
+
+    def warm_up(self, environs):
+        pass
+
+    def __call__(self, environ, start_response):
+        time.sleep(10)
+        start_response("200 OK", [])
+
+        return [b""]
+
+
+class TestWorkerServer(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listening_socket = socket.socket()
+        self.listening_socket.bind(("127.0.0.1", 0))
+        self.listening_socket.listen(16)
+        self.addCleanup(self.listening_socket.close)
+
+    @staticmethod
+    def application(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain")])
+
+        return [environ["PATH_INFO"].encode("utf-8")]
+
+    def test_worker_stops_after_max_requests(self):
+        worker_server = WorkerServer(listening_socket=self.listening_socket, application=self.application, max_requests=2)
+        worker_thread = threading.Thread(target=worker_server.serve_until_stopped)
+        worker_thread.start()
+
+        responses = [get(self.listening_socket.getsockname(), path="/{}".format(index)) for index in range(2)]
+        worker_thread.join(timeout=5)
+
+        self.assertEqual([(200, b"/0"), (200, b"/1")], responses)
+        self.assertFalse(worker_thread.is_alive())
+        self.assertEqual(2, worker_server.handled_requests)
+
+    def test_worker_stops_when_asked(self):
+        worker_server = WorkerServer(listening_socket=self.listening_socket, application=self.application)
+        worker_server.timeout = 0.01
+        worker_thread = threading.Thread(target=worker_server.serve_until_stopped)
+        worker_thread.start()
+        time.sleep(0.05)
+
+        worker_server.stop()
+        worker_thread.join(timeout=5)
+
+        self.assertFalse(worker_thread.is_alive())
+
+
+class TestPreforkServer(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        self.built_applications = []
+
+    def application_factory(self):
+        application = get_brochure_wsgi_application()
+        self.built_applications.append(application)
+
+        return application
+
+    def start_server(self, **kwargs):
+        server = PreforkServer(application_factory=self.application_factory, port=0, **kwargs)
+        server.start()
+        self.addCleanup(lambda: server.stop() if server.worker_pids else None)
+
+        return server
+
+    def test_workers_serve_the_warmed_application(self):
+        server = self.start_server(worker_count=2)
+
+        status, body = get(server.server_address)
+
+        self.assertEqual(2, len(server.worker_pids))
+        self.assertEqual(200, status)
+        self.assertIn(b"Cover Title", body)
+        self.assertEqual(1, len(self.built_applications))
+
+    def test_workers_share_one_listening_socket(self):
+        server = self.start_server(worker_count=3)
+
+        statuses = [get(server.server_address, path="/missing")[0] for _ in range(10)]
+
+        self.assertEqual([404] * 10, statuses)
+
+    def test_workers_listen_on_their_own_reuse_port_sockets(self):
+        server = self.start_server(worker_count=2, reuse_port=True)
+
+        status, _ = get(server.server_address, headers={"Accept": "application/json"})
+
+        self.assertEqual(200, status)
+
+    def test_reload_replaces_workers_with_a_new_application(self):
+        server = self.start_server(worker_count=2, graceful_timeout=5.0)
+        old_worker_pids = server.worker_pids
+
+        reloaded = server.reload()
+        wait_for(lambda: server.reap_workers() or len(server.worker_pids) == 2)
+        status, _ = get(server.server_address)
+
+        self.assertTrue(reloaded)
+        self.assertEqual(2, len(self.built_applications))
+        self.assertFalse(set(old_worker_pids) & set(server.worker_pids))
+        self.assertEqual(200, status)
+
+    def test_failed_reload_keeps_the_old_workers(self):
+        server = self.start_server(worker_count=1)
+        worker_pids = server.worker_pids
+        os.environ["BROCHURE_HOST_REDIRECT_FILE"] = "/does/not/exist"
+        self.addCleanup(os.environ.pop, "BROCHURE_HOST_REDIRECT_FILE")
+
+        reloaded = server.reload()
+
+        self.assertFalse(reloaded)
+        self.assertEqual(worker_pids, server.worker_pids)
+        self.assertEqual(200, get(server.server_address)[0])
+
+    def test_worker_is_replaced_after_max_requests(self):
+        server = self.start_server(worker_count=1, max_requests=1, max_requests_jitter=0)
+        first_worker_pids = server.worker_pids
+
+        first_status, _ = get(server.server_address)
+        wait_for(lambda: server.reap_workers() or server.worker_pids != first_worker_pids)
+        second_status, _ = get(server.server_address)
+
+        self.assertEqual((200, 200), (first_status, second_status))
+        self.assertEqual(1, len(server.worker_pids))
+
+    def test_stop_kills_workers_after_graceful_timeout(self):
+        server = PreforkServer(application_factory=SlowApplication, port=0, worker_count=1, graceful_timeout=0.2)
+        server.start()
+        request_thread = threading.Thread(target=lambda: self.assertRaises(Exception, get, server.server_address))
+        request_thread.start()
+        time.sleep(0.2)
+
+        started = time.monotonic()
+        server.stop()
+        request_thread.join()
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([], server.worker_pids)
+
+    def test_signals_reload_and_stop_the_server(self):
+        server = PreforkServer(application_factory=self.application_factory, port=0, worker_count=1)
+        server.poll_interval = 0.01
+        observed = {}
+
+        def drive_server():
+            wait_for(lambda: server.worker_pids)
+            first_worker_pids = server.worker_pids
+            observed["first_status"] = get(server.server_address)[0]
+            os.kill(os.getpid(), signal.SIGHUP)
+            wait_for(lambda: server.worker_pids and not set(first_worker_pids) & set(server.worker_pids))
+            observed["reloaded_status"] = get(server.server_address)[0]
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        driver_thread = threading.Thread(target=drive_server)
+        driver_thread.start()
+        server.serve_forever()
+        driver_thread.join()
+
+        self.assertEqual({"first_status": 200, "reloaded_status": 200}, observed)
+        self.assertEqual(2, len(self.built_applications))
+        self.assertEqual([], server.worker_pids)
+        self.assertEqual(signal.default_int_handler, signal.getsignal(signal.SIGINT))
+
+    def test_serve_forever_restores_signal_handlers_when_the_address_is_taken(self):
+        taken_socket = socket.socket()
+        taken_socket.bind(("127.0.0.1", 0))
+        taken_socket.listen(1)
+        self.addCleanup(taken_socket.close)
+        server = PreforkServer(application_factory=self.application_factory, port=taken_socket.getsockname()[1])
+
+        with self.assertRaises(OSError):
+            server.serve_forever()
+
+        self.assertEqual(signal.SIG_DFL, signal.getsignal(signal.SIGHUP))
+        self.assertEqual([], self.built_applications)
+
+    def test_worker_count_defaults_to_available_cpus(self):
+        self.assertEqual(len(os.sched_getaffinity(0)), get_default_worker_count())
+
+    def test_server_from_command_line_arguments(self):
+        server = get_prefork_server(["--port", "0", "--workers", "2", "--max-requests", "100",
+                                     "--max-requests-jitter", "10", "--graceful-timeout", "5"])
+        server.start()
+        self.addCleanup(server.stop)
+
+        self.assertEqual(2, len(server.worker_pids))
+        self.assertEqual(200, get(server.server_address)[0])
@@ -0,0 +1,129 @@
+from typing import Dict, Callable, Optional, List
+from unittest import TestCase
+
+from brochure_wsgi.command_preprocessors.command_preprocessor import CommandPreprocessor, MatchCriteria
+from brochure_wsgi.command_preprocessors.domain_redirect_preprocessor import DomainRedirectPreprocessor
+from brochure_wsgi.command_preprocessors.favicon_preprocessor import FaviconPreprocessor
+from brochure_wsgi.command_preprocessors.preprocessor_chain import PreprocessorChain
+from brochure_wsgi.command_preprocessors.upgrade_to_ssl_preprocessor import UpgradeToSSLPreprocessor
+from brochure_wsgi.request_view import get_request_view, url_from_request_view, RequestView
+
+
+class RecordingPreprocessor(CommandPreprocessor):
+    def __init__(self, name: str, calls: List[str], criteria: Optional[MatchCriteria] = None, responds: bool = False):
+        super().__init__()
+        self._name = name
+        self._calls = calls
+        self._criteria = criteria
+        self._responds = responds
+
+    def preprocess(self, environ: Dict, start_response: Callable) -> Optional[Callable[[Dict, Callable], str]]:
+        self._calls.append(self._name)
+
+        return self._name if self._responds else None
+
+    def get_match_criteria(self) -> Optional[MatchCriteria]:
+        return self._criteria
+
+
+def _environ(path: str = "/", host: str = "www.example.com", scheme: str = "https") -> Dict:
+    return {"PATH_INFO": path, "HTTP_HOST": host, "wsgi.url_scheme": scheme, "QUERY_STRING": ""}
+
+
+class TestPreprocessorChain(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+    def test_unindexed_preprocessors_are_called_in_order_until_one_responds(self):
+        chain = PreprocessorChain((RecordingPreprocessor("first", self.calls),
+                                   RecordingPreprocessor("second", self.calls, responds=True),
+                                   RecordingPreprocessor("third", self.calls)))
+
+        response_provider = chain.preprocess(environ=_environ(), start_response=lambda *a: None)
+
+        self.assertEqual(("second", ["first", "second"]), (response_provider, self.calls))
+
+    def test_request_not_matching_any_index_calls_no_indexed_preprocessor(self):
+        chain = PreprocessorChain((RecordingPreprocessor("path", self.calls, MatchCriteria(paths=frozenset(("/favicon.ico",)))),
+                                   RecordingPreprocessor("host", self.calls, MatchCriteria(hosts=frozenset(("example.com",)))),
+                                   RecordingPreprocessor("scheme", self.calls, MatchCriteria(schemes=frozenset(("http",))))))
+
+        response_provider = chain.preprocess(environ=_environ(), start_response=lambda *a: None)
+
+        self.assertEqual((None, []), (response_provider, self.calls))
+
+    def test_matching_preprocessors_are_called_in_declaration_order(self):
+        chain = PreprocessorChain((RecordingPreprocessor("scheme", self.calls, MatchCriteria(schemes=frozenset(("http",)))),
+                                   RecordingPreprocessor("unindexed", self.calls),
+                                   RecordingPreprocessor("empty", self.calls, MatchCriteria()),
+                                   RecordingPreprocessor("host", self.calls, MatchCriteria(hosts=frozenset(("example.com",)))),
+                                   RecordingPreprocessor("path", self.calls, MatchCriteria(paths=frozenset(("/a",))))))
+
+        chain.preprocess(environ=_environ(path="/a", host="example.com", scheme="http"), start_response=lambda *a: None)
+
+        self.assertEqual(["scheme", "unindexed", "empty", "host", "path"], self.calls)
+
+    def test_every_declared_criterion_must_match(self):
+        criteria = MatchCriteria(paths=frozenset(("/a",)), hosts=frozenset(("example.com",)))
+        chain = PreprocessorChain((RecordingPreprocessor("both", self.calls, criteria),))
+
+        chain.preprocess(environ=_environ(path="/a"), start_response=lambda *a: None)
+        chain.preprocess(environ=_environ(path="/a", host="example.com"), start_response=lambda *a: None)
+
+        self.assertEqual(["both"], self.calls)
+
+    def test_favicon_preprocessor_is_indexed_by_favicon_path(self):
+        preprocessor = FaviconPreprocessor(favicon_url_path="/favicon.ico",
+                                           favicon_file_path=__file__,
+                                           request_path_provider=lambda e: e.get("PATH_INFO"))
+
+        self.assertEqual(MatchCriteria(paths=frozenset(("/favicon.ico",))), preprocessor.get_match_criteria())
+        self.assertIsNone(preprocessor.preprocess(environ=_environ(path="/"), start_response=lambda *a: None))
+        self.assertIsNotNone(preprocessor.preprocess(environ=_environ(path="/favicon.ico"), start_response=lambda *a: None))
+
+    def test_upgrade_to_ssl_preprocessor_is_only_indexed_with_insecure_schemes(self):
+        unindexed_preprocessor = UpgradeToSSLPreprocessor(is_insecure=lambda e: True, url_from_environment=url_from_request_view)
+        indexed_preprocessor = UpgradeToSSLPreprocessor(is_insecure=lambda e: True,
+                                                        url_from_environment=url_from_request_view,
+                                                        insecure_schemes=("http",))
+
+        self.assertIsNone(unindexed_preprocessor.get_match_criteria())
+        self.assertEqual(MatchCriteria(schemes=frozenset(("http",))), indexed_preprocessor.get_match_criteria())
+
+    def test_domain_redirect_preprocessor_reads_source_domains_on_every_request(self):
+        source_domains = []
+        preprocessor = DomainRedirectPreprocessor(url_from_environment=url_from_request_view,
+                                                  source_domain_provider=lambda: source_domains,
+                                                  target_domain_provider=lambda: "www.example.com")
+        chain = PreprocessorChain((preprocessor,))
+        source_domains.append("example.com")
+
+        response_provider = chain.preprocess(environ=_environ(host="example.com"), start_response=lambda *a: None)
+
+        self.assertIsNone(preprocessor.get_match_criteria())
+        self.assertEqual("301 Moved Permanently", response_provider.status)
+
+    def test_request_view_is_parsed_once_per_request(self):
+        environ = _environ()
+
+        self.assertIs(get_request_view(environ), get_request_view(environ))
+
+    def test_request_view_falls_back_to_server_name_and_non_default_port(self):
+        request_view = get_request_view({"SERVER_NAME": "Example.com", "SERVER_PORT": "8080", "wsgi.url_scheme": "http"})
+
+        self.assertEqual(RequestView(scheme="http", host="example.com:8080", script_name="", path="/", query=""),
+                         request_view)
+
+    def test_request_view_omits_default_port(self):
+        request_view = get_request_view({"SERVER_NAME": "example.com", "SERVER_PORT": "443", "wsgi.url_scheme": "https"})
+
+        self.assertEqual("example.com", request_view.host)
+
+    def test_url_from_request_view_includes_script_name_quoted_path_and_query(self):
+        environ = {"HTTP_HOST": "example.com", "wsgi.url_scheme": "http", "SCRIPT_NAME": "/site",
+                   "PATH_INFO": "/a b", "QUERY_STRING": "q=1"}
+
+        self.assertEqual("http://example.com/site/a%20b?q=1", url_from_request_view(environ))
+        self.assertEqual("http://example.com/", url_from_request_view({"HTTP_HOST": "example.com"}))
@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.metrics.metrics_registry import MetricsRegistry
+from brochure_wsgi.metrics.request_metrics import register_content_refresh_metrics
+from brochure_wsgi.stage_timer import StageTimer
+from brochure_wsgi.value_fetchers.content_fetchers import get_content_fetchers, get_refreshing_fetchers
+from brochure_wsgi.value_fetchers.refreshing_value_fetcher import RefreshingValueFetcher
+from tests.test_file_content_bundle_fetcher import content_bundle
+
+
+class ManualThread(object):
+    started = []
+
+    def __init__(self, target, name, daemon):
+        self.target = target
+
+    def start(self):
+        self.started.append(self)
+
+
+class TestRefreshingValueFetcher(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 100.0
+        self.values = ["first"]
+        self.fetch_count = 0
+        self.threads = ManualThread.started = []
+
+    def fetcher(self):
+        self.fetch_count += 1
+        value = self.values[0]
+        if isinstance(value, Exception):
+            raise value
+
+        return value
+
+    def get_fetcher(self):
+        return RefreshingValueFetcher(fetcher=self.fetcher, freshness=10, clock=lambda: self.now, thread_factory=ManualThread)
+
+    def test_first_load_waits_for_the_value(self):
+        fetcher = self.get_fetcher()
+
+        self.assertFalse(fetcher.has_snapshot())
+        self.assertFalse(fetcher.has_current_snapshot())
+        self.assertEqual("first", fetcher())
+        self.assertTrue(fetcher.has_snapshot())
+        self.assertTrue(fetcher.has_current_snapshot())
+        self.assertEqual(1, self.fetch_count)
+
+    def test_fresh_snapshot_is_served_without_refreshing(self):
+        fetcher = self.get_fetcher()
+        fetcher()
+        self.now += 9
+
+        fetcher()
+
+        self.assertEqual(([], 1), (self.threads, self.fetch_count))
+
+    def test_stale_snapshot_is_served_while_one_refresh_runs_in_the_background(self):
+        fetcher = self.get_fetcher()
+        fetcher()
+        self.values[0] = "second"
+        self.now += 10
+
+        values = [fetcher(), fetcher()]
+        self.threads[0].target()
+
+        self.assertEqual(["first", "first"], values)
+        self.assertEqual(1, len(self.threads))
+        self.assertEqual("second", fetcher())
+        self.assertEqual(1, fetcher.refreshes)
+
+    def test_unchanged_value_keeps_the_snapshot(self):
+        fetcher = self.get_fetcher()
+        snapshot = fetcher.get_snapshot()
+        self.now += 10
+        fetcher()
+
+        self.threads[0].target()
+
+        self.assertIs(snapshot, fetcher.get_snapshot())
+
+    def test_failed_refresh_keeps_the_snapshot_and_is_retried_later(self):
+        fetcher = self.get_fetcher()
+        fetcher()
+        self.values[0] = ValueError("Unavailable")
+        self.now += 10
+        fetcher()
+
+        self.threads[0].target()
+        value = fetcher()
+        self.now += 10
+        fetcher()
+
+        self.assertEqual("first", value)
+        self.assertEqual((1, 2), (fetcher.refresh_failures, len(self.threads)))
+
+    def test_racing_readers_load_and_refresh_once(self):
+        fetcher = self.get_fetcher()
+        fetcher()
+
+        # noinspection PyProtectedMember
+        fetcher._load_first_snapshot()
+        # noinspection PyProtectedMember
+        fetcher._start_refresh()
+        # noinspection PyProtectedMember
+        fetcher._start_refresh()
+
+        self.assertEqual((1, 1), (self.fetch_count, len(self.threads)))
+
+    def test_refresh_observer_gets_duration_and_outcome(self):
+        fetcher = self.get_fetcher()
+        registry = MetricsRegistry()
+        register_content_refresh_metrics(registry=registry, refreshing_fetchers=[fetcher])
+        fetcher()
+        for value in ("second", ValueError("Unavailable")):
+            self.values[0] = value
+            self.now += 10
+            fetcher()
+            self.threads[-1].target()
+
+        samples = {(sample.name, sample.labels): sample.value for family in registry.collect() for sample in family.samples}
+
+        self.assertEqual(1, samples[("brochure_content_refresh_duration_seconds_count", (("outcome", "success"),))])
+        self.assertEqual(1, samples[("brochure_content_refresh_duration_seconds_count", (("outcome", "failure"),))])
+
+    def test_readers_are_timed(self):
+        fetcher = self.get_fetcher()
+        recorded_timings = []
+        stage_timer = StageTimer(hooks=(lambda environ, timings: recorded_timings.append(timings),))
+
+        def application(environ, start_response):
+            start_response("200 OK", [])
+
+            return [fetcher().encode("utf-8")]
+
+        stage_timer.time_request(environ={}, start_response=lambda status, headers: None, application=application)
+
+        self.assertIn("fetch", recorded_timings[0].server_timing())
+
+
+class TestBackgroundContentRefresh(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.file_path = os.path.join(self.directory, "content.json")
+        with open(self.file_path, "w") as content_file:
+            json.dump(content_bundle(title="Cover Title"), content_file)
+        for name, value in (("BROCHURE_CONTENT_FILE", self.file_path),
+                            ("BROCHURE_CONTENT_CHECK_INTERVAL", "0"),
+                            ("BROCHURE_CONTENT_REFRESH_IN_BACKGROUND", "true")):
+            os.environ[name] = value
+            self.addCleanup(os.environ.pop, name)
+
+    def test_changed_file_is_served_after_a_background_refresh(self):
+        os.environ["BROCHURE_METRICS_PATH"] = "/metrics"
+        self.addCleanup(os.environ.pop, "BROCHURE_METRICS_PATH")
+        app = TestApp(get_brochure_wsgi_application())
+        refreshing_fetchers = get_refreshing_fetchers(get_content_fetchers())
+        app.get("/")
+        with open(self.file_path, "w") as content_file:
+            json.dump(content_bundle(title="New Title"), content_file)
+
+        deadline = time.monotonic() + 5
+        while "New Title" not in app.get("/").text and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(1, len(refreshing_fetchers))
+        self.assertIn("New Title", app.get("/").text)
+        self.assertIn('brochure_content_refresh_duration_seconds_count{outcome="success"}', app.get("/metrics").text)
@@ -0,0 +1,120 @@
+from unittest import TestCase
+
+from werkzeug.wrappers import Response
+
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+from brochure_wsgi.response_providers.caching_response_provider import CachingResponseProvider
+from brochure_wsgi.response_providers.response_cache import ResponseCache
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._render_count = 0
+        self._status = None
+        self._headers = None
+
+    def _fake_start_response(self, status, headers):
+        self._status = status
+        self._headers = headers
+
+    def _fake_response_provider(self, basics: str, path: str) -> Response:
+        self._render_count += 1
+
+        return Response("{} {} {}".format(basics, path, self._render_count), mimetype="text/html", status=404)
+
+    def _caching_response_provider(self, response_cache: ResponseCache) -> CachingResponseProvider:
+        return CachingResponseProvider(response_provider=self._fake_response_provider,
+                                       response_cache=response_cache,
+                                       cache_key_provider=lambda basics, path: path,
+                                       fingerprint_provider=lambda basics, path: basics)
+
+    def test_get_returns_stored_response_for_same_fingerprint(self):
+        response_cache = ResponseCache(maximum_size=2)
+        response = CachedResponse(status="200 OK", headers=(), body=b"")
+
+        response_cache.put(key="/", fingerprint="content", response=response)
+
+        self.assertIs(response, response_cache.get(key="/", fingerprint="content"))
+
+    def test_get_with_new_fingerprint_evicts_every_response(self):
+        response_cache = ResponseCache(maximum_size=2)
+        response_cache.put(key="/", fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=b""))
+        response_cache.put(key="/a", fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=b""))
+
+        response = response_cache.get(key="/", fingerprint="new content")
+
+        self.assertEqual((None, 0), (response, len(response_cache)))
+
+    def test_put_beyond_maximum_size_evicts_least_recently_used_response(self):
+        response_cache = ResponseCache(maximum_size=2)
+        for key in ("/a", "/b"):
+            response_cache.put(key=key, fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=b""))
+        response_cache.get(key="/a", fingerprint="content")
+
+        response_cache.put(key="/c", fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=b""))
+
+        self.assertIsNone(response_cache.get(key="/b", fingerprint="content"))
+        self.assertIsNotNone(response_cache.get(key="/a", fingerprint="content"))
+
+    def test_size_counts_body_bytes_of_cached_responses(self):
+        response_cache = ResponseCache(maximum_size=2)
+        for key, body in (("/a", b"a" * 10), ("/a", b"a" * 20), ("/b", b"b" * 30), ("/c", b"c" * 40)):
+            response_cache.put(key=key, fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=body))
+        size = response_cache.size
+
+        response_cache.clear()
+
+        self.assertEqual((70, 0), (size, response_cache.size))
+
+    def test_clear_evicts_every_response(self):
+        response_cache = ResponseCache(maximum_size=2)
+        response_cache.put(key="/", fingerprint="content", response=CachedResponse(status="200 OK", headers=(), body=b""))
+
+        response_cache.clear()
+
+        self.assertIsNone(response_cache.get(key="/", fingerprint="content"))
+
+    def test_caching_response_provider_renders_once_per_key_and_fingerprint(self):
+        response_provider = self._caching_response_provider(ResponseCache(maximum_size=2))
+
+        first_response = response_provider("content", path="/asdf")
+        second_response = response_provider("content", path="/asdf")
+
+        self.assertIs(first_response, second_response)
+        self.assertEqual(1, self._render_count)
+
+    def test_caching_response_provider_renders_again_when_fingerprint_changes(self):
+        response_provider = self._caching_response_provider(ResponseCache(maximum_size=2))
+
+        response_provider("content", path="/asdf")
+        response = response_provider("new content", path="/asdf")
+
+        self.assertEqual(b"new content /asdf 2", response.body)
+
+    def test_caching_response_provider_bounds_number_of_cached_paths(self):
+        response_cache = ResponseCache(maximum_size=2)
+        response_provider = self._caching_response_provider(response_cache)
+
+        for index in range(10):
+            response_provider("content", path="/{}".format(index))
+
+        self.assertEqual(2, len(response_cache))
+
+    def test_cached_response_replays_status_headers_and_body(self):
+        response_provider = self._caching_response_provider(ResponseCache(maximum_size=2))
+        response = response_provider("content", path="/asdf")
+
+        body = response({"REQUEST_METHOD": "GET"}, self._fake_start_response)
+
+        self.assertEqual("404 NOT FOUND", self._status)
+        self.assertIn(("Content-Type", "text/html; charset=utf-8"), self._headers)
+        self.assertEqual([b"content /asdf 1"], body)
+
+    def test_cached_response_to_head_request_has_no_body(self):
+        response = CachedResponse(status="200 OK", headers=(("Content-Length", "4"),), body=b"body")
+
+        body = response({"REQUEST_METHOD": "HEAD"}, self._fake_start_response)
+
+        self.assertEqual(([], [("Content-Length", "4")]), (body, self._headers))
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from werkzeug.wrappers import Response
+
+from brochure_wsgi.response_providers.caching_response_provider import CachingResponseProvider
+from brochure_wsgi.response_providers.response_cache import ResponseCache
+from brochure_wsgi.single_flight import AsyncSingleFlight, SingleFlight
+from brochure_wsgi.value_fetchers.caching_value_fetcher import CachingValueFetcher
+
+CONCURRENT_CALLS = 16
+
+
+def call_concurrently(function):
+    barrier = threading.Barrier(CONCURRENT_CALLS)
+
+    def call_after_barrier(_):
+        barrier.wait()
+        try:
+            return function()
+        except Exception as exception:
+            return exception
+
+    with ThreadPoolExecutor(max_workers=CONCURRENT_CALLS) as executor:
+        return list(executor.map(call_after_barrier, range(CONCURRENT_CALLS)))
+
+
+class TestSingleFlight(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = 0
+
+    def slow_function(self, result):
+        self.calls += 1
+        time.sleep(0.1)
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def test_concurrent_calls_share_one_result(self):
+        single_flight = SingleFlight()
+        result = object()
+
+        results = call_concurrently(lambda: single_flight.do(key="key", function=lambda: self.slow_function(result)))
+
+        self.assertEqual([result] * CONCURRENT_CALLS, results)
+        self.assertEqual(1, self.calls)
+
+    def test_concurrent_calls_share_one_exception(self):
+        single_flight = SingleFlight()
+        exception = ValueError("Broken")
+
+        results = call_concurrently(lambda: single_flight.do(key="key", function=lambda: self.slow_function(exception)))
+
+        self.assertEqual([exception] * CONCURRENT_CALLS, results)
+        self.assertEqual(1, self.calls)
+
+    def test_calls_for_other_keys_and_later_calls_are_not_shared(self):
+        single_flight = SingleFlight()
+
+        results = [single_flight.do(key=key, function=lambda: self.slow_function(key)) for key in ("a", "b", "a")]
+
+        self.assertEqual(["a", "b", "a"], results)
+        self.assertEqual(3, self.calls)
+
+    def test_concurrent_misses_render_once(self):
+        def render(path):
+            self.calls += 1
+            time.sleep(0.1)
+
+            return Response("Rendered {}".format(path))
+
+        response_provider = CachingResponseProvider(response_provider=render,
+                                                    response_cache=ResponseCache(maximum_size=2),
+                                                    cache_key_provider=lambda path: path,
+                                                    fingerprint_provider=lambda path: "content")
+
+        responses = call_concurrently(lambda: response_provider("/"))
+
+        self.assertEqual(1, self.calls)
+        self.assertEqual({b"Rendered /"}, {response.body for response in responses})
+
+    def test_requests_waiting_for_a_streamed_response_stream_their_own(self):
+        def render(path):
+            self.calls += 1
+            time.sleep(0.1)
+
+            return Response(iter([b"Streamed"]))
+
+        response_provider = CachingResponseProvider(response_provider=render,
+                                                    response_cache=ResponseCache(maximum_size=2),
+                                                    cache_key_provider=lambda path: path,
+                                                    fingerprint_provider=lambda path: "content")
+
+        responses = call_concurrently(lambda: response_provider("/"))
+
+        self.assertEqual(CONCURRENT_CALLS, len({id(response) for response in responses}))
+        self.assertEqual(CONCURRENT_CALLS, self.calls)
+
+    def test_concurrent_fetcher_misses_load_once(self):
+        fetcher = CachingValueFetcher(fetcher=lambda: self.slow_function("value"))
+
+        values = call_concurrently(fetcher)
+        fetcher.reload()
+
+        self.assertEqual(["value"] * CONCURRENT_CALLS, values)
+        self.assertEqual(2, self.calls)
+
+
+class TestAsyncSingleFlight(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = 0
+
+    async def slow_coroutine(self, result):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def test_concurrent_calls_share_one_result_or_exception(self):
+        single_flight = AsyncSingleFlight()
+        exception = ValueError("Broken")
+
+        async def call_concurrently_on_loop():
+            results = await asyncio.gather(*(single_flight.do(key="key", coroutine_function=lambda: self.slow_coroutine("value"))
+                                             for _ in range(CONCURRENT_CALLS)))
+            failures = await asyncio.gather(*(single_flight.do(key="key", coroutine_function=lambda: self.slow_coroutine(exception))
+                                              for _ in range(CONCURRENT_CALLS)), return_exceptions=True)
+
+            return results, failures
+
+        results, failures = asyncio.run(call_concurrently_on_loop())
+
+        self.assertEqual(["value"] * CONCURRENT_CALLS, results)
+        self.assertEqual([exception] * CONCURRENT_CALLS, failures)
+        self.assertEqual(2, self.calls)
+
+    def test_cancelled_caller_does_not_cancel_the_shared_call(self):
+        single_flight = AsyncSingleFlight()
+
+        async def cancel_one_caller():
+            first = asyncio.ensure_future(single_flight.do(key="key", coroutine_function=lambda: self.slow_coroutine("value")))
+            second = asyncio.ensure_future(single_flight.do(key="key", coroutine_function=lambda: self.slow_coroutine("other")))
+            await asyncio.sleep(0)
+            first.cancel()
+
+            return await second
+
+        self.assertEqual("value", asyncio.run(cancel_one_caller()))
+        self.assertEqual(1, self.calls)
@@ -0,0 +1,104 @@
+import os
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.stage_timer import StageTimer, RequestTimings, timed_stage
+from brochure_wsgi.value_fetchers.environment_contact_method_fetcher import environment_contact_method_fetcher
+from brochure_wsgi.value_fetchers.environment_cover_section_fetcher import environment_cover_section_fetcher
+from brochure_wsgi.value_fetchers.environment_enterprise_fetcher import environment_enterprise_fetcher
+
+
+class TestStageTimer(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+        for fetcher in (environment_contact_method_fetcher, environment_cover_section_fetcher, environment_enterprise_fetcher):
+            fetcher.invalidate()
+        self.recorded_timings = []
+        self.stage_timer = StageTimer(hooks=(lambda environ, timings: self.recorded_timings.append((environ["PATH_INFO"], timings)),))
+        self.app = TestApp(get_brochure_wsgi_application(stage_timer=self.stage_timer))
+
+    def test_hook_receives_every_stage_of_a_rendered_page(self):
+        self.app.get("/")
+
+        path, timings = self.recorded_timings[0]
+        self.assertEqual("/", path)
+        self.assertEqual(["preprocess", "route", "fetch", "render", "serialize", "cache_store", "process_command",
+                          "response", "total"], list(timings.durations))
+        self.assertTrue(all(duration >= 0 for duration in timings.durations.values()))
+
+    def test_cached_page_skips_rendering(self):
+        self.app.get("/")
+        self.app.get("/", headers={"Accept": "application/json"})
+        self.app.get("/")
+
+        self.assertNotIn("render", self.recorded_timings[2][1].durations)
+        self.assertIn("render", self.recorded_timings[1][1].durations)
+
+    def test_preprocessed_request_only_has_preprocess_and_response_stages(self):
+        self.app.get("/favicon.ico")
+
+        self.assertEqual(["preprocess", "response", "total"], list(self.recorded_timings[0][1].durations))
+
+    def test_not_found_and_exception_pages_are_timed(self):
+        self.app.get("/asdf", status=404)
+        self.app.get("/asdf", headers={"Accept": "application/json"}, status=404)
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Broken"'
+        self.app.get("/", status=500)
+
+        self.assertTrue(all("render" in timings.durations for _, timings in self.recorded_timings))
+
+    def test_no_server_timing_header_by_default(self):
+        response = self.app.get("/")
+
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_server_timing_header_lists_finished_stages(self):
+        app = TestApp(get_brochure_wsgi_application(stage_timer=StageTimer(server_timing=True)))
+
+        response = app.get("/")
+
+        stages = [metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")]
+        self.assertEqual(["preprocess", "route", "fetch", "render", "serialize", "cache_store", "process_command"], stages)
+
+    def test_server_timing_passes_exc_info_through(self):
+        calls = []
+        stage_timer = StageTimer(server_timing=True)
+
+        def application(environ, start_response):
+            start_response("500 Internal Server Error", [], ("exc", "info", None))
+
+            return []
+
+        stage_timer.time_request(environ={}, start_response=lambda *args: calls.append(args), application=application)
+
+        self.assertEqual(("500 Internal Server Error", [("Server-Timing", "")], ("exc", "info", None)), calls[0])
+
+    def test_stages_are_not_recorded_outside_a_timed_request(self):
+        with timed_stage("render"):
+            pass
+
+        self.assertEqual([], self.recorded_timings)
+
+    def test_repeated_stages_are_summed(self):
+        timings = RequestTimings()
+        timings.add("fetch", 1500000)
+        timings.add("fetch", 500000)
+
+        self.assertEqual("fetch;dur=2.000", timings.server_timing())
+
+    def test_timings_are_reset_when_application_raises(self):
+        def application(environ, start_response):
+            raise ValueError("Broken")
+
+        with self.assertRaises(ValueError):
+            self.stage_timer.time_request(environ={}, start_response=None, application=application)
+
+        with timed_stage("render"):
+            pass
+        self.assertEqual([], self.recorded_timings)
@@ -0,0 +1,181 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.command_preprocessors.static_directory_preprocessor import StaticDirectoryPreprocessor
+from brochure_wsgi.http_user_interface import HTTPUserInterfaceProvider
+from brochure_wsgi.static_file_index import StaticFileIndex
+
+
+class RecordingFileWrapper(object):
+    def __init__(self, file, block_size):
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        return iter(lambda: self.file.read(self.block_size), b"")
+
+    def close(self):
+        self.file.close()
+
+
+class TestStaticFileIndex(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self._write("css/site.css", b"body { color: #444; }\n" * 100)
+        self._write("images/logo.png", b"\x89PNG" + bytes(range(256)) * 8)
+        self._write("fonts/large.woff2", b"\x00" * 3000)
+        self._write("LICENSE", b"MIT")
+        self._write(".hidden", b"secret")
+        self._write(".git/config", b"secret")
+        self.index = StaticFileIndex(directory=self.directory,
+                                     aliases={"/favicon.png": "images/logo.png"},
+                                     maximum_memory_file_size=2500)
+        self.app = TestApp(lambda environ, start_response: StaticDirectoryPreprocessor(self.index).preprocess(
+            environ=environ, start_response=start_response)(environ, start_response))
+
+    def _write(self, relative_path, contents):
+        file_path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as static_file:
+            static_file.write(contents)
+
+    def test_hashed_urls_include_content_hash(self):
+        self.assertRegex(self.index.url_for("css/site.css"), r"^/static/css/site\.[0-9a-f]{12}\.css$")
+        self.assertRegex(self.index.url_for("/LICENSE"), r"^/static/LICENSE\.[0-9a-f]{12}$")
+
+    def test_unknown_file_has_no_url(self):
+        with self.assertRaises(ValueError):
+            self.index.url_for("missing.css")
+
+    def test_hidden_files_are_not_indexed(self):
+        self.assertFalse(any("hidden" in path or ".git" in path for path in self.index.url_paths))
+
+    def test_hashed_url_is_immutable(self):
+        response = self.app.get(self.index.url_for("css/site.css"))
+
+        self.assertEqual("public, max-age=31536000, immutable", response.headers["Cache-Control"])
+        self.assertEqual("text/css; charset=utf-8", response.headers["Content-Type"])
+        self.assertEqual(b"body { color: #444; }\n" * 100, response.body)
+
+    def test_unhashed_url_has_short_lifetime_and_validators(self):
+        response = self.app.get("/static/css/site.css")
+
+        self.assertEqual("public, max-age=60", response.headers["Cache-Control"])
+        self.app.get("/static/css/site.css", headers={"If-None-Match": response.headers["ETag"]}, status=304)
+
+    def test_text_files_are_served_compressed(self):
+        start_response_calls = []
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/static/css/site.css", "HTTP_ACCEPT_ENCODING": "gzip"}
+
+        body = b"".join(self.app.app(environ, lambda status, headers: start_response_calls.append(dict(headers))))
+
+        self.assertEqual("gzip", start_response_calls[0]["Content-Encoding"])
+        self.assertEqual(b"body { color: #444; }\n" * 100, gzip.decompress(body))
+
+    def test_images_are_not_compressed(self):
+        response = self.app.get("/favicon.png", headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual("image/png", response.headers["Content-Type"])
+
+    def test_large_files_are_streamed_through_file_wrapper(self):
+        url_path = self.index.url_for("fonts/large.woff2")
+        response = self.app.get(url_path, extra_environ={"wsgi.file_wrapper": RecordingFileWrapper})
+
+        self.assertEqual((b"\x00" * 3000, "3000"), (response.body, response.headers["Content-Length"]))
+        self.assertEqual("public, max-age=31536000, immutable", response.headers["Cache-Control"])
+
+    def test_large_files_without_server_file_wrapper(self):
+        response = self.app.get("/static/fonts/large.woff2")
+
+        self.assertEqual(b"\x00" * 3000, response.body)
+
+    def test_large_files_answer_conditional_and_head_requests(self):
+        etag = self.app.get("/static/fonts/large.woff2").headers["ETag"]
+
+        not_modified = self.app.get("/static/fonts/large.woff2", headers={"If-None-Match": etag}, status=304)
+        head = self.app.head("/static/fonts/large.woff2")
+        self.app.get("/static/fonts/large.woff2", headers={"If-None-Match": '"other"'}, status=200)
+
+        self.assertEqual((etag, "public, max-age=60"), (not_modified.headers["ETag"], not_modified.headers["Cache-Control"]))
+        self.assertEqual((b"", "3000"), (head.body, head.headers["Content-Length"]))
+
+    def test_urls_share_compressed_variants(self):
+        unhashed_response = self.index.get_response("/static/css/site.css", method="GET")
+        hashed_response = self.index.get_response(self.index.url_for("css/site.css"), method="GET")
+
+        self.assertEqual(("gzip", "deflate"), hashed_response.encodings)
+        self.assertIs(unhashed_response._variants["gzip"].body, hashed_response._variants["gzip"].body)
+        self.assertEqual(len(b"MIT") + unhashed_response.size + len(self.index.get_response("/favicon.png", method="GET").body),
+                         self.index.memory_size)
+
+    def test_files_beyond_memory_limit_are_streamed(self):
+        index = StaticFileIndex(directory=self.directory, maximum_memory_file_size=2500, maximum_memory_size=2300)
+        environ = {"REQUEST_METHOD": "GET", "wsgi.file_wrapper": RecordingFileWrapper}
+        css_response = index.get_response("/static/css/site.css", method="GET")
+
+        in_memory = css_response(environ, lambda status, headers: None)
+        streamed = index.get_response("/static/images/logo.png", method="GET")(environ, lambda status, headers: None)
+
+        self.assertIsInstance(in_memory, list)
+        self.assertIsInstance(streamed, RecordingFileWrapper)
+        streamed.close()
+        self.assertEqual(len(b"MIT") + css_response.size, index.memory_size)
+
+    def test_other_methods_are_not_allowed(self):
+        response = self.app.post("/static/css/site.css", status=405)
+
+        self.assertEqual("GET, HEAD", response.headers["Allow"])
+
+    def test_unknown_paths_are_not_handled(self):
+        preprocessor = StaticDirectoryPreprocessor(self.index)
+
+        self.assertIsNone(preprocessor.preprocess(environ={"PATH_INFO": "/static/missing.css"}, start_response=None))
+        self.assertIn("/favicon.png", preprocessor.get_match_criteria().paths)
+
+
+class TestStaticFilesInApplication(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+
+    def test_favicon_is_served_at_root_and_hashed_url(self):
+        app = TestApp(get_brochure_wsgi_application())
+
+        favicon = app.get("/favicon.ico")
+        hashed_favicon = app.get(app.app._user_interface_provider._html_template_provider.globals["static_url"]("favicon.ico"))
+
+        self.assertEqual(favicon.body, hashed_favicon.body)
+
+    def test_configured_static_directory_is_served(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, "site.css"), "w") as static_file:
+            static_file.write("body {}")
+        os.environ["BROCHURE_STATIC_DIRECTORY"] = directory
+        self.addCleanup(os.environ.pop, "BROCHURE_STATIC_DIRECTORY")
+        app = TestApp(get_brochure_wsgi_application())
+
+        self.assertEqual(b"body {}", app.get("/static/site.css").body)
+        app.get("/favicon.ico", status=404)
+
+    def test_templates_can_reference_hashed_urls(self):
+        provider = HTTPUserInterfaceProvider(static_url_provider=lambda path: "/static/hashed/{}".format(path))
+        template = provider._html_template_provider.from_string("{{ static_url('site.css') }}")
+
+        self.assertEqual("/static/hashed/site.css", template.render())
+
+    def test_templates_have_no_static_urls_without_provider(self):
+        self.assertNotIn("static_url", HTTPUserInterfaceProvider()._html_template_provider.globals)
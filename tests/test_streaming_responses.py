@@ -0,0 +1,90 @@
+import json
+import os
+from unittest import TestCase
+
+from brochure.values.basics import Basics
+from brochure.values.contact_method import ContactMethod, ContactMethodType
+from brochure.values.enterprise import Enterprise
+from brochure.values.section import Section
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.http_user_interface import HTTPUserInterfaceProvider
+from brochure_wsgi.response_providers.buffered_stream import buffered_stream
+from brochure_wsgi.response_providers.cached_response import CachedResponse
+
+LARGE_BODY = "Long body text. " * 20000
+BASICS = Basics(enterprise=Enterprise(name="Example Enterprise"),
+                contact_method=ContactMethod(contact_method_type=ContactMethodType.EMAIL, value="ejemplo@example.com"))
+
+
+class TestBufferedStream(TestCase):
+
+    def test_small_pieces_are_joined_into_chunks(self):
+        chunks = list(buffered_stream(["abc"] * 10, chunk_size=8))
+
+        self.assertEqual([b"abcabcabc"] * 3 + [b"abc"], chunks)
+
+    def test_large_pieces_are_split(self):
+        chunks = list(buffered_stream(["", "x" * 20, "é"], chunk_size=8))
+
+        self.assertEqual([b"x" * 8, b"x" * 8, b"xxxx\xc3\xa9"], chunks)
+
+    def test_nothing_is_yielded_for_empty_pieces(self):
+        self.assertEqual([], list(buffered_stream(["", ""])))
+
+
+class TestStreamingResponses(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+
+    def get_raw(self, application, accept="text/html"):
+        response_start = {}
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+                   "wsgi.url_scheme": "http", "HTTP_ACCEPT": accept, "HTTP_ACCEPT_ENCODING": "gzip"}
+        chunks = list(application(environ, lambda status, headers, exc_info=None: response_start.update(headers=dict(headers))))
+
+        return response_start["headers"], chunks
+
+    def test_large_sections_are_streamed(self):
+        os.environ["BROCHURE_COVER_SECTION"] = json.dumps({"title": "Cover Title", "body": LARGE_BODY})
+
+        headers, chunks = self.get_raw(get_brochure_wsgi_application())
+        page = b"".join(chunks).decode("utf-8")
+
+        self.assertGreater(len(chunks), 10)
+        self.assertLess(max(len(chunk) for chunk in chunks[:-1]), 2 * 8192)
+        self.assertNotIn("ETag", headers)
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertIn(LARGE_BODY, page)
+        self.assertTrue(page.rstrip().endswith("</html>"))
+
+    def test_streamed_page_matches_rendered_page(self):
+        os.environ["BROCHURE_COVER_SECTION"] = json.dumps({"title": "Cover Title", "body": LARGE_BODY})
+        interface_provider = HTTPUserInterfaceProvider(streaming_minimum_size=None)
+        interface = interface_provider("/", "text/html")
+        interface.show_cover(Section(title="Cover Title", body=LARGE_BODY), BASICS)
+
+        streamed_page = TestApp(get_brochure_wsgi_application()).get("/").body
+
+        self.assertIsInstance(interface.get_response_provider(), CachedResponse)
+        self.assertEqual(interface.get_response_provider().body, streamed_page)
+
+    def test_small_sections_are_rendered_and_cached(self):
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+
+        headers, chunks = self.get_raw(get_brochure_wsgi_application())
+
+        self.assertEqual(1, len(chunks))
+        self.assertIn("ETag", headers)
+
+    def test_large_sections_are_not_streamed_as_json(self):
+        os.environ["BROCHURE_COVER_SECTION"] = json.dumps({"title": "Cover Title", "body": LARGE_BODY})
+
+        headers, chunks = self.get_raw(get_brochure_wsgi_application(), accept="application/json")
+
+        self.assertEqual(1, len(chunks))
+        self.assertEqual("gzip", headers["Content-Encoding"])
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from jinja2 import BytecodeCache
+from webtest import TestApp
+
+from brochure_wsgi.brochure_wsgi_application import get_brochure_wsgi_application
+from brochure_wsgi.http_user_interface import HTTPUserInterfaceProvider
+
+
+class RecordingBytecodeCache(BytecodeCache):
+
+    def __init__(self):
+        super().__init__()
+        self.stored = {}
+        self.loaded = []
+
+    def load_bytecode(self, bucket):
+        self.loaded.append(bucket.key)
+        if bucket.key in self.stored:
+            bucket.bytecode_from_string(self.stored[bucket.key])
+
+    def dump_bytecode(self, bucket):
+        self.stored[bucket.key] = bucket.bytecode_to_string()
+
+
+class TestTemplateBytecodeCache(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.environ["BROCHURE_COVER_SECTION"] = '{"title": "Cover Title", "body": "Body text"}'
+        os.environ["BROCHURE_ENTERPRISE"] = '{"name": "Example Enterprise"}'
+        os.environ["BROCHURE_CONTACT_METHOD"] = '{"contact_method_type": "email", "value": "ejemplo@example.com"}'
+
+    def test_every_template_is_compiled_when_the_provider_is_created(self):
+        bytecode_cache = RecordingBytecodeCache()
+
+        HTTPUserInterfaceProvider(template_bytecode_cache=bytecode_cache)
+
+        self.assertEqual(4, len(bytecode_cache.stored))
+
+    def test_later_providers_load_compiled_templates(self):
+        bytecode_cache = RecordingBytecodeCache()
+        HTTPUserInterfaceProvider(template_bytecode_cache=bytecode_cache)
+        stored = dict(bytecode_cache.stored)
+
+        HTTPUserInterfaceProvider(template_bytecode_cache=bytecode_cache)
+
+        self.assertEqual(stored, bytecode_cache.stored)
+        self.assertEqual(8, len(bytecode_cache.loaded))
+
+    def test_template_cache_directory_is_created_and_filled(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        template_cache_directory = os.path.join(directory, "templates")
+        os.environ["BROCHURE_TEMPLATE_CACHE_DIRECTORY"] = template_cache_directory
+        self.addCleanup(os.environ.pop, "BROCHURE_TEMPLATE_CACHE_DIRECTORY")
+
+        TestApp(get_brochure_wsgi_application()).get("/")
+        html = TestApp(get_brochure_wsgi_application()).get("/").html
+
+        self.assertEqual(4, len(os.listdir(template_cache_directory)))
+        self.assertEqual("Example Enterprise", html.title.text)
@@ -44,14 +44,16 @@ class TestUpgradeToSSLPreprocessor(TestCase):
 
         self.assertEqual("301 Moved Permanently", self._response_body)
 
-    def test_preprocess_when_insecure_returns_callable_that_when_called_sets_one_response_header(self):
+    def test_preprocess_when_insecure_returns_callable_that_when_called_returns_an_empty_body_with_its_content_length(self):
         preprocessor = UpgradeToSSLPreprocessor(is_insecure=lambda e: True,
                                                 url_from_environment=lambda e: "http://www.example.com/asdf?q")
 
         response_handler = preprocessor.preprocess(environ={}, start_response=self._fake_start_response)
-        response_handler({}, self._fake_start_response)
+        body = response_handler({}, self._fake_start_response)
 
-        self.assertEqual(1, len(self._response_headers))
+        self.assertEqual([b""], body)
+        self.assertEqual(2, len(self._response_headers))
+        self.assertEqual(("Content-Length", "0"), self._response_headers[1])
 
     def test_preprocess_when_insecure_returns_callable_that_when_called_sets_location_response_header(self):
         preprocessor = UpgradeToSSLPreprocessor(is_insecure=lambda e: True,